@@ -3,26 +3,209 @@
 处理特定游戏的事件和分数更新API端点
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models.models import GameEvent, ScoreUpdate, BingoCard
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.models.models import GameEvent, ScoreUpdate, BingoCard, TeamRoster
 from app.core.websocket import connection_manager
 from app.core.game_config import game_config
 from app.core.score_engine import score_engine
 from app.core.data_manager import data_manager
+from app.core.event_batcher import game_event_batcher
+from app.core.ingest_queue import ingest_queue, IngestQueueFull
+from app.core.dedupe import event_dedupe
+from app.core.event_log import event_log
+from app.core.log import get_logger
+from app.core.json_codec import loads
 from datetime import datetime
 import asyncio
+import logging
+import time
 from app.core.websocket import connection_manager
 
+logger = get_logger("ingest")
+
 # 创建路由器实例
 router = APIRouter()
 
+# 按行分隔的 JSON（NDJSON）请求体类型，批量事件接口按行流式解析
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+def _engine_event(event: GameEvent) -> Dict[str, Any]:
+    """分数引擎使用的事件数据"""
+    return {
+        "player": event.player,
+        "team": event.team,
+        "event": event.event,
+        "lore": event.lore
+    }
+
+
+def _resolve_item_image(event: GameEvent):
+    """如果是 Bingo 或事件 lore 看似物品ID，则尝试解析图片并缓存（异步，不阻塞返回）"""
+    try:
+        lore = (event.lore or '').strip()
+        if lore and lore.isascii() and lore.lower() == lore and ('_' in lore or lore.isalpha()):
+            asyncio.create_task(data_manager.resolve_item_image(lore))
+    except Exception:
+        pass
+
+
+def _broadcast_event_data(game_id: str, event: GameEvent) -> Dict[str, Any]:
+    """构造广播消息中的单条事件数据"""
+    # 取队伍颜色
+    team_color = game_config.compiled.team_colors.get(event.team)
+    return {
+        "player": event.player,
+        "team": event.team,
+        "event": event.event,
+        "lore": event.lore,
+        "item_image": data_manager.item_image_cache.get((event.lore or '').strip()) if hasattr(data_manager, 'item_image_cache') else None,
+        "team_color": team_color,
+        "game_id": game_id,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'body'}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def _iter_batch_items(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """
+    逐条产出批量请求体中的事件：(事件数据, 解析错误)
+
+    NDJSON 请求体边接收边解析，单行解析失败只影响该行；
+    其他类型按 JSON 数组整体解析，格式错误时整个请求返回 400
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if pending.strip():
+            yield _parse_line(pending)
+        return
+
+    try:
+        items = loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"请求体不是有效的 JSON: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="请求体必须是事件数组或 NDJSON")
+    for item in items:
+        yield item, None
+
+
+def _parse_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return loads(line), None
+    except ValueError as e:
+        return None, f"无效的 JSON: {e}"
+
+
+async def _apply_game_event(game_id: str, event: GameEvent, received_at: float) -> Dict[str, Any]:
+    """处理单条游戏事件：分数引擎、数据管理器与广播（同步模式在请求内调用，队列模式由消费任务调用）"""
+    # 设置当前游戏（如果改变了）
+    if score_engine.current_game_id != game_id:
+        score_engine.set_current_game(game_id)
+    
+    # 处理事件并获取分数预测
+    score_prediction = score_engine.process_event(_engine_event(event))
+    
+    # 分数引擎接受后才按处理顺序记录到事件日志（与批量路径一致，回放不会重放失败的事件）
+    if "error" not in score_prediction:
+        event_log.append("event", event, game_id)
+    
+    # 添加事件到数据管理器（带时间戳）
+    data_manager.add_event(event, game_id)
+    _resolve_item_image(event)
+    
+    # 更新当前游戏积分数据
+    if score_prediction:
+        data_manager.update_current_game_score(score_prediction)
+    
+    # 通过WebSocket广播事件（含分数预测），便于前端即时更新；
+    # 短时间内连续到达的事件会合并为一条 game_events 消息
+    try:
+        await game_event_batcher.submit(game_id, _broadcast_event_data(game_id, event), score_prediction, received_at)
+    except Exception as be:
+        logger.warning("广播游戏事件失败: %s", be)
+    return score_prediction
+
+
+async def _apply_queued_game_event(game_id: str, event: GameEvent, received_at: float,
+                                   dedupe_key: Optional[str]) -> Dict[str, Any]:
+    """队列模式下处理单条游戏事件；处理失败时撤销去重记录，允许重试"""
+    try:
+        return await _apply_game_event(game_id, event, received_at)
+    except Exception:
+        event_dedupe.discard(dedupe_key)
+        raise
+
+
+def _restore_game_event(game_id: str, event: GameEvent) -> Optional[str]:
+    """回放事件日志时恢复单条游戏事件的状态（分数引擎与事件历史），不解析物品图片也不广播"""
+    if score_engine.current_game_id != game_id:
+        score_engine.set_current_game(game_id)
+    error = score_engine.apply_event(_engine_event(event))
+    if error is None:
+        data_manager.add_event(event, game_id)
+    return error
+
+
+async def _apply_game_events(game_id: str, items: List[Tuple[Optional[GameEvent], Optional[str]]],
+                             received_at: float) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """按顺序处理一批游戏事件，整批只计算一次分数榜并合并为一条广播；返回逐条结果与分数预测"""
+    # 设置当前游戏（如果改变了）
+    if score_engine.current_game_id != game_id:
+        score_engine.set_current_game(game_id)
+    
+    results: List[Dict[str, Any]] = []
+    broadcast_events: List[Dict[str, Any]] = []
+    for index, (event, error) in enumerate(items):
+        dedupe_key = None
+        if error is None:
+            dedupe_key = event_dedupe.key_for(game_id, event)
+            if event_dedupe.lookup(dedupe_key) is not None:
+                results.append({"index": index, "success": True, "duplicate": True})
+                continue
+            error = score_engine.apply_event(_engine_event(event))
+        if error is not None:
+            results.append({"index": index, "success": False, "error": error})
+            continue
+        event_log.append("event", event, game_id)
+        event_dedupe.add(dedupe_key)
+        data_manager.add_event(event, game_id)
+        _resolve_item_image(event)
+        broadcast_events.append(_broadcast_event_data(game_id, event))
+        results.append({"index": index, "success": True})
+    
+    score_prediction = None
+    if broadcast_events:
+        score_prediction = score_engine.get_current_standings()
+        data_manager.update_current_game_score(score_prediction)
+        try:
+            await game_event_batcher.submit_batch(game_id, broadcast_events, score_prediction, received_at)
+        except Exception as be:
+            logger.warning("广播游戏事件失败: %s", be)
+    return results, score_prediction
+
 
 @router.post("/api/{game_id}/event")
-async def handle_game_event(game_id: str, event: GameEvent):
+async def handle_game_event(game_id: str, event: GameEvent, response: Response):
     """
     处理特定游戏的事件
     
+    队列模式（INGEST_MODE=queue）下事件放入接入队列后立即返回 202 与分配的序号，由后台按到达顺序处理。
+    
     参数:
         game_id (str): 游戏的唯一标识符
         event (GameEvent): 游戏事件数据
@@ -31,60 +214,49 @@ async def handle_game_event(game_id: str, event: GameEvent):
         dict: 包含处理结果的响应信息
     """
     try:
-        print(f"游戏 {game_id} - 事件: {event.event}, 玩家: {event.player}, 队伍: {event.team}, 详情: {event.lore}")
-        
-        # 设置当前游戏（如果改变了）
-        if score_engine.current_game_id != game_id:
-            score_engine.set_current_game(game_id)
-        
-        # 处理事件并获取分数预测
-        score_prediction = score_engine.process_event({
-            "player": event.player,
-            "team": event.team,
-            "event": event.event,
-            "lore": event.lore
-        })
+        received_at = time.monotonic()
         
-        # 添加事件到数据管理器（带时间戳）
-        data_manager.add_event(event, game_id)
-        
-        # 如果是 Bingo 或事件 lore 看似物品ID，则尝试解析图片并缓存（异步，不阻塞返回）
-        try:
-            lore = (event.lore or '').strip()
-            if lore and lore.isascii() and lore.lower() == lore and ('_' in lore or lore.isalpha()):
-                asyncio.create_task(data_manager.resolve_item_image(lore))
-        except Exception:
-            pass
+        # 重试等原因重复提交的事件直接回执，不改动状态也不广播
+        dedupe_key = event_dedupe.key_for(game_id, event)
+        seen = event_dedupe.lookup(dedupe_key)
+        if seen is not None:
+            logger.debug("游戏 %s - 忽略重复事件: %s", game_id, dedupe_key)
+            return {
+                "message": "重复事件，已忽略",
+                "success": True,
+                "duplicate": True,
+                "game_id": game_id,
+                "event_id": event.event_id,
+                "seq": seen[1],
+                "timestamp": datetime.now().isoformat()
+            }
         
-        # 更新当前游戏积分数据
-        if score_prediction:
-            data_manager.update_current_game_score(score_prediction)
+        logger.info("游戏 %s - 事件: %s, 玩家: %s, 队伍: %s, 详情: %s", game_id, event.event, event.player, event.team, event.lore)
         
-        # 通过WebSocket广播单条事件（含分数预测），便于前端即时更新
-        try:
-            # 取队伍颜色
-            teams_cfg = game_config.get_teams()
-            id_to_color = {t['id']: t.get('color') for t in teams_cfg}
-            team_color = id_to_color.get(event.team)
-            websocket_message = {
-                "type": "game_event",
+        if ingest_queue.enabled:
+            try:
+                seq = ingest_queue.submit(_apply_queued_game_event, game_id, event, received_at, dedupe_key)
+            except IngestQueueFull as qe:
+                raise HTTPException(status_code=503, detail=str(qe))
+            event_dedupe.add(dedupe_key, seq)
+            response.status_code = 202
+            return {
+                "message": "游戏事件已加入处理队列",
+                "success": True,
                 "game_id": game_id,
-                "data": {
-                    "player": event.player,
-                    "team": event.team,
-                    "event": event.event,
-                    "lore": event.lore,
-                    "item_image": data_manager.item_image_cache.get((event.lore or '').strip()) if hasattr(data_manager, 'item_image_cache') else None,
-                    "team_color": team_color,
-                    "game_id": game_id,
-                    "timestamp": datetime.now().isoformat()
-                },
-                "score_prediction": score_prediction,
+                "seq": seq,
+                "queue_depth": ingest_queue.depth(),
                 "timestamp": datetime.now().isoformat()
             }
-            await connection_manager.broadcast(websocket_message)
-        except Exception as be:
-            print(f"广播游戏事件失败: {be}")
+        
+        # 处理过程中会让出事件循环，先登记，避免并发的重试请求同时通过查重
+        event_dedupe.add(dedupe_key)
+        try:
+            await _apply_game_event(game_id, event, received_at)
+        except Exception:
+            event_dedupe.discard(dedupe_key)
+            raise
+        await event_log.sync()
 
         # 准备响应数据
         response_data = {
@@ -95,11 +267,74 @@ async def handle_game_event(game_id: str, event: GameEvent):
         }
         
         return response_data
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"处理游戏事件时发生错误: {str(e)}")
+        logger.error("处理游戏事件时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"处理游戏事件失败: {str(e)}")
 
 
+@router.post("/api/{game_id}/events")
+async def handle_game_events(game_id: str, request: Request):
+    """
+    批量处理特定游戏的事件
+    
+    请求体为事件数组（application/json），或每行一个事件的 NDJSON（application/x-ndjson，可流式上传、边接收边校验）。
+    事件按顺序逐条进入分数引擎，全部处理完后只计算一次分数榜、广播一条合并消息。
+    单条事件格式错误不影响其余事件，结果中逐条给出处理情况。
+    队列模式下整批作为一个任务进入接入队列，与单条事件保持先后顺序。
+    
+    参数:
+        game_id (str): 游戏的唯一标识符
+        request (Request): 请求体为事件列表
+    
+    返回:
+        dict: 包含逐条处理结果的响应信息
+    """
+    try:
+        received_at = time.monotonic()
+        items: List[Tuple[Optional[GameEvent], Optional[str]]] = []
+        async for item, error in _iter_batch_items(request):
+            event = None
+            if error is None:
+                try:
+                    event = GameEvent.model_validate(item)
+                except ValidationError as ve:
+                    error = _validation_message(ve)
+            items.append((event, error))
+        
+        if ingest_queue.enabled:
+            try:
+                results, score_prediction = await ingest_queue.call(_apply_game_events, game_id, items, received_at)
+            except IngestQueueFull as qe:
+                raise HTTPException(status_code=503, detail=str(qe))
+        else:
+            results, score_prediction = await _apply_game_events(game_id, items, received_at)
+        await event_log.sync()
+        
+        accepted = sum(1 for result in results if result["success"] and not result.get("duplicate"))
+        duplicates = sum(1 for result in results if result.get("duplicate"))
+        rejected = len(results) - accepted - duplicates
+        logger.info("游戏 %s - 批量事件: 接受 %s 条, 重复 %s 条, 拒绝 %s 条", game_id, accepted, duplicates, rejected)
+        
+        return {
+            "message": "批量游戏事件处理完成",
+            "success": True,
+            "game_id": game_id,
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "results": results,
+            "score_prediction": score_prediction,
+            "timestamp": datetime.now().isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("批量处理游戏事件时发生错误: %s", e)
+        raise HTTPException(status_code=500, detail=f"批量处理游戏事件失败: {str(e)}")
+
+
 @router.post("/api/{game_id}/score")
 async def handle_game_score_update(game_id: str, scores: List[ScoreUpdate]):
     """
@@ -113,9 +348,11 @@ async def handle_game_score_update(game_id: str, scores: List[ScoreUpdate]):
         dict: 包含处理结果的响应信息
     """
     try:
-        print(f"游戏 {game_id} - 分数更新:")
-        for score in scores:
-            print(f"  玩家: {score.player}, 队伍: {score.team}, 分数: {score.score}")
+        logger.info("游戏 %s - 分数更新: %s 条", game_id, len(scores))
+        event_log.append("score", scores, game_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            for score in scores:
+                logger.debug("  玩家: %s, 队伍: %s, 分数: %s", score.player, score.team, score.score)
         
         # 准备响应数据
         response_data = {
@@ -149,10 +386,11 @@ async def handle_game_score_update(game_id: str, scores: List[ScoreUpdate]):
             "timestamp": datetime.now().isoformat()
         }
         await connection_manager.broadcast(websocket_message)
+        await event_log.sync()
         
         return response_data
     except Exception as e:
-        print(f"处理游戏分数更新时发生错误: {str(e)}")
+        logger.error("处理游戏分数更新时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"处理游戏分数更新失败: {str(e)}")
 
 
@@ -171,6 +409,7 @@ async def get_current_leaderboard(game_id: str):
         # 确保分数引擎设置了正确的游戏
         if score_engine.current_game_id != game_id:
             score_engine.set_current_game(game_id)
+            data_manager.mark_dirty("runawayWarrior")
         
         leaderboard = score_engine.get_current_standings()
         
@@ -181,10 +420,52 @@ async def get_current_leaderboard(game_id: str):
             "leaderboard": leaderboard
         }
     except Exception as e:
-        print(f"获取分数榜时发生错误: {str(e)}")
+        logger.error("获取分数榜时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"获取分数榜失败: {str(e)}")
 
 
+@router.post("/api/roster")
+async def set_team_rosters(rosters: List[TeamRoster]):
+    """
+    预先登记队伍名单
+    名单立即载入当前游戏，并在之后每个游戏开始时载入（覆盖配置文件中同一队伍的 players），
+    使存活、胜利等按队伍结算的积分在玩家首次触发事件前就能覆盖到所有队员
+    
+    参数:
+        rosters (List[TeamRoster]): 队伍名单列表
+    
+    返回:
+        dict: 登记结果
+    """
+    event_log.append("roster", rosters)
+    config = game_config.compiled
+    resolved: Dict[str, List[str]] = {}
+    for roster in rosters:
+        team = config.resolve_team(roster.team)
+        resolved[team.id if team is not None else roster.team] = roster.players
+    score_engine.set_rosters(resolved)
+    logger.info("已登记 %s 支队伍的名单", len(resolved))
+    await event_log.sync()
+    return {
+        "message": "队伍名单登记成功",
+        "success": True,
+        "teams": len(resolved),
+        "players": sum(len(players) for players in resolved.values())
+    }
+
+
+@router.get("/api/roster")
+async def get_team_rosters():
+    """
+    获取当前游戏中各队伍的玩家（包括预先登记与通过事件加入的玩家）
+    """
+    return {
+        "success": True,
+        "game_id": score_engine.current_game_id,
+        "rosters": {team_id: list(players) for team_id, players in score_engine.team_players.items()}
+    }
+
+
 @router.post("/api/{game_id}/set_round")
 async def set_game_round(game_id: str, round_data: dict):
     """
@@ -192,14 +473,19 @@ async def set_game_round(game_id: str, round_data: dict):
     
     参数:
         game_id (str): 游戏的唯一标识符
-        round_data (dict): 包含round字段的数据
+        round_data (dict): 包含round字段的数据，可选 teams 字段指定参赛队伍（如躲避箭对决的两支队伍）
     
     返回:
         dict: 设置结果
     """
+    teams = round_data.get('teams')
+    if teams is not None and (not isinstance(teams, list) or not all(isinstance(t, str) for t in teams)):
+        raise HTTPException(status_code=422, detail="teams 必须是队伍ID列表")
     try:
         round_num = round_data.get('round', 1)
-        score_engine.set_current_game(game_id, round_num)
+        event_log.append("set_round", round_data, game_id)
+        score_engine.set_current_game(game_id, round_num, teams)
+        data_manager.mark_dirty("runawayWarrior")
         
         # 通过WebSocket广播游戏回合变更
         websocket_message = {
@@ -209,6 +495,7 @@ async def set_game_round(game_id: str, round_data: dict):
             "timestamp": datetime.now().isoformat()
         }
         await connection_manager.broadcast(websocket_message)
+        await event_log.sync()
         
         return {
             "message": f"游戏 {game_id} 回合设置为 {round_num}",
@@ -217,7 +504,7 @@ async def set_game_round(game_id: str, round_data: dict):
             "round": round_num
         }
     except Exception as e:
-        print(f"设置游戏回合时发生错误: {str(e)}")
+        logger.error("设置游戏回合时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"设置游戏回合失败: {str(e)}")
 
 
@@ -233,19 +520,13 @@ async def post_bingo_card(card: BingoCard):
     - tasks 每项含: index, x, y, name, type, description, material(可选), count(可选)
     """
     try:
-        # 存储到数据管理器
+        # 存储到数据管理器（物品图片预热与本地化在后台进行，完成后再广播一次，不阻塞接入）
+        event_log.append("bingo_card", card)
         data_manager.update_bingo_card(card)
 
-        # 优先并发预热所有 material 的图片，尽量首帧就有图
-        try:
-            mats = data_manager._extract_bingo_materials(card)
-            await data_manager.warmup_item_images(mats)
-        except Exception as we:
-            print(f"预热 Bingo 物品图片失败: {we}")
-
-        # 通过WebSocket进行一次即时广播（含完整数据，保证前端及时显示）
-        complete_data = data_manager.get_complete_data()
-        await connection_manager.broadcast(complete_data)
+        # 通过WebSocket进行一次即时增量广播，保证前端及时显示
+        await data_manager.broadcast_state()
+        await event_log.sync()
 
         return {
             "message": "Bingo 卡片接收成功",
@@ -253,6 +534,6 @@ async def post_bingo_card(card: BingoCard):
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
-        print(f"接收 Bingo 卡片时发生错误: {str(e)}")
+        logger.error("接收 Bingo 卡片时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"接收 Bingo 卡片失败: {str(e)}")
 
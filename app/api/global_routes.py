@@ -9,8 +9,13 @@ from app.models.models import TeamScore, GlobalEvent, VoteEvent
 from app.core.websocket import connection_manager
 from app.core.tournament_manager import tournament_manager
 from app.core.data_manager import data_manager
+from app.core.config_reloader import reload_config, get_config_status
+from app.core.event_log import event_log
+from app.core.log import get_logger
 from datetime import datetime
 
+logger = get_logger("ingest")
+
 # 创建路由器实例
 router = APIRouter()
 
@@ -28,27 +33,11 @@ async def handle_global_score_update(team_scores: List[TeamScore]):
     """
     try:
         # 移除逐项打印，避免日志刷屏
+        event_log.append("global_score", team_scores)
         
-        # 补充队伍颜色（若未传入），从配置读取
-        from app.core.game_config import game_config
-        teams_cfg = game_config.get_teams()
-        id_to_color = {t['id']: t.get('color') for t in teams_cfg}
-        name_to_id = {t['name']: t['id'] for t in teams_cfg}
-        valid_ids = set(id_to_color.keys())
-
-        normalized_scores: List[TeamScore] = []
-        for ts in team_scores:
-            team_key = ts.team
-            # 兼容：如果传入的是中文队名，转换为标准ID
-            if team_key not in valid_ids and team_key in name_to_id:
-                ts.team = name_to_id[team_key]
-            # 补充颜色
-            if not getattr(ts, 'color', None):
-                setattr(ts, 'color', id_to_color.get(ts.team))
-            normalized_scores.append(ts)
-
-        # 更新数据管理器中的全局积分数据
-        data_manager.update_global_scores(normalized_scores)
+        # 更新数据管理器中的全局积分数据（中文队名与缺省的队伍颜色在构建分段时按当前配置补全）
+        data_manager.update_global_scores(team_scores)
+        await event_log.sync()
         
         # 准备响应数据
         response_data = {
@@ -60,7 +49,7 @@ async def handle_global_score_update(team_scores: List[TeamScore]):
         
         return response_data
     except Exception as e:
-        print(f"处理全局分数更新时发生错误: {str(e)}")
+        logger.error("处理全局分数更新时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"处理全局分数更新失败: {str(e)}")
 
 
@@ -77,9 +66,11 @@ async def handle_global_event(event: GlobalEvent):
     """
     try:
         if event.game:
-            print(f"全局事件 - 状态: {event.status}, 游戏: {event.game.name}, 回合: {event.game.round}")
+            logger.info("全局事件 - 状态: %s, 游戏: %s, 回合: %s", event.status, event.game.name, event.game.round)
         else:
-            print(f"全局事件 - 状态: {event.status}, 无具体游戏信息")
+            logger.info("全局事件 - 状态: %s, 无具体游戏信息", event.status)
+        
+        event_log.append("global_event", event)
         
         # 如果状态是gaming，只设置当前游戏，不自动添加到选中列表
         if event.status == "gaming" and event.game:
@@ -96,7 +87,8 @@ async def handle_global_event(event: GlobalEvent):
                 "timestamp": datetime.now().isoformat()
             })
         except Exception as be:
-            print(f"广播全局事件失败: {be}")
+            logger.warning("广播全局事件失败: %s", be)
+        await event_log.sync()
 
         # 准备响应数据
         response_data = {
@@ -107,7 +99,7 @@ async def handle_global_event(event: GlobalEvent):
         
         return response_data
     except Exception as e:
-        print(f"处理全局事件时发生错误: {str(e)}")
+        logger.error("处理全局事件时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"处理全局事件失败: {str(e)}")
 
 
@@ -123,13 +115,14 @@ async def handle_vote_event(vote_data: VoteEvent):
         dict: 包含处理结果的响应信息
     """
     try:
-        print(f"投票事件 - 剩余时间: {vote_data.time} 秒")
+        logger.info("投票事件 - 剩余时间: %s 秒", vote_data.time)
+        event_log.append("vote", vote_data)
         total_tickets = 0
         winning_game = None
         max_tickets = 0
         
         for vote in vote_data.votes:
-            print(f"  游戏: {vote.game}, 票数: {vote.ticket}")
+            logger.debug("  游戏: %s, 票数: %s", vote.game, vote.ticket)
             total_tickets += vote.ticket
             if vote.ticket > max_tickets:
                 max_tickets = vote.ticket
@@ -138,10 +131,11 @@ async def handle_vote_event(vote_data: VoteEvent):
         # 如果投票时间结束且有获胜游戏，将其添加到锦标赛顺序中
         if vote_data.time <= 0 and winning_game:
             tournament_manager.add_selected_game(winning_game)
-            print(f"投票结束，获胜游戏: {winning_game}")
+            logger.info("投票结束，获胜游戏: %s", winning_game)
         
         # 更新数据管理器中的投票数据
         data_manager.update_vote_data(vote_data)
+        await event_log.sync()
         
         # 准备响应数据
         response_data = {
@@ -152,7 +146,7 @@ async def handle_vote_event(vote_data: VoteEvent):
         
         return response_data
     except Exception as e:
-        print(f"处理投票事件时发生错误: {str(e)}")
+        logger.error("处理投票事件时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"处理投票事件失败: {str(e)}")
 
 
@@ -165,7 +159,9 @@ async def reset_tournament():
         dict: 包含重置结果的响应信息
     """
     try:
+        event_log.append("tournament_reset", {})
         tournament_manager.reset_tournament()
+        await event_log.sync()
         
         response_data = {
             "message": "锦标赛状态重置成功",
@@ -183,7 +179,7 @@ async def reset_tournament():
         
         return response_data
     except Exception as e:
-        print(f"重置锦标赛状态时发生错误: {str(e)}")
+        logger.error("重置锦标赛状态时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"重置锦标赛状态失败: {str(e)}")
 
 
@@ -207,7 +203,7 @@ async def get_tournament_status():
         
         return response_data
     except Exception as e:
-        print(f"获取锦标赛状态时发生错误: {str(e)}")
+        logger.error("获取锦标赛状态时发生错误: %s", e)
         raise HTTPException(status_code=500, detail=f"获取锦标赛状态失败: {str(e)}")
 
 
@@ -233,4 +229,28 @@ async def trigger_bingo_localize():
         result = await data_manager.localize_bingo_now()
         return { "success": True, "result": result }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"触发 Bingo 本地化失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"触发 Bingo 本地化失败: {str(e)}")
+
+@router.post("/api/config/reload")
+async def trigger_config_reload():
+    """
+    重新加载 tournament_config.yml（队伍颜色、积分规则、轮次倍数等）
+    
+    配置在后台解析校验后整体替换，不影响积分引擎状态与正在进行的广播；校验失败时保留原配置并返回 422
+    """
+    result = await reload_config("manual")
+    if not result["success"]:
+        raise HTTPException(status_code=422, detail=f"配置文件无效，未重新加载: {result['error']}")
+    return {
+        "message": "配置已是最新" if not result["changed"] else "配置重新加载成功",
+        "success": True,
+        "version": result["version"],
+        "changed": result["changed"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/api/config/status")
+async def get_config_reload_status():
+    """返回当前配置版本、加载时间、最近一次加载错误与文件监视状态。"""
+    return {"success": True, "config": get_config_status(), "timestamp": datetime.now().isoformat()}
@@ -0,0 +1,305 @@
+"""
+接入 WebSocket 路由模块
+游戏服务器通过一条长连接推送事件、分数、全局状态、投票与 Bingo 卡片，
+每条消息交给与 REST 接口相同的处理函数，并逐条回复 ack
+
+消息格式:
+    {"type": "event", "id": 1, "game_id": "battle_box", "data": {...}}
+    回执 {"type": "ack", "id": 1, "success": true, "result": {...}}
+    失败 {"type": "ack", "id": 1, "success": false, "status": 422, "error": "..."}
+
+同一连接上的消息按接收顺序依次处理；队列模式（INGEST_MODE=queue）下其他类型的消息
+也排在接入队列中已有的游戏事件之后执行，因此跨类型的先后顺序同样得到保证。
+连接按流水线处理：一条消息更新完状态后不等待事件日志落盘就开始处理下一条，
+回执按接收顺序在所在批次落盘后发出，连续到达的消息因此共用一次 fsync（group commit）
+
+启动时 replay_event_log() 把事件日志（app.core.event_log）中的记录按顺序交给同一组处理函数，重建内存状态
+
+环境变量:
+    INGEST_TOKEN            连接令牌（Authorization: Bearer <令牌> 或 ?token=），未设置时拒绝所有接入连接
+    INGEST_PIPELINE_DEPTH   每个连接最多有多少条消息在等待落盘与回执（默认 256），超过后暂停读取该连接
+"""
+
+import asyncio
+import hmac
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from pydantic import TypeAdapter, ValidationError
+
+from app.api import game_routes, global_routes
+from app.models.models import GameEvent, ScoreUpdate, TeamScore, GlobalEvent, VoteEvent, BingoCard, TeamRoster
+from app.core.data_manager import data_manager
+from app.core.dedupe import event_dedupe
+from app.core.event_log import event_log, EventLogWriteError
+from app.core.ingest_queue import ingest_queue, IngestQueueFull
+from app.core.json_codec import dumps, loads
+from app.core.score_engine import score_engine
+from app.core.tournament_manager import tournament_manager
+from app.core.log import get_logger
+
+logger = get_logger("ingest")
+
+router = APIRouter()
+
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN", "")
+INGEST_PIPELINE_DEPTH = max(1, int(os.environ.get("INGEST_PIPELINE_DEPTH", "256")))
+
+_score_updates = TypeAdapter(List[ScoreUpdate])
+_team_scores = TypeAdapter(List[TeamScore])
+_rosters = TypeAdapter(List[TeamRoster])
+
+# 统计（connections 为当前连接数）
+_stats = {
+    "connections": 0,
+    "rejected_connections": 0,
+    "messages": 0,
+    "errors": 0,
+}
+
+
+def _require_game_id(message: Dict[str, Any]) -> str:
+    game_id = message.get("game_id")
+    if not game_id or not isinstance(game_id, str):
+        raise HTTPException(status_code=400, detail="缺少 game_id")
+    return game_id
+
+
+async def _event(message: Dict[str, Any]) -> Dict[str, Any]:
+    game_id = _require_game_id(message)
+    return await game_routes.handle_game_event(game_id, GameEvent.model_validate(message.get("data")), Response())
+
+
+async def _score(message: Dict[str, Any]) -> Dict[str, Any]:
+    game_id = _require_game_id(message)
+    return await game_routes.handle_game_score_update(game_id, _score_updates.validate_python(message.get("data")))
+
+
+async def _global_score(message: Dict[str, Any]) -> Dict[str, Any]:
+    return await global_routes.handle_global_score_update(_team_scores.validate_python(message.get("data")))
+
+
+async def _global_event(message: Dict[str, Any]) -> Dict[str, Any]:
+    return await global_routes.handle_global_event(GlobalEvent.model_validate(message.get("data")))
+
+
+async def _vote(message: Dict[str, Any]) -> Dict[str, Any]:
+    return await global_routes.handle_vote_event(VoteEvent.model_validate(message.get("data")))
+
+
+async def _bingo_card(message: Dict[str, Any]) -> Dict[str, Any]:
+    return await game_routes.post_bingo_card(BingoCard.model_validate(message.get("data")))
+
+
+async def _set_round(message: Dict[str, Any]) -> Dict[str, Any]:
+    game_id = _require_game_id(message)
+    return await game_routes.set_game_round(game_id, message.get("data") or {})
+
+
+async def _roster(message: Dict[str, Any]) -> Dict[str, Any]:
+    return await game_routes.set_team_rosters(_rosters.validate_python(message.get("data")))
+
+
+# 消息类型 -> 处理函数（对应的 REST 接口）
+INGEST_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "event": _event,                # POST /api/{game_id}/event
+    "score": _score,                # POST /api/{game_id}/score
+    "global_score": _global_score,  # POST /api/game/score
+    "global_event": _global_event,  # POST /api/game/event
+    "vote": _vote,                  # POST /api/vote/event
+    "bingo_card": _bingo_card,      # POST /api/bingo/card
+    "set_round": _set_round,        # POST /api/{game_id}/set_round
+    "roster": _roster,              # POST /api/roster
+}
+
+
+# 回放事件日志时只恢复状态：游戏事件不解析物品图片、不广播，Bingo 卡片不预热图片、不调用本地化，
+# 回放结束后再为最终状态统一刷新；其余消息的处理函数不访问网络，沿用接入时的处理函数
+async def _replay_event(record: Dict[str, Any]):
+    # 日志中的事件已经通过查重，直接恢复（不经过接入队列），同时恢复去重索引
+    game_id = _require_game_id(record)
+    event = GameEvent.model_validate(record.get("data"))
+    event_dedupe.add(event_dedupe.key_for(game_id, event))
+    error = game_routes._restore_game_event(game_id, event)
+    if error is not None:
+        raise ValueError(error)
+
+
+async def _replay_bingo_card(record: Dict[str, Any]):
+    data_manager.update_bingo_card(BingoCard.model_validate(record.get("data")), prefetch=False)
+
+
+async def _replay_tournament_reset(record: Dict[str, Any]):
+    tournament_manager.reset_tournament()
+
+
+REPLAY_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+    **INGEST_HANDLERS,
+    "event": _replay_event,
+    "bingo_card": _replay_bingo_card,
+    "tournament_reset": _replay_tournament_reset,
+}
+
+
+async def replay_event_log() -> int:
+    """
+    按顺序回放事件日志，重建分数引擎与数据管理器的状态（启动时、开始接入之前调用）
+
+    返回:
+        int: 回放的记录数
+    """
+    if not event_log.enabled:
+        return 0
+    started = time.monotonic()
+    count = 0
+    failed = 0
+    event_log.replaying = True
+    try:
+        for record in event_log.records():
+            handler = REPLAY_HANDLERS.get(record.get("type"))
+            if handler is None:
+                failed += 1
+                logger.warning("事件日志 #%s 的消息类型未知: %s", record.get("seq"), record.get("type"))
+                continue
+            try:
+                await handler(record)
+                count += 1
+            except Exception as e:
+                failed += 1
+                logger.warning("回放事件日志 #%s 失败: %s", record.get("seq"), e)
+    finally:
+        event_log.replaying = False
+    if count:
+        # 按回放后的最终状态刷新分数榜，并在后台为最后一张 Bingo 卡片预热图片与本地化
+        if score_engine.current_game_id:
+            data_manager.update_current_game_score(score_engine.get_current_standings())
+        if data_manager.bingo_card is not None:
+            data_manager.start_bingo_prefetch(data_manager.bingo_card)
+    event_log.replayed = count
+    if count or failed:
+        logger.info("已回放事件日志 %s 条（失败 %s 条），耗时 %.2f 秒", count, failed, time.monotonic() - started)
+    return count
+
+
+def _authorized(websocket: WebSocket, token: Optional[str]) -> bool:
+    if not INGEST_TOKEN:
+        return False
+    header = websocket.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        token = header[7:].strip()
+    return bool(token) and hmac.compare_digest(token.encode(), INGEST_TOKEN.encode())
+
+
+async def _dispatch(message: Dict[str, Any]) -> Dict[str, Any]:
+    """处理一条接入消息，返回回执（在 event_log.deferred_sync() 中调用时不等待落盘）"""
+    msg_type = message.get("type")
+    ack: Dict[str, Any] = {"type": "ack", "id": message.get("id"), "msg_type": msg_type}
+    handler = INGEST_HANDLERS.get(msg_type)
+    if handler is None:
+        ack.update(success=False, status=400, error=f"未知的消息类型: {msg_type}")
+        return ack
+    try:
+        if ingest_queue.enabled and msg_type != "event":
+            # 游戏事件由处理函数自行入队；其他消息排在已入队的事件之后执行
+            result = await ingest_queue.call(handler, message)
+        else:
+            result = await handler(message)
+        ack.update(success=True, result=result)
+    except ValidationError as ve:
+        ack.update(success=False, status=422, error="数据校验失败",
+                   details=ve.errors(include_url=False, include_context=False))
+    except HTTPException as he:
+        ack.update(success=False, status=he.status_code, error=he.detail)
+    except IngestQueueFull as qe:
+        ack.update(success=False, status=503, error=str(qe))
+    except Exception as e:
+        logger.warning("处理接入消息失败: %s", e)
+        ack.update(success=False, status=500, error=str(e))
+    if not ack["success"]:
+        _stats["errors"] += 1
+    return ack
+
+
+@router.websocket("/ws/ingest")
+async def ingest_websocket(websocket: WebSocket, token: str = Query(None)):
+    """
+    游戏服务器接入端点
+
+    认证：请求头 Authorization: Bearer <INGEST_TOKEN>，或查询参数 ?token=
+    支持的消息类型：event、score、global_score、global_event、vote、bingo_card、set_round、roster，另可发送 ping
+    """
+    if not _authorized(websocket, token):
+        _stats["rejected_connections"] += 1
+        logger.warning("拒绝未认证的接入连接: %s", websocket.client)
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    _stats["connections"] += 1
+    logger.info("游戏服务器已接入: %s", websocket.client)
+    # 待发送的回执：(回执, 发送前需要落盘的序号)，由发送任务按顺序等待落盘后发出
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=INGEST_PIPELINE_DEPTH)
+    sender = asyncio.create_task(_send_acks(websocket, outbox))
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            raw = frame.get("text")
+            if raw is None:
+                raw = frame.get("bytes")
+            try:
+                message = loads(raw)
+                if not isinstance(message, dict):
+                    raise ValueError("消息必须是 JSON 对象")
+            except ValueError as e:
+                _stats["errors"] += 1
+                await outbox.put(({"type": "ack", "id": None, "success": False, "status": 400,
+                                   "error": f"无效的消息: {e}"}, 0))
+                continue
+
+            if message.get("type") == "ping":
+                await outbox.put(({"type": "pong", "id": message.get("id"),
+                                   "timestamp": datetime.now().isoformat()}, 0))
+                continue
+
+            _stats["messages"] += 1
+            with event_log.deferred_sync() as target:
+                ack = await _dispatch(message)
+            await outbox.put((ack, target[0] if ack["success"] else 0))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning("接入连接错误: %s", e)
+    finally:
+        sender.cancel()
+        _stats["connections"] -= 1
+        logger.info("游戏服务器断开: %s", websocket.client)
+
+
+async def _send_acks(websocket: WebSocket, outbox: asyncio.Queue):
+    """按接收顺序等待每条消息的记录落盘后发送回执（连接关闭后继续取出回执并丢弃，避免读取循环阻塞）"""
+    closed = False
+    while True:
+        ack, seq = await outbox.get()
+        if closed:
+            continue
+        if seq:
+            try:
+                await event_log.sync(seq)
+            except EventLogWriteError as e:
+                _stats["errors"] += 1
+                ack = {"type": "ack", "id": ack.get("id"), "msg_type": ack.get("msg_type"),
+                       "success": False, "status": 500, "error": str(e)}
+        try:
+            await websocket.send_text(dumps(ack))
+        except Exception as e:
+            closed = True
+            logger.debug("发送接入回执失败: %s", e)
+
+
+def get_ingest_socket_stats() -> Dict[str, Any]:
+    return dict(_stats)
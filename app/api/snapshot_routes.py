@@ -0,0 +1,89 @@
+"""
+快照路由模块
+为轮询型客户端（直播叠加层、记分牌等）提供 HTTP 完整快照，支持 ETag 条件请求与长轮询
+"""
+
+import asyncio
+import os
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from app.core.data_manager import data_manager, STATE_SECTIONS
+from app.core.websocket import connection_manager
+
+# 创建路由器实例
+router = APIRouter()
+
+# 长轮询最长等待时间（秒）
+SNAPSHOT_MAX_WAIT = float(os.environ.get("SNAPSHOT_MAX_WAIT", "30"))
+# 快照响应的缓存策略：允许代理/CDN 缓存，但每次都需用 ETag 重新验证
+SNAPSHOT_CACHE_CONTROL = os.environ.get("SNAPSHOT_CACHE_CONTROL", "public, no-cache")
+
+
+def _parse_sections(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """解析逗号分隔的分段名，未指定时返回 None（全部分段）"""
+    if not raw:
+        return None
+    names = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = names - set(STATE_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的分段: {', '.join(sorted(unknown))}")
+    # 按固定顺序排列，相同组合共享同一份缓存
+    return tuple(name for name in STATE_SECTIONS if name in names)
+
+
+def _etag(names: Optional[Tuple[str, ...]]) -> str:
+    # 带上消息流 ID，服务重启后旧的 ETag 不会误判为未变化；
+    # 多进程分发的工作进程使用主进程同步来的流 ID 与版本，同一状态在各工作进程上 ETag 相同
+    stream_id = data_manager.remote_stream_id or connection_manager.stream_id
+    return f'"{stream_id}-{data_manager.section_version(names)}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+@router.get("/api/snapshot")
+async def get_snapshot(
+    request: Request,
+    sections: Optional[str] = Query(None, description="只返回指定分段（逗号分隔），如 globalScores,gameStatus"),
+    wait: float = Query(0, ge=0, description="长轮询：ETag 未变化时最多等待的秒数"),
+):
+    """
+    获取完整状态快照（与 WebSocket 的 full_data_update 消息格式相同）
+
+    响应带有基于状态版本的 ETag；请求携带 If-None-Match 且状态未变化时返回 304。
+    同时指定 wait 时，服务端会等待状态变化后再返回，超时仍未变化则返回 304。
+    """
+    names = _parse_sections(sections)
+    if_none_match = request.headers.get("if-none-match")
+    etag = _etag(names)
+
+    if _matches(if_none_match, etag) and wait > 0:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, SNAPSHOT_MAX_WAIT)
+        while etag == _etag(names):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await data_manager.wait_for_change(remaining)
+        etag = _etag(names)
+
+    headers = {"ETag": etag, "Cache-Control": SNAPSHOT_CACHE_CONTROL}
+    if _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=data_manager.get_snapshot_text(names),
+        media_type="application/json",
+        headers=headers,
+    )
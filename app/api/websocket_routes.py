@@ -5,47 +5,67 @@ WebSocket路由模块
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from datetime import datetime
-from app.core.websocket import connection_manager
+from app.core.websocket import connection_manager, parse_channels, frame_compressor
 from app.core.data_manager import data_manager
+from app.core.event_batcher import game_event_batcher
+from app.core.ingest_queue import ingest_queue
+from app.core.dedupe import event_dedupe
+from app.core.event_log import event_log
+from app.api.ingest_routes import get_ingest_socket_stats
+from app.core.fanout import get_fanout_stats
+from app.core.log import get_logger, get_log_stats
+from app.core.json_codec import loads, json_backend
 import asyncio
-import json
+
+logger = get_logger("websocket")
 
 router = APIRouter()
 
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None)):
+async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None), channels: str = Query(None),
+                             last_seq: int = Query(None), stream: str = Query(None)):
     """
     WebSocket连接端点
     客户端通过此端点建立长连接接收实时数据
+    可通过 channels 参数（逗号分隔）只订阅部分频道：scores, events, bingo, vote, runaway, status
+    断线重连时携带 last_seq 与 stream，服务端只补发错过的消息
     """
-    await connection_manager.connect(websocket, client_id)
+    await connection_manager.connect(websocket, client_id, parse_channels(channels))
     
     # 如果这是第一个连接，启动定时广播
     if connection_manager.get_connection_count() == 1:
-        print("启动定时广播调度器")
+        logger.info("启动定时广播调度器")
         await data_manager.start_broadcast_scheduler()
     
     try:
         # 发送连接成功消息
+        resumed = connection_manager.can_resume(last_seq, stream)
         await connection_manager.send_personal_message({
             "type": "connection",
             "status": "connected",
             "message": "连接成功",
             "client_id": connection_manager.client_info[websocket]["client_id"],
+            "stream_id": connection_manager.stream_id,
+            "seq": connection_manager.seq,
+            "resumed": resumed,
             "timestamp": connection_manager.client_info[websocket]["connected_at"]
         }, websocket)
         
-        # 立即发送一次完整数据
-        complete_data = data_manager.get_complete_data()
-        await connection_manager.send_personal_message(complete_data, websocket)
+        # 补发错过的消息；无法续传时立即发送一次完整数据
+        if resumed:
+            connection_manager.replay(websocket, last_seq)
+        else:
+            await connection_manager.send_personal_message(data_manager.get_snapshot(), websocket)
         
         # 保持连接活跃，监听客户端消息
         while True:
             try:
                 # 等待客户端消息（心跳包等）
                 data = await websocket.receive_text()
-                message = json.loads(data)
+                message = loads(data)
+                # 任何入站消息都说明连接仍然存活
+                connection_manager.touch(websocket, ping=message.get("type") in ("ping", "pong"))
                 
                 # 处理心跳包
                 if message.get("type") == "ping":
@@ -55,6 +75,10 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None))
                         "timestamp": datetime.now().isoformat()
                     }, websocket)
                 
+                # 服务端心跳的回应，只需更新活跃时间
+                elif message.get("type") == "pong":
+                    pass
+                
                 # 处理客户端请求连接状态
                 elif message.get("type") == "status":
                     await connection_manager.send_personal_message({
@@ -62,6 +86,19 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None))
                         "connection_count": connection_manager.get_connection_count(),
                         "client_info": connection_manager.client_info[websocket]
                     }, websocket)
+                # 客户端修改订阅频道，随后发送一份按新订阅裁剪的完整快照
+                elif message.get("type") == "subscribe":
+                    subscribed = parse_channels(message.get("channels"))
+                    connection_manager.set_subscription(websocket, subscribed)
+                    await connection_manager.send_personal_message({
+                        "type": "subscribe_ack",
+                        "channels": sorted(subscribed),
+                        "timestamp": datetime.now().isoformat()
+                    }, websocket)
+                    await connection_manager.send_personal_message(data_manager.get_snapshot(), websocket)
+                # 客户端发现增量版本不连续时请求完整快照
+                elif message.get("type") == "resync":
+                    await connection_manager.send_personal_message(data_manager.get_snapshot(), websocket)
                 # 接收观赛ID，记录到客户端信息，便于统计
                 elif message.get("type") == "viewer_id":
                     vid = message.get("viewer_id")
@@ -70,7 +107,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None))
                     try:
                         data_manager.record_viewer_id(vid, client_id=connection_manager.client_info[websocket]["client_id"])
                     except Exception as e:
-                        print(f"记录观赛ID失败: {e}")
+                        logger.warning("记录观赛ID失败: %s", e)
                     await connection_manager.send_personal_message({
                         "type": "viewer_id_ack",
                         "viewer_id": connection_manager.client_info[websocket]["viewer_id"],
@@ -85,17 +122,17 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(None))
         connection_manager.disconnect(websocket)
         
         # 如果没有连接了，停止定时广播
-        if connection_manager.get_connection_count() == 0:
-            print("停止定时广播调度器")
+        if not connection_manager.has_audience():
+            logger.info("停止定时广播调度器")
             await data_manager.stop_broadcast_scheduler()
             
     except Exception as e:
-        print(f"WebSocket错误: {e}")
+        logger.warning("WebSocket错误: %s", e)
         connection_manager.disconnect(websocket)
         
         # 如果没有连接了，停止定时广播
-        if connection_manager.get_connection_count() == 0:
-            print("停止定时广播调度器")
+        if not connection_manager.has_audience():
+            logger.info("停止定时广播调度器")
             await data_manager.stop_broadcast_scheduler()
 
 
@@ -106,6 +143,17 @@ async def get_websocket_stats():
     """
     return {
         "connection_count": connection_manager.get_connection_count(),
+        "heartbeat": connection_manager.get_heartbeat_stats(),
+        "send_queues": connection_manager.get_queue_stats(),
+        "replay": connection_manager.get_replay_stats(),
+        "scheduler": data_manager.tick_scheduler.get_stats(),
+        "compression": frame_compressor.stats(),
+        "event_batching": game_event_batcher.get_stats(),
+        "ingest": {**ingest_queue.get_stats(), "dedupe": event_dedupe.get_stats(), "socket": get_ingest_socket_stats(),
+                   "event_log": event_log.get_stats()},
+        "fanout": get_fanout_stats(),
+        "logging": get_log_stats(),
+        "json_backend": json_backend,
         "clients": connection_manager.get_client_list()
     }
 
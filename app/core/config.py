@@ -5,6 +5,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.json_codec import FastJSONResponse
+
 
 def create_app() -> FastAPI:
     """
@@ -15,7 +17,9 @@ def create_app() -> FastAPI:
         description="用于游戏事件、分数更新和全局状态管理的API服务",
         version="1.0.0",
         docs_url="/docs",
-        redoc_url="/redoc"
+        redoc_url="/redoc",
+        # API 响应统一使用快速 JSON 编码层
+        default_response_class=FastJSONResponse
     )
     
     # 添加CORS中间件
@@ -0,0 +1,125 @@
+"""
+配置热更新
+tournament_config.yml 修改后（文件监视或管理接口触发）在线程池中解析、校验并编译，
+成功后一次性替换 game_config 的配置快照，重新构建依赖配置的状态分段（全局积分榜的队伍 ID 与颜色），
+并向所有客户端广播 config_changed；解析失败时保留原配置。替换不会重置积分引擎状态，也不影响正在进行的接入与广播。
+
+环境变量:
+    CONFIG_WATCH_INTERVAL   配置文件检查间隔（秒，默认 2），0 表示不监视文件，只能通过接口触发
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.game_config import game_config
+from app.core.data_manager import data_manager
+from app.core.websocket import connection_manager
+from app.core.log import get_logger
+
+logger = get_logger("config")
+
+CONFIG_WATCH_INTERVAL = max(0.0, float(os.environ.get("CONFIG_WATCH_INTERVAL", "2")))
+
+_reload_lock: Optional[asyncio.Lock] = None
+_watch_task: Optional[asyncio.Task] = None
+
+
+def _file_signature() -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(game_config.config_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def reload_config(reason: str = "manual") -> Dict[str, Any]:
+    """
+    重新加载配置文件
+
+    参数:
+        reason (str): 触发原因（manual / watch），记录在日志与广播中
+    返回:
+        dict: success、version、changed（发生变化的顶层配置项），失败时带 error
+    """
+    global _reload_lock
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    async with _reload_lock:
+        loop = asyncio.get_running_loop()
+        try:
+            # YAML 解析与规则校验在线程池中完成，不阻塞事件循环
+            config, compiled = await loop.run_in_executor(None, game_config.parse)
+        except Exception as e:
+            game_config.last_error = str(e)
+            logger.warning("配置重新加载失败，继续使用版本 %s: %s", game_config.version, e)
+            return {"success": False, "version": game_config.version, "error": str(e)}
+
+        previous = game_config.config
+        changed = sorted(key for key in set(previous) | set(config) if previous.get(key) != config.get(key))
+        if not changed:
+            game_config.last_error = None
+            return {"success": True, "version": game_config.version, "changed": []}
+
+        game_config.apply(config, compiled)
+        # 全局积分榜的队伍 ID 与颜色按配置生成，替换后重新构建
+        data_manager.mark_dirty("globalScores")
+        logger.info("配置已重新加载（%s）: 版本 %s, 变化: %s", reason, game_config.version, ", ".join(changed))
+
+        try:
+            await connection_manager.broadcast({
+                "type": "config_changed",
+                "version": game_config.version,
+                "changed": changed,
+                "reason": reason,
+                "teams": [team.model_dump() for team in compiled.teams],
+                "timestamp": datetime.now().isoformat()
+            })
+        except Exception as be:
+            logger.warning("广播配置变更失败: %s", be)
+        return {"success": True, "version": game_config.version, "changed": changed}
+
+
+async def _watch_loop(interval: float, signature: Optional[Tuple[int, int]]):
+    while True:
+        await asyncio.sleep(interval)
+        current = _file_signature()
+        if current is None or current == signature:
+            continue
+        signature = current
+        try:
+            await reload_config("watch")
+        except Exception as e:
+            logger.warning("配置文件监视出错: %s", e)
+
+
+def start_config_watch():
+    """启动配置文件监视（CONFIG_WATCH_INTERVAL 为 0 时不启动）"""
+    global _watch_task
+    if CONFIG_WATCH_INTERVAL <= 0 or (_watch_task is not None and not _watch_task.done()):
+        return
+    _watch_task = asyncio.create_task(_watch_loop(CONFIG_WATCH_INTERVAL, _file_signature()))
+    logger.info("监视配置文件 %s（每 %s 秒检查）", game_config.config_path, CONFIG_WATCH_INTERVAL)
+
+
+async def stop_config_watch():
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+
+
+def get_config_status() -> Dict[str, Any]:
+    return {
+        "path": str(game_config.config_path),
+        "version": game_config.version,
+        "loaded_at": game_config.loaded_at,
+        "last_error": game_config.last_error,
+        "watching": _watch_task is not None and not _watch_task.done(),
+        "watch_interval": CONFIG_WATCH_INTERVAL,
+    }
@@ -5,17 +5,138 @@
 """
 
 import asyncio
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Set, Tuple
 from pathlib import Path
 import os
 import json
 from datetime import datetime
 from app.models.models import TeamScore, GameEvent, VoteEvent, GlobalEvent, BingoCard
-from app.core.websocket import connection_manager
+from app.core.websocket import connection_manager, PreparedMessage
 from app.core.tournament_manager import tournament_manager
+from app.core.game_config import game_config
 from app.core.score_engine import score_engine
+from app.core.tick_scheduler import TickScheduler
+from app.core.log import get_logger
+from app.core.json_codec import dumps
 import httpx
 
+logger = get_logger("data")
+
+
+# 状态分段（同时也是完整快照 data 中的键顺序）
+STATE_SECTIONS = (
+    "globalScores",
+    "currentGameScore",
+    "bingoCard",
+    "itemImages",
+    "currentVote",
+    "gameStatus",
+    "recentEvents",
+    "connectionStatus",
+    "runawayWarrior",
+)
+
+# 分段当前不适用（例如非跑路战士时的 runawayWarrior）
+_ABSENT = object()
+
+# 分段 -> 所属频道；None 表示对所有订阅者发送
+SECTION_CHANNELS: Dict[str, Optional[frozenset]] = {
+    "globalScores": frozenset({"scores"}),
+    "currentGameScore": frozenset({"scores"}),
+    "bingoCard": frozenset({"bingo"}),
+    "itemImages": frozenset({"bingo", "events"}),
+    "currentVote": frozenset({"vote"}),
+    "gameStatus": frozenset({"status"}),
+    "recentEvents": frozenset({"events"}),
+    "connectionStatus": None,
+    "runawayWarrior": frozenset({"runaway"}),
+}
+
+
+class StateMessage(PreparedMessage):
+    """
+    状态消息（完整快照或增量更新）
+    按订阅频道裁剪分段，每个订阅集合只拼接、编码一次
+    """
+
+    # 状态消息不原样发布给工作进程，由 broadcast_state 按分段同步
+    replicated = False
+
+    __slots__ = ("message_type", "seq", "version", "base_version", "sections", "fragments", "removed", "timestamp",
+                 "_group_versions", "_variants")
+
+    def __init__(self, msg_type: str, version: int, sections: Dict[str, Any], fragments: Dict[str, str],
+                 timestamp: str, *, base_version: Optional[int] = None, removed: Optional[List[str]] = None,
+                 group_versions: Optional[Dict[frozenset, int]] = None):
+        self.message_type = msg_type
+        self.seq: Optional[int] = None
+        self.version = version
+        self.base_version = base_version
+        self.sections = sections
+        self.fragments = fragments
+        self.removed = removed
+        self.timestamp = timestamp
+        # 各订阅集合上一次收到增量的版本，用于计算裁剪后增量的 base_version
+        self._group_versions = group_versions
+        self._variants: Dict[frozenset, Optional[PreparedMessage]] = {}
+        message, text = self._render(list(sections.keys()), removed, base_version)
+        super().__init__(message, text, channels=None)
+
+    def _render(self, names: List[str], removed: Optional[List[str]], base_version: Optional[int]):
+        """由已编码的分段片段拼接出消息文本，避免整包重新序列化"""
+        message: Dict[str, Any] = {}
+        head = "{"
+        if self.seq is not None:
+            message["seq"] = self.seq
+            head += f'"seq":{self.seq},'
+        message.update({"type": self.message_type, "version": self.version})
+        head += f'"type":"{self.message_type}","version":{self.version},'
+        if base_version is not None:
+            message["base_version"] = base_version
+            head += f'"base_version":{base_version},'
+        message["data"] = {name: self.sections[name] for name in names}
+        text = head + '"data":{' + ",".join(f'"{name}":{self.fragments[name]}' for name in names) + "}"
+        if removed is not None:
+            message["removed"] = removed
+            text += f',"removed":{dumps(removed)}'
+        message["timestamp"] = self.timestamp
+        text += f',"timestamp":{dumps(self.timestamp)}}}'
+        return message, text
+
+    def stamp(self, seq: int):
+        self.seq = seq
+        super().stamp(seq)
+
+    def for_channels(self, subscribed: frozenset) -> Optional[PreparedMessage]:
+        if subscribed in self._variants:
+            return self._variants[subscribed]
+
+        def wanted(name: str) -> bool:
+            channels = SECTION_CHANNELS.get(name)
+            return channels is None or bool(channels & subscribed)
+
+        names = [name for name in self.sections if wanted(name)]
+        removed = [name for name in self.removed if wanted(name)] if self.removed is not None else None
+        variant: Optional[PreparedMessage]
+        if self.base_version is None:
+            variant = self if len(names) == len(self.sections) else PreparedMessage(*self._render(names, None, None), channels=None)
+        elif not names and not removed:
+            # 与该订阅集合无关的增量直接跳过
+            variant = None
+        else:
+            base_version = self.base_version
+            if self._group_versions is not None:
+                base_version = min(base_version, self._group_versions.get(subscribed, base_version))
+                # 续传补发旧消息时不能回退该订阅集合的版本记录
+                if self.version > self._group_versions.get(subscribed, -1):
+                    self._group_versions[subscribed] = self.version
+            if base_version == self.base_version and len(names) == len(self.sections) and removed == self.removed:
+                variant = self
+            else:
+                variant = PreparedMessage(*self._render(names, removed, base_version), channels=None)
+        self._variants[subscribed] = variant
+        return variant
+
 
 class DataManager:
     def __init__(self):
@@ -36,6 +157,39 @@ class DataManager:
         
         # 广播任务引用
         self.broadcast_task = None
+        # 广播节拍调度器（按游戏状态调整频率）
+        self.tick_scheduler = TickScheduler()
+
+        # 版本化状态：按分段记录上次广播的内容，只广播发生变化的分段
+        self.state_version: int = 0
+        self._broadcast_version: int = 0
+        self._sections: Dict[str, Any] = {}
+        # 分段编码缓存：分段名 -> 已编码的 JSON 文本
+        self._section_json: Dict[str, str] = {}
+        self._pending_changes: Set[str] = set()
+        self._pending_removed: Set[str] = set()
+        # 各订阅集合最近一次收到增量的版本
+        self._group_versions: Dict[frozenset, int] = {}
+        # 脏标记：各更新方法标记受影响的分段，未标记的分段不会重新构建
+        self._dirty_sections: Set[str] = set(STATE_SECTIONS)
+        self._last_connection_count: int = -1
+        # 完整快照缓存：版本未变化时复用
+        self._snapshot: Optional[StateMessage] = None
+        self._snapshot_version: int = -1
+        # 按分段组合裁剪的快照文本（HTTP 快照接口），随快照一起失效
+        self._snapshot_views: Dict[Tuple[str, ...], str] = {}
+        self._snapshot_views_of: Optional[StateMessage] = None
+        # 各分段最近一次变化时的状态版本（用于按分段计算 ETag）
+        self._section_versions: Dict[str, int] = {}
+        # 长轮询等待的状态变化事件（有分段被标记为脏时触发）
+        self._change_event: Optional[asyncio.Event] = None
+        # 多进程分发的工作进程中，状态分段来自主进程（None 表示由本进程维护）
+        self._remote_sections: Optional[Dict[str, Any]] = None
+        # 工作进程中主进程同步来的消息流 ID 与各分段版本（快照 ETag 据此计算，各工作进程一致）
+        self.remote_stream_id: Optional[str] = None
+        self._remote_versions: Dict[str, int] = {}
+        # 慢速客户端的发送队列溢出时，用最新快照替换积压消息
+        connection_manager.snapshot_provider = self.get_snapshot
         
         # 是否启用定时广播
         self.auto_broadcast_enabled = True
@@ -66,7 +220,7 @@ class DataManager:
             if not self.viewer_log_path.exists():
                 self.viewer_log_path.touch()
         except Exception as e:
-            print(f"初始化观赛ID日志文件失败: {e}")
+            logger.warning("初始化观赛ID日志文件失败: %s", e)
     
     def add_event(self, event: GameEvent, game_id: str):
         """
@@ -92,18 +246,20 @@ class DataManager:
         # 保持最新的100条事件
         if len(self.events_history) > 100:
             self.events_history = self.events_history[-100:]
+        self.mark_dirty("recentEvents")
         
-        print(f"添加事件: {event.player} - {event.event} (游戏: {game_id})")
+        logger.debug("添加事件: %s - %s (游戏: %s)", event.player, event.event, game_id)
     
     def update_global_scores(self, team_scores: List[TeamScore]):
         """
-        更新全局积分榜数据
+        更新全局积分榜数据（保存接收到的原始数据，队伍 ID 与颜色在构建分段时按当前配置补全，配置热更新后随之刷新）
         
         参数:
             team_scores (List[TeamScore]): 队伍分数列表
         """
         self.global_scores = team_scores
-        print(f"更新全局积分榜: {len(team_scores)} 个队伍")
+        self.mark_dirty("globalScores")
+        logger.info("更新全局积分榜: %s 个队伍", len(team_scores))
     
     def update_current_game_score(self, score_data):
         """
@@ -113,6 +269,8 @@ class DataManager:
             score_data: 当前游戏积分数据
         """
         self.current_game_score = score_data
+        # 跑路战士汇总同样来自分数引擎状态，随之刷新
+        self.mark_dirty("currentGameScore", "runawayWarrior")
         # 移除冗余日志，避免刷屏
     
     def update_vote_data(self, vote_data: VoteEvent):
@@ -123,7 +281,8 @@ class DataManager:
             vote_data (VoteEvent): 投票事件数据
         """
         self.current_vote_data = vote_data
-        print(f"更新投票数据: {len(vote_data.votes)} 个选项, 剩余时间: {vote_data.time}秒")
+        self.mark_dirty("currentVote")
+        logger.debug("更新投票数据: %s 个选项, 剩余时间: %s秒", len(vote_data.votes), vote_data.time)
     
     def update_game_status(self, event: GlobalEvent):
         """
@@ -144,68 +303,287 @@ class DataManager:
                 "tournament_number": tournament_number
             } if event.game else None
         }
-        print(f"更新游戏状态: {event.status}")
+        self.mark_dirty("gameStatus")
+        # 状态切换后立即广播，并按新状态的频率重新计时
+        self.tick_scheduler.wake()
+        logger.info("更新游戏状态: %s", event.status)
     
-    def get_complete_data(self) -> Dict:
+    def mark_dirty(self, *sections: str):
         """
-        获取所有完整数据用于广播
-        
+        标记分段为脏，下次刷新状态时重新构建并编码
+
+        参数:
+            *sections (str): 分段名；不传则标记全部分段
+        """
+        self._dirty_sections.update(sections or STATE_SECTIONS)
+        # 唤醒等待状态变化的长轮询请求
+        if self._change_event is not None:
+            self._change_event.set()
+            self._change_event = None
+
+    def _global_score_entry(self, team: TeamScore) -> Dict[str, Any]:
+        # 兼容中文队名：转换为配置中的队伍 ID；未传入颜色时使用配置中的队伍颜色
+        config = game_config.compiled
+        info = config.resolve_team(getattr(team, 'team', None))
+        team_id = info.id if info is not None else getattr(team, 'team', None)
+        return {
+            "team": team_id,
+            "total_score": getattr(team, 'total_score', 0),
+            "player_count": len(getattr(team, 'scores', []) or []),
+            "color": getattr(team, 'color', None) or config.team_colors.get(team_id),
+            "scores": [
+                {
+                    "player": score.player,
+                    "score": score.score
+                } for score in (getattr(team, 'scores', []) or [])
+            ]
+        }
+
+    def _build_section(self, name: str) -> Any:
+        """
+        构建单个状态分段
+
         返回:
-            Dict: 包含所有实时数据的完整数据包
+            Any: 分段数据；分段当前不适用时返回 _ABSENT
         """
-        full_data = {
-            "type": "full_data_update",
-            "data": {
-                "globalScores": [
+        if self._remote_sections is not None and name != "connectionStatus":
+            return self._remote_sections.get(name, _ABSENT)
+        if name == "globalScores":
+            return [self._global_score_entry(team) for team in (self.global_scores or [])]
+        if name == "currentGameScore":
+            return self.current_game_score
+        if name == "bingoCard":
+            # 直接交给编码层输出模型，不先转成 dict
+            return self.bingo_card
+        if name == "itemImages":
+            # 后端统一提供物品图片映射，前端不再尝试解析，避免闪烁
+            return self.item_image_cache
+        if name == "currentVote":
+            return {
+                "time_remaining": self.current_vote_data.time,
+                "total_games": len(self.current_vote_data.votes),
+                "total_tickets": sum(vote.ticket for vote in self.current_vote_data.votes),
+                "votes": [
                     {
-                        "team": getattr(team, 'team', None),
-                        "total_score": getattr(team, 'total_score', 0),
-                        "player_count": len(getattr(team, 'scores', []) or []),
-                        "color": getattr(team, 'color', None),
-                        "scores": [
-                            {
-                                "player": score.player,
-                                "score": score.score
-                            } for score in (getattr(team, 'scores', []) or [])
-                        ]
-                    } for team in (self.global_scores or [])
-                ],
-                "currentGameScore": self.current_game_score,
-                "bingoCard": self._serialize_bingo_card() if self.bingo_card else None,
-                 # 后端统一提供物品图片映射，前端不再尝试解析，避免闪烁
-                 "itemImages": self.item_image_cache,
-                "currentVote": {
-                    "time_remaining": self.current_vote_data.time,
-                    "total_games": len(self.current_vote_data.votes),
-                    "total_tickets": sum(vote.ticket for vote in self.current_vote_data.votes),
-                    "votes": [
-                        {
-                            "game": vote.game,
-                            "ticket": vote.ticket
-                        } for vote in self.current_vote_data.votes
-                    ]
-                } if self.current_vote_data else None,
-                "gameStatus": self.game_status,
-                # 发送最新20条事件（按时间倒序，最新在前）
-                "recentEvents": list(reversed(self.events_history[-20:])),
-                "connectionStatus": {
-                    "connected": True,
-                    "connection_count": connection_manager.get_connection_count(),
-                    "last_ping": datetime.now().isoformat()
-                }
-            },
-            "timestamp": datetime.now().isoformat()
-        }
+                        "game": vote.game,
+                        "ticket": vote.ticket
+                    } for vote in self.current_vote_data.votes
+                ]
+            } if self.current_vote_data else None
+        if name == "gameStatus":
+            return self.game_status
+        if name == "recentEvents":
+            # 发送最新20条事件（按时间倒序，最新在前）
+            return list(reversed(self.events_history[-20:]))
+        if name == "connectionStatus":
+            # last_ping 只在完整快照中附带，避免每次广播都产生变化
+            return {
+                "connected": True,
+                "connection_count": connection_manager.get_connection_count()
+            }
+        if name == "runawayWarrior":
+            # 针对跑路战士，附带检查点与完成路线汇总，方便前端渲染
+            if score_engine.current_game_id != 'runaway_warrior':
+                return _ABSENT
+            try:
+                return self._build_runaway_warrior_summary()
+            except Exception as e:
+                logger.warning("构建跑路战士汇总信息失败: %s", e)
+                return _ABSENT
+        raise KeyError(name)
+
+    def _refresh_state(self) -> bool:
+        """
+        只重新构建并编码脏分段，与上一次的编码结果比较，变化的分段累积到待广播集合中
+
+        返回:
+            bool: 状态是否发生了变化（若变化则版本号递增）
+        """
+        connection_count = connection_manager.get_connection_count()
+        if connection_count != self._last_connection_count:
+            self._last_connection_count = connection_count
+            self._dirty_sections.add("connectionStatus")
+        if not self._dirty_sections:
+            return False
+
+        dirty = self._dirty_sections
+        self._dirty_sections = set()
+        changed_names: List[str] = []
+        for name in STATE_SECTIONS:
+            if name not in dirty:
+                continue
+            value = self._build_section(name)
+            if value is _ABSENT:
+                if name in self._section_json:
+                    del self._section_json[name]
+                    del self._sections[name]
+                    self._pending_changes.discard(name)
+                    self._pending_removed.add(name)
+                    changed_names.append(name)
+                continue
+            encoded = dumps(value)
+            if self._section_json.get(name) != encoded:
+                self._section_json[name] = encoded
+                self._sections[name] = value
+                self._pending_changes.add(name)
+                self._pending_removed.discard(name)
+                changed_names.append(name)
+        if not changed_names:
+            return False
+        self.state_version += 1
+        for name in changed_names:
+            self._section_versions[name] = self.state_version
+        return True
+
+    def get_snapshot(self) -> StateMessage:
+        """
+        获取完整快照的预编码消息（用于新连接或客户端请求重新同步）
+
+        状态未变化时直接复用上次编码好的消息，不再重复构建和序列化。
+
+        返回:
+            StateMessage: 类型为 full_data_update 的完整数据包
+        """
+        self._refresh_state()
+        if self._snapshot is not None and self._snapshot_version == self.state_version:
+            return self._snapshot
+
+        now = datetime.now().isoformat()
+        names = [name for name in STATE_SECTIONS if name in self._sections]
+        sections = {name: self._sections[name] for name in names}
+        fragments = {name: self._section_json[name] for name in names}
+        sections["connectionStatus"] = {**sections["connectionStatus"], "last_ping": now}
+        fragments["connectionStatus"] = dumps(sections["connectionStatus"])
+        self._snapshot = StateMessage("full_data_update", self.state_version, sections, fragments, now)
+        self._snapshot_version = self.state_version
+        return self._snapshot
 
-        # 针对跑路战士，附带检查点与完成路线汇总，方便前端渲染
+    def section_version(self, names: Optional[Tuple[str, ...]] = None) -> int:
+        """
+        给定分段最近一次变化时的状态版本（不传则为整体状态版本）
+
+        工作进程返回主进程的版本（不含本进程维护的 connectionStatus），同一状态在各工作进程上版本相同
+        """
+        self._refresh_state()
+        if self._remote_sections is not None:
+            versions = self._remote_versions
+            return max((versions.get(name, 0) for name in (names or versions)), default=0)
+        if names is None:
+            return self.state_version
+        return max((self._section_versions.get(name, 0) for name in names), default=0)
+
+    def get_section_versions(self, names: List[str]) -> Dict[str, int]:
+        """各分段最近一次变化时的状态版本（多进程分发时随状态同步给工作进程）"""
+        return {name: self._section_versions.get(name, 0) for name in names}
+
+    def get_snapshot_text(self, names: Optional[Tuple[str, ...]] = None) -> str:
+        """
+        完整快照的 JSON 文本，可只包含部分分段；同一版本下按分段组合缓存
+        """
+        snapshot = self.get_snapshot()
+        if names is None:
+            return snapshot.text()
+        if self._snapshot_views_of is not snapshot:
+            self._snapshot_views_of = snapshot
+            self._snapshot_views = {}
+        text = self._snapshot_views.get(names)
+        if text is None:
+            present = [name for name in names if name in snapshot.sections]
+            text = StateMessage(
+                "full_data_update",
+                snapshot.version,
+                {name: snapshot.sections[name] for name in present},
+                {name: snapshot.fragments[name] for name in present},
+                snapshot.timestamp,
+            ).text()
+            self._snapshot_views[names] = text
+        return text
+
+    async def wait_for_change(self, timeout: float):
+        """等待任意分段被标记为脏（或超时），用于长轮询"""
+        if self._change_event is None:
+            self._change_event = asyncio.Event()
         try:
-            if score_engine.current_game_id == 'runaway_warrior':
-                summary = self._build_runaway_warrior_summary()
-                full_data["data"]["runawayWarrior"] = summary
-        except Exception as e:
-            print(f"构建跑路战士汇总信息失败: {e}")
+            await asyncio.wait_for(self._change_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_complete_data(self) -> Dict:
+        """
+        获取所有完整数据（完整快照）
+
+        返回:
+            Dict: 包含所有实时数据的完整数据包，附带状态版本号
+        """
+        return self.get_snapshot().message
+
+    def get_delta_data(self) -> Optional[StateMessage]:
+        """
+        获取自上次广播以来发生变化的分段（增量更新）
+
+        客户端当前版本满足 base_version <= 客户端版本 时即可直接应用，
+        否则说明中间有遗漏，应发送 resync 请求完整快照。
+
+        返回:
+            Optional[StateMessage]: 增量数据包；没有变化时返回 None
+        """
+        self._refresh_state()
+        if self.state_version == self._broadcast_version:
+            return None
+        now = datetime.now().isoformat()
+        names = [name for name in STATE_SECTIONS if name in self._pending_changes]
+        delta = StateMessage(
+            "delta_update",
+            self.state_version,
+            {name: self._sections[name] for name in names},
+            {name: self._section_json[name] for name in names},
+            now,
+            base_version=self._broadcast_version,
+            removed=sorted(self._pending_removed),
+            group_versions=self._group_versions,
+        )
+        self._broadcast_version = self.state_version
+        self._pending_changes = set()
+        self._pending_removed = set()
+        return delta
+
+    async def broadcast_state(self):
+        """若状态有变化，立即向所有客户端广播一次增量更新"""
+        delta = self.get_delta_data()
+        if delta is not None:
+            if connection_manager.fanout is not None:
+                connection_manager.fanout.publish_state(delta)
+            await connection_manager.broadcast(delta)
 
-        return full_data
+    def enable_remote_state(self):
+        """切换为由主进程同步状态（多进程分发的工作进程）"""
+        self._remote_sections = {}
+        self.mark_dirty()
+
+    def apply_remote_state(self, sections: Dict[str, Any], removed: List[str], *, reset: bool = False,
+                           versions: Optional[Dict[str, int]] = None, stream_id: Optional[str] = None):
+        """
+        应用主进程同步来的状态分段
+
+        参数:
+            sections (Dict[str, Any]): 发生变化的分段
+            removed (List[str]): 已不存在的分段
+            reset (bool): 是否为完整同步（丢弃之前的所有分段）
+            versions (Optional[Dict[str, int]]): 这些分段在主进程中的状态版本
+            stream_id (Optional[str]): 主进程的消息流 ID
+        """
+        if self._remote_sections is None or reset:
+            self._remote_sections = {}
+            self._remote_versions = {}
+            self.mark_dirty()
+        if stream_id is not None:
+            self.remote_stream_id = stream_id
+        if versions:
+            self._remote_versions.update(versions)
+        self._remote_sections.update(sections)
+        for name in removed:
+            self._remote_sections.pop(name, None)
+        self.mark_dirty(*sections.keys(), *removed)
 
     def get_viewer_stats(self) -> Dict:
         """汇总已提交观赛ID的统计信息。"""
@@ -235,7 +613,7 @@ class DataManager:
                     except Exception:
                         continue
         except Exception as e:
-            print(f"读取观赛ID日志失败: {e}")
+            logger.warning("读取观赛ID日志失败: %s", e)
 
         unique_persisted = sorted(set(persisted_ids))
 
@@ -264,10 +642,16 @@ class DataManager:
             with self.viewer_log_path.open("a", encoding="utf-8") as f:
                 f.write(json.dumps(record, ensure_ascii=False) + "\n")
         except Exception as e:
-            print(f"写入观赛ID日志失败: {e}")
+            logger.warning("写入观赛ID日志失败: %s", e)
 
-    def update_bingo_card(self, card: BingoCard):
-        """更新 Bingo 卡片，并准备广播"""
+    def update_bingo_card(self, card: BingoCard, prefetch: bool = True):
+        """
+        更新 Bingo 卡片，并准备广播
+        
+        参数:
+            card (BingoCard): Bingo 卡片
+            prefetch (bool): 是否在后台预热物品图片并本地化任务文案（回放事件日志时为 False，之后再调用 start_bingo_prefetch）
+        """
         # 适配任务展示：解析 name/description 中的 Adventure Text，归一化类型
         try:
             for key, task in (card.tasks or {}).items():
@@ -278,10 +662,16 @@ class DataManager:
                 task.display_name = self._parse_adventure_text(getattr(task, 'name', ''))
                 task.display_description = self._parse_adventure_text(getattr(task, 'description', ''))
         except Exception as e:
-            print(f"适配 Bingo 任务展示失败: {e}")
+            logger.warning("适配 Bingo 任务展示失败: %s", e)
 
         self.bingo_card = card
-        print("更新 Bingo 卡片: {}x{} size={}".format(card.width, card.height, card.size))
+        self.mark_dirty("bingoCard")
+        logger.info("更新 Bingo 卡片: %sx%s size=%s", card.width, card.height, card.size)
+        if prefetch:
+            self.start_bingo_prefetch(card)
+
+    def start_bingo_prefetch(self, card: BingoCard):
+        """在后台预热 Bingo 物品图片，并异步本地化任务标题/描述（需要网络，不阻塞调用方）"""
         # 初始化进度，并行预热图片
         try:
             mats = self._extract_bingo_materials(card)
@@ -291,22 +681,25 @@ class DataManager:
             self.progress_bingo['updated_at_ms'] = int(datetime.now().timestamp() * 1000)
 
             async def _warmup():
-                for m in mats:
-                    try:
-                        await self.resolve_item_image(m)
-                        self.progress_bingo['images']['done'] += 1
-                        self.progress_bingo['updated_at_ms'] = int(datetime.now().timestamp() * 1000)
-                    except Exception:
-                        pass
+                await self.warmup_item_images(mats, on_done=_progress)
+                # 预热完成后立即广播图片，不等下一次定时广播
+                try:
+                    await self.broadcast_state()
+                except Exception as e:
+                    logger.warning("广播 Bingo 物品图片失败: %s", e)
+
+            def _progress():
+                self.progress_bingo['images']['done'] += 1
+                self.progress_bingo['updated_at_ms'] = int(datetime.now().timestamp() * 1000)
             asyncio.create_task(_warmup())
         except Exception as e:
-            print(f"预解析 Bingo 物品图片失败: {e}")
+            logger.warning("预解析 Bingo 物品图片失败: %s", e)
 
         # 异步本地化任务标题/描述为中文
         try:
             asyncio.create_task(self._localize_bingo_card_inplace())
         except Exception as e:
-            print(f"异步本地化 Bingo 卡片失败: {e}")
+            logger.warning("异步本地化 Bingo 卡片失败: %s", e)
 
     def _extract_bingo_materials(self, card: BingoCard) -> List[str]:
         materials: List[str] = []
@@ -326,8 +719,9 @@ class DataManager:
                 seen.add(m)
         return unique
 
-    async def warmup_item_images(self, materials: List[str], *, concurrency: int = 5):
-        """并发预热一批 material 的图片，确保首帧广播就有可用图片。"""
+    async def warmup_item_images(self, materials: List[str], *, concurrency: int = 5,
+                                 on_done: Optional[Callable[[], None]] = None):
+        """并发预热一批 material 的图片；on_done 在每个 material 成功解析后调用（用于更新进度）。"""
         if not materials:
             return
         sem = asyncio.Semaphore(concurrency)
@@ -336,6 +730,8 @@ class DataManager:
             async with sem:
                 try:
                     await self.resolve_item_image(m)
+                    if on_done is not None:
+                        on_done()
                 except Exception:
                     pass
 
@@ -380,13 +776,6 @@ class DataManager:
         except Exception:
             return raw
 
-    def _serialize_bingo_card(self) -> Dict:
-        """将 BingoCard 转为可 JSON 序列化的 dict，以与前端类型兼容"""
-        if not self.bingo_card:
-            return None
-        # Pydantic BaseModel 的 dict() 即可满足，但确保 keys 为字符串 "x,y"
-        return self.bingo_card.dict()
-
     async def resolve_item_image(self, mcid: str, *, max_attempts: int = 5, delay_seconds: float = 0.5) -> Optional[str]:
         """
         轮询解析 MC 物品ID 的图片地址，优先使用缓存；若没有则通过 Minecraft Wiki API 获取。
@@ -408,7 +797,7 @@ class DataManager:
                     if resp.status_code == 405:
                         resp = await client.get(url)
                     if resp.status_code == 200 and ('image' in resp.headers.get('content-type', '')):
-                        self.item_image_cache[mcid] = url
+                        self._cache_item_image(mcid, url)
                         return url
                 except Exception:
                     pass
@@ -471,17 +860,22 @@ class DataManager:
 
                     if found_src:
                         # 转发到下一跳 CDN：避免跨域或未来域名变动
-                        self.item_image_cache[mcid] = found_src
+                        self._cache_item_image(mcid, found_src)
                         return found_src
                 except Exception as e:
-                    print(f"获取物品图片失败: {mcid} {e}")
+                    logger.warning("获取物品图片失败: %s %s", mcid, e)
                 # 暂无结果，等待后重试
                 await asyncio.sleep(delay_seconds)
 
         # 最终失败，写入None以避免频繁命中
-        self.item_image_cache[mcid] = None
+        self._cache_item_image(mcid, None)
         return None
 
+    def _cache_item_image(self, mcid: str, url: Optional[str]):
+        """写入物品图片缓存并标记 itemImages 分段"""
+        self.item_image_cache[mcid] = url
+        self.mark_dirty("itemImages")
+
     def _build_image_candidates(self, mcid: str) -> List[str]:
         """构造与前端一致的候选直链列表，按优先级排列。"""
         if not mcid:
@@ -531,7 +925,7 @@ class DataManager:
                         self.zh_title_cache[query] = title
                         return title
         except Exception as e:
-            print(f"中文标题解析失败: {query} {e}")
+            logger.warning("中文标题解析失败: %s %s", query, e)
         return None
 
     async def _localize_bingo_card_inplace(self):
@@ -540,8 +934,8 @@ class DataManager:
         if not card:
             return
         try:
-            print("[BINGO][AI] 开始本地化 Bingo 卡片任务，任务数:", len(card.tasks or {}))
-            print("[BINGO][AI] OpenAI 启用:", bool(self.openai_base and self.openai_key), "base=", (self.openai_base or '')[:32])
+            logger.info("[BINGO][AI] 开始本地化 Bingo 卡片任务，任务数: %s", len(card.tasks or {}))
+            logger.info("[BINGO][AI] OpenAI 启用: %s base= %s", bool(self.openai_base and self.openai_key), (self.openai_base or '')[:32])
         except Exception:
             pass
         tasks = card.tasks or {}
@@ -573,11 +967,11 @@ class DataManager:
                             try:
                                 import json as _json
                                 preview = _json.dumps(enhanced, ensure_ascii=False) if isinstance(enhanced, dict) else str(enhanced)
-                                print(f"[BINGO][AI][task={key}] {preview[:1000]}")
+                                logger.debug("[BINGO][AI][task=%s] %s", key, preview[:1000])
                             except Exception:
                                 pass
                     except Exception as oe:
-                        print(f"OpenAI 本地化失败: {oe}")
+                        logger.warning("OpenAI 本地化失败: %s", oe)
 
                     task_obj.display_name = (enhanced.get('name') if isinstance(enhanced, dict) else None) or base_name
                     task_obj.display_description = (enhanced.get('desc') if isinstance(enhanced, dict) else None) or base_desc
@@ -586,17 +980,17 @@ class DataManager:
                         task_obj.advice = enhanced.get('advice') or task_obj.advice
                         task_obj.source = enhanced.get('source') or task_obj.source
                         task_obj.difficulty = enhanced.get('difficulty') or task_obj.difficulty
+                    self.mark_dirty("bingoCard")
                     # 进度
                     self.progress_bingo['localize']['done'] += 1
                     self.progress_bingo['updated_at_ms'] = int(datetime.now().timestamp() * 1000)
                 except Exception as e:
-                    print(f"本地化任务失败: {e}")
+                    logger.warning("本地化任务失败: %s", e)
 
         await asyncio.gather(*[_proc(k, t) for k, t in tasks.items()])
         try:
-            print("[BINGO][AI] 本地化完成：",
-                  f"localize_done={self.progress_bingo['localize']['done']}/",
-                  f"{self.progress_bingo['localize']['total']}")
+            logger.info("[BINGO][AI] 本地化完成： localize_done=%s/%s",
+                        self.progress_bingo['localize']['done'], self.progress_bingo['localize']['total'])
         except Exception:
             pass
 
@@ -652,7 +1046,7 @@ class DataManager:
                     text = await resp.aread()
                     text_str = text.decode(errors='ignore') if isinstance(text, (bytes, bytearray)) else str(text)
                     if status != 200:
-                        print(f"[BINGO][AI][HTTP] attempt={attempt} status={status} resp={text_str[:500]}")
+                        logger.debug("[BINGO][AI][HTTP] attempt=%s status=%s resp=%s", attempt, status, text_str[:500])
                         # 其他情况也重试：对所有非200状态在剩余次数内进行指数退避重试
                         if attempt < max_attempts:
                             await asyncio.sleep(backoff * (2 ** (attempt - 1)))
@@ -674,7 +1068,7 @@ class DataManager:
                         try:
                             return _json.loads(content[start:end+1])
                         except Exception as e:
-                            print(f"[BINGO][AI][PARSE] attempt={attempt} 解析失败: {e}")
+                            logger.warning("[BINGO][AI][PARSE] attempt=%s 解析失败: %s", attempt, e)
                             if attempt < max_attempts:
                                 await asyncio.sleep(backoff * (2 ** (attempt - 1)))
                                 continue
@@ -692,7 +1086,7 @@ class DataManager:
                             continue
                         return None
             except Exception as e:
-                print(f"[BINGO][AI][ERROR] attempt={attempt} 调用失败: {e}")
+                logger.warning("[BINGO][AI][ERROR] attempt=%s 调用失败: %s", attempt, e)
                 if attempt < max_attempts:
                     await asyncio.sleep(backoff * (2 ** (attempt - 1)))
                     continue
@@ -713,7 +1107,7 @@ class DataManager:
           "order": ["main0", "check0", "check1", "check2", "sub1-0", "sub1-1", "sub1-2", "main1", ..., "main5" ]
         }
         """
-        state = score_engine.runaway_warrior_state
+        state = score_engine.get_game_state('runaway_warrior')
         checkpoint_progress = state.get('checkpoint_progress', {})  # dict[player] -> List[str]
         completion_routes = state.get('completion_routes', {})       # dict[player] -> route_type
 
@@ -775,7 +1169,7 @@ class DataManager:
             self.broadcast_task.cancel()
         
         self.broadcast_task = asyncio.create_task(self._broadcast_loop())
-        print("定时广播调度器已启动")
+        logger.info("定时广播调度器已启动")
     
     async def stop_broadcast_scheduler(self):
         """
@@ -784,25 +1178,25 @@ class DataManager:
         if self.broadcast_task is not None:
             self.broadcast_task.cancel()
             self.broadcast_task = None
-        print("定时广播调度器已停止")
+        logger.info("定时广播调度器已停止")
     
     async def _broadcast_loop(self):
         """
-        广播循环，每秒发送一次完整数据
+        广播循环，按调度器节拍检查状态，仅在有变化时发送增量数据
         """
-        while self.auto_broadcast_enabled:
-            try:
-                if connection_manager.get_connection_count() > 0:
-                    complete_data = self.get_complete_data()
-                    await connection_manager.broadcast(complete_data)
-                
-                await asyncio.sleep(1)  # 每1秒广播一次
-            except asyncio.CancelledError:
-                print("广播循环被取消")
-                break
-            except Exception as e:
-                print(f"广播循环出错: {e}")
-                await asyncio.sleep(1)  # 出错后等1秒再继续
+        try:
+            await self.tick_scheduler.run(self._broadcast_tick, self._current_status)
+        except asyncio.CancelledError:
+            logger.debug("广播循环被取消")
+
+    async def _broadcast_tick(self):
+        if self.auto_broadcast_enabled and connection_manager.has_audience():
+            await self.broadcast_state()
+
+    def _current_status(self) -> Optional[str]:
+        # 工作进程的游戏状态来自主进程同步的分段
+        status = self._sections.get("gameStatus")
+        return status.get("status") if isinstance(status, dict) else None
     
     def enable_auto_broadcast(self):
         """启用自动广播"""
@@ -0,0 +1,119 @@
+"""
+游戏事件去重
+插件超时重试会重复提交同一事件，在进入分数引擎之前按事件ID（或内容哈希）查重，
+重复的事件直接回执，不改动状态也不广播。索引按时间窗口与容量双重限制。
+
+按内容哈希去重的取舍：内容相同不一定是重试，同一玩家在后续回合再次击杀同一名玩家、
+重复通过同名检查点等真实事件内容完全相同。事件带有插件侧时间戳 sent_at 时把它计入哈希，
+真实的重复事件时间戳不同，不会被误判，使用 INGEST_DEDUPE_WINDOW；
+没有 sent_at 时只能比较内容，改用很短的 INGEST_DEDUPE_HASH_WINDOW（约等于插件的重试超时），
+窗口内内容相同的真实事件仍会被当作重试丢弃，窗口外的重试则不再能识别。
+
+环境变量:
+    INGEST_DEDUPE               id（默认，只对携带 event_id 的事件去重）/ hash（无 event_id 时按内容哈希去重）/ off
+    INGEST_DEDUPE_WINDOW        按 event_id 或带 sent_at 的内容哈希去重的时间窗口（秒，默认 300）
+    INGEST_DEDUPE_HASH_WINDOW   不带 sent_at 的内容哈希去重的时间窗口（秒，默认 5）
+    INGEST_DEDUPE_SIZE          索引最多保留的条目数（默认 10000）
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.models import GameEvent
+
+DEDUPE_MODES = ("id", "hash", "off")
+
+
+class DedupeIndex:
+    def __init__(self):
+        mode = os.environ.get("INGEST_DEDUPE", "id").strip().lower()
+        self.mode = mode if mode in DEDUPE_MODES else "id"
+        self.window = max(0.0, float(os.environ.get("INGEST_DEDUPE_WINDOW", "300")))
+        self.hash_window = max(0.0, float(os.environ.get("INGEST_DEDUPE_HASH_WINDOW", "5")))
+        self.maxsize = max(1, int(os.environ.get("INGEST_DEDUPE_SIZE", "10000")))
+        # 键 -> (加入时间, 过期时间, 附带值)；按加入顺序排列，最早的条目在最前
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        # 统计
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+
+    def key_for(self, game_id: str, event: GameEvent) -> Optional[str]:
+        """事件的去重键；不参与去重时返回 None"""
+        if self.mode == "off":
+            return None
+        if event.event_id:
+            return f"id:{game_id}:{event.event_id}"
+        if self.mode == "hash":
+            fields = (game_id, event.player, event.team, event.event, event.lore)
+            if event.sent_at is not None:
+                fields += (str(event.sent_at),)
+                kind = "hash"
+            else:
+                # 只比较内容，使用短窗口（见模块说明）
+                kind = "content"
+            content = "\x1f".join(fields)
+            return f"{kind}:{game_id}:{hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()}"
+        return None
+
+    def _window_for(self, key: str) -> float:
+        return self.hash_window if key.startswith("content:") else self.window
+
+    def _expire(self, now: float):
+        # 条目按加入顺序排列；长短窗口混合时，过期的短窗口条目可能留在未过期的条目之后，查询时再按各自的过期时间判断
+        while self._entries:
+            expires_at = next(iter(self._entries.values()))[1]
+            if len(self._entries) <= self.maxsize and now <= expires_at:
+                break
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def lookup(self, key: Optional[str]) -> Optional[Tuple[float, Any]]:
+        """查询去重键，窗口内已出现过时返回 (加入时间, 附带值)"""
+        if key is None:
+            return None
+        self.checked += 1
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now > entry[1]:
+            del self._entries[key]
+            return None
+        self.duplicates += 1
+        return entry[0], entry[2]
+
+    def add(self, key: Optional[str], value: Any = None):
+        """记录已接受的事件，value 为回执中需要带回的信息（如队列序号）"""
+        if key is None:
+            return
+        now = time.monotonic()
+        # 重新加入时移到末尾，保持按加入顺序排列
+        self._entries.pop(key, None)
+        self._entries[key] = (now, now + self._window_for(key), value)
+        self._expire(now)
+
+    def discard(self, key: Optional[str]):
+        """撤销记录（事件处理失败时调用，允许重试）"""
+        if key is not None:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "window": self.window,
+            "hash_window": self.hash_window,
+            "capacity": self.maxsize,
+            "entries": len(self._entries),
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "evicted": self.evicted,
+        }
+
+
+# 全局事件去重索引
+event_dedupe = DedupeIndex()
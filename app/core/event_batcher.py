@@ -0,0 +1,144 @@
+"""
+游戏事件批量广播
+在短时间窗口内合并连续到达的游戏事件，只广播一次并附带最终的分数预测
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.websocket import connection_manager
+from app.core.ingest_queue import ingest_queue
+from app.core.log import get_logger
+
+logger = get_logger("events")
+
+
+class GameEventBatcher:
+    def __init__(self):
+        # 合并窗口（毫秒）；设为 0 则每个事件立即单独广播
+        self.window_ms = max(0.0, float(os.environ.get("GAME_EVENT_BATCH_MS", "30")))
+        # 单批最多合并的事件数，达到后立即发送
+        self.max_batch = max(1, int(os.environ.get("GAME_EVENT_BATCH_MAX", "200")))
+        self._game_id: Optional[str] = None
+        self._events: List[Dict[str, Any]] = []
+        self._score_prediction: Optional[Dict[str, Any]] = None
+        # 各事件被接收的时刻（time.monotonic），用于统计接收到广播的延迟
+        self._received: List[float] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # 统计
+        self.events_total = 0
+        self.batches_total = 0
+
+    async def submit(self, game_id: str, event_data: Dict[str, Any], score_prediction: Optional[Dict[str, Any]],
+                     received_at: Optional[float] = None):
+        """
+        提交一条待广播的游戏事件
+
+        参数:
+            game_id (str): 游戏ID
+            event_data (Dict[str, Any]): 单条事件的展示数据（game_event 消息中的 data）
+            score_prediction (Optional[Dict[str, Any]]): 处理该事件后的分数预测
+            received_at (Optional[float]): 事件被接收的时刻（time.monotonic）
+        """
+        self.events_total += 1
+        received = [received_at] if received_at is not None else []
+        if self.window_ms <= 0:
+            await self._broadcast(game_id, [event_data], score_prediction, received)
+            return
+
+        # 切换游戏时先把上一游戏的事件发出去
+        if self._events and self._game_id != game_id:
+            await self.flush()
+
+        self._game_id = game_id
+        self._events.append(event_data)
+        self._received.extend(received)
+        self._score_prediction = score_prediction
+
+        if len(self._events) >= self.max_batch:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def submit_batch(self, game_id: str, events: List[Dict[str, Any]], score_prediction: Optional[Dict[str, Any]],
+                           received_at: Optional[float] = None):
+        """
+        提交一整批已处理完的游戏事件，合并为一条消息立即广播（不受合并窗口与单批上限限制）
+
+        参数:
+            game_id (str): 游戏ID
+            events (List[Dict[str, Any]]): 按处理顺序排列的事件展示数据
+            score_prediction (Optional[Dict[str, Any]]): 整批处理完成后的分数预测
+            received_at (Optional[float]): 这批事件被接收的时刻（time.monotonic）
+        """
+        if not events:
+            return
+        self.events_total += len(events)
+        # 先发出窗口内尚未广播的事件，保证客户端看到的顺序与处理顺序一致
+        await self.flush()
+        await self._broadcast(game_id, events, score_prediction, [received_at] * len(events) if received_at is not None else [])
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.window_ms / 1000)
+        except asyncio.CancelledError:
+            return
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """立即发送窗口内积累的事件"""
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+        if not self._events:
+            return
+        game_id, events, score_prediction, received = self._game_id, self._events, self._score_prediction, self._received
+        self._events = []
+        self._received = []
+        self._score_prediction = None
+        await self._broadcast(game_id, events, score_prediction, received)
+
+    async def _broadcast(self, game_id: str, events: List[Dict[str, Any]], score_prediction: Optional[Dict[str, Any]],
+                         received: List[float]):
+        self.batches_total += 1
+        try:
+            if len(events) == 1:
+                # 单条事件保持原有的 game_event 格式
+                message = {
+                    "type": "game_event",
+                    "game_id": game_id,
+                    "data": events[0],
+                    "score_prediction": score_prediction,
+                    "timestamp": datetime.now().isoformat()
+                }
+            else:
+                message = {
+                    "type": "game_events",
+                    "game_id": game_id,
+                    "events": events,
+                    "score_prediction": score_prediction,
+                    "timestamp": datetime.now().isoformat()
+                }
+            await connection_manager.broadcast(message)
+            now = time.monotonic()
+            for received_at in received:
+                ingest_queue.broadcast_latency.record(now - received_at)
+        except Exception as be:
+            logger.warning("广播游戏事件失败: %s", be)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "events_total": self.events_total,
+            "batches_total": self.batches_total,
+            "pending": len(self._events),
+        }
+
+
+# 全局游戏事件批量广播实例
+game_event_batcher = GameEventBatcher()
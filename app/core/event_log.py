@@ -0,0 +1,384 @@
+"""
+接入消息日志（追加写入的分段日志，用于崩溃恢复）
+所有接入消息（游戏事件、分数、全局分数、全局事件、投票、Bingo 卡片、回合与队伍名单、锦标赛重置）按处理顺序追加到日志，
+由后台任务合并写入：等待 EVENT_LOG_FLUSH_MS 收集一批记录后一次写入、一次 fsync（group commit），
+接口在返回前等待所在批次落盘；写入失败时记录留在缓冲中稍后重写，正在等待的请求返回错误。进程重启时按顺序把日志交给相同的处理函数回放，重建分数引擎与数据管理器的状态。
+
+日志文件为 <EVENT_LOG_DIR>/<首条记录序号>.log，每行一条 JSON 记录:
+    {"seq": 1, "ts": "2025-01-01T12:00:00", "type": "event", "game_id": "battle_box", "data": {...}}
+检查与截断日志使用 event_log_tool.py（服务运行时不要修改日志目录）
+
+环境变量:
+    EVENT_LOG_DIR           日志目录（默认为空，不记录日志）
+    EVENT_LOG_FLUSH_MS      合并写入的等待时间（毫秒，默认 5），0 表示有记录即写入
+    EVENT_LOG_SEGMENT_MB    单个分段的大小上限（MB，默认 64），超过后在下一批写入时新建分段
+    EVENT_LOG_REPLAY        启动时是否回放日志（默认 1）
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.ingest_queue import LatencyTracker
+from app.core.json_codec import dumps_bytes, loads
+from app.core.log import get_logger
+
+logger = get_logger("ingest")
+
+SEGMENT_SUFFIX = ".log"
+# 写入失败后重试的间隔（秒）
+WRITE_RETRY_DELAY = 1.0
+
+
+# deferred_sync() 上下文中 sync() 只记录需要等待的序号
+_deferred_target: ContextVar[Optional[List[int]]] = ContextVar("event_log_deferred_target", default=None)
+
+
+class EventLogWriteError(Exception):
+    """记录未能写入磁盘"""
+
+
+def segment_path(directory: Path, first_seq: int) -> Path:
+    return directory / f"{first_seq:016d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory: Path) -> List[Tuple[int, Path]]:
+    """按首条记录序号排序的分段列表 [(首条序号, 路径)]"""
+    if not directory.is_dir():
+        return []
+    segments = []
+    for path in directory.iterdir():
+        if path.suffix == SEGMENT_SUFFIX and path.stem.isdigit():
+            segments.append((int(path.stem), path))
+    return sorted(segments)
+
+
+def scan_segment(path: Path) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    逐行读取分段，产出 (该行结束处的偏移, 记录)
+    无法解析的行（包括崩溃时写了一半、没有换行符的最后一行）记录为 None
+    """
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            offset += len(line)
+            record = None
+            if line.endswith(b"\n"):
+                try:
+                    record = loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or not isinstance(record.get("seq"), int):
+                    record = None
+            yield offset, record
+
+
+def truncate_after(directory: Path, seq: int) -> Dict[str, Any]:
+    """
+    删除序号大于 seq 的所有记录：截断 seq 所在的分段，删除之后的分段
+
+    返回:
+        dict: removed_segments（删除的分段文件名）、truncated（被截断的分段文件名与保留的字节数）
+    """
+    removed: List[str] = []
+    truncated = None
+    for first_seq, path in list_segments(directory):
+        if first_seq > seq:
+            path.unlink()
+            removed.append(path.name)
+            continue
+        keep = 0
+        for offset, record in scan_segment(path):
+            if record is not None and record["seq"] > seq:
+                break
+            keep = offset
+        if keep < path.stat().st_size:
+            with open(path, "r+b") as f:
+                f.truncate(keep)
+                f.flush()
+                os.fsync(f.fileno())
+            truncated = {"segment": path.name, "bytes": keep}
+    return {"removed_segments": removed, "truncated": truncated}
+
+
+def drop_before(directory: Path, seq: int) -> List[str]:
+    """删除所有记录序号都小于 seq 的分段（整段删除，不改写分段内容），返回删除的分段文件名"""
+    segments = list_segments(directory)
+    removed: List[str] = []
+    for (first_seq, path), following in zip(segments, segments[1:]):
+        # 下一分段的首条序号不大于 seq 时，本分段的记录都小于 seq
+        if following[0] <= seq:
+            path.unlink()
+            removed.append(path.name)
+    return removed
+
+
+class EventLog:
+    def __init__(self):
+        directory = os.environ.get("EVENT_LOG_DIR", "").strip()
+        self.directory: Optional[Path] = Path(directory) if directory else None
+        self.enabled = self.directory is not None
+        self.flush_interval = max(0.0, float(os.environ.get("EVENT_LOG_FLUSH_MS", "5"))) / 1000
+        self.segment_bytes = max(1, int(float(os.environ.get("EVENT_LOG_SEGMENT_MB", "64")) * 1024 * 1024))
+        self.replay_on_start = os.environ.get("EVENT_LOG_REPLAY", "1").strip().lower() not in ("0", "false", "no", "off")
+        # 回放期间处理函数不再重复记录
+        self.replaying = False
+        # 最近分配的序号与最近落盘的序号
+        self.seq = 0
+        self.durable_seq = 0
+        self._opened = False
+        self._buffer: List[Tuple[int, bytes]] = []
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        # 写入使用独立线程，不与图片下载等占用默认线程池的任务排队
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 当前写入的分段（只在写入线程中访问）
+        self._file = None
+        self._file_size = 0
+        # 统计
+        self.appended = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+        self.replayed = 0
+        self.commit_latency = LatencyTracker()
+
+    def open(self):
+        """打开日志目录：截掉最后一个分段中写了一半的记录，从已有的最大序号继续"""
+        if not self.enabled or self._opened:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = list_segments(self.directory)
+        if segments:
+            first_seq, path = segments[-1]
+            last_seq = first_seq - 1
+            keep = 0  # 最后一个以换行符结尾的行之后的偏移
+            bad_lines = 0
+            for offset, record in scan_segment(path):
+                if record is not None:
+                    last_seq = record["seq"]
+                    keep = offset
+                elif self._line_terminated(path, offset):
+                    # 中间无法解析的行跳过（回放时同样跳过），保留其后的记录
+                    bad_lines += 1
+                    keep = offset
+            if bad_lines:
+                logger.warning("事件日志 %s 中有 %s 行无法解析，回放时跳过", path.name, bad_lines)
+            size = path.stat().st_size
+            if keep < size:
+                # 只截掉崩溃时写了一半、没有换行符的最后一行
+                logger.warning("事件日志 %s 末尾有 %s 字节不完整的记录，已截断", path.name, size - keep)
+                with open(path, "r+b") as f:
+                    f.truncate(keep)
+            self._file = open(path, "ab")
+            self._file_size = keep
+            self.seq = self.durable_seq = last_seq
+        self._opened = True
+        logger.info("事件日志目录 %s：%s 个分段，最大序号 %s", self.directory, len(segments), self.seq)
+
+    @staticmethod
+    def _line_terminated(path: Path, offset: int) -> bool:
+        """offset 之前的一个字节是否为换行符（即该行完整写入）"""
+        with open(path, "rb") as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+
+    def records(self, from_seq: int = 1) -> Iterator[Dict[str, Any]]:
+        """按顺序读取序号不小于 from_seq 的记录（跳过无法解析的行）"""
+        if not self.enabled:
+            return
+        segments = list_segments(self.directory)
+        for index, (first_seq, path) in enumerate(segments):
+            if index + 1 < len(segments) and segments[index + 1][0] <= from_seq:
+                continue
+            for offset, record in scan_segment(path):
+                if record is None:
+                    logger.warning("跳过事件日志 %s 中无法解析的记录（偏移 %s）", path.name, offset)
+                    continue
+                if record["seq"] >= from_seq:
+                    yield record
+
+    def append(self, msg_type: str, data: Any, game_id: Optional[str] = None) -> int:
+        """
+        追加一条接入消息（只放入内存缓冲，由后台任务写入）
+
+        参数:
+            msg_type (str): 消息类型，与 /ws/ingest 的消息类型一致
+            data: 消息数据（pydantic 模型或可 JSON 编码的对象）
+            game_id (Optional[str]): 游戏ID
+        返回:
+            int: 记录的序号，未启用或回放期间返回 0
+        """
+        if not self.enabled or self.replaying or not self._opened:
+            return 0
+        self.seq += 1
+        record = {"seq": self.seq, "ts": datetime.now().isoformat(), "type": msg_type}
+        if game_id is not None:
+            record["game_id"] = game_id
+        record["data"] = data
+        self._buffer.append((self.seq, dumps_bytes(record) + b"\n"))
+        self.appended += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.seq
+
+    async def sync(self, seq: Optional[int] = None):
+        """
+        等待目前已追加的所有记录（或序号不大于 seq 的记录）落盘，同一批次的请求共用一次 fsync
+
+        在 deferred_sync() 上下文中不等待，只记下需要等待的序号
+        """
+        target = self.seq if seq is None else seq
+        deferred = _deferred_target.get()
+        if deferred is not None:
+            deferred[0] = max(deferred[0], target)
+            return
+        if self._writer is None or self.durable_seq >= target:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((target, future))
+        await future
+
+    @contextmanager
+    def deferred_sync(self):
+        """
+        推迟上下文中的 sync()：处理函数照常调用 sync()，但不等待落盘，
+        上下文返回的列表记录需要等待的最大序号，由调用方稍后 await sync(序号)。
+        接入连接借此在等待落盘的同时继续处理后续消息，让多条消息合并到同一批次
+        """
+        target = [0]
+        token = _deferred_target.set(target)
+        try:
+            yield target
+        finally:
+            _deferred_target.reset(token)
+
+    def _write_batch(self, batch: List[Tuple[int, bytes]]) -> int:
+        # 在线程池中执行：必要时新建分段，写入整批记录后 fsync 一次
+        if self._file is None or self._file_size >= self.segment_bytes:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(segment_path(self.directory, batch[0][0]), "ab")
+            self._file_size = 0
+        data = b"".join(line for _, line in batch)
+        try:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except Exception:
+            # 去掉写了一半的内容；无法截断时放弃该分段，下一批写入新的分段
+            try:
+                self._file.truncate(self._file_size)
+            except Exception:
+                self._file.close()
+                self._file = None
+            raise
+        self._file_size += len(data)
+        return len(data)
+
+    def _fail_waiters(self, error: Exception):
+        for _, future in self._waiters:
+            if not future.done():
+                future.set_exception(error)
+        self._waiters = []
+
+    def _release_waiters(self):
+        pending = []
+        for target, future in self._waiters:
+            if target <= self.durable_seq:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                pending.append((target, future))
+        self._waiters = pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.flush_interval:
+                # 等待一小段时间，让并发到达的记录合并为一批
+                await asyncio.sleep(self.flush_interval)
+            if not self._buffer:
+                continue
+            batch, self._buffer = self._buffer, []
+            started = time.monotonic()
+            try:
+                self.bytes_written += await loop.run_in_executor(self._executor, self._write_batch, batch)
+            except Exception as e:
+                # 记录放回缓冲稍后重写；正在等待落盘的请求返回错误，已落盘序号不变
+                self.write_errors += 1
+                logger.error("写入事件日志失败（%s 条记录），%s 秒后重试: %s", len(batch), WRITE_RETRY_DELAY, e)
+                self._buffer = batch + self._buffer
+                self._fail_waiters(EventLogWriteError(f"写入事件日志失败: {e}"))
+                await asyncio.sleep(WRITE_RETRY_DELAY)
+                self._wakeup.set()
+                continue
+            self.batches += 1
+            self.commit_latency.record(time.monotonic() - started)
+            self.durable_seq = batch[-1][0]
+            self._release_waiters()
+
+    def start(self):
+        """启动后台写入任务（需先 open）"""
+        if not self.enabled or not self._opened or (self._writer is not None and not self._writer.done()):
+            return
+        self._wakeup = asyncio.Event()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-log")
+        self._writer = asyncio.create_task(self._run())
+        if self._buffer:
+            self._wakeup.set()
+
+    async def stop(self, timeout: float = 5.0):
+        """写完缓冲中剩余的记录后停止写入任务并关闭分段"""
+        if self._writer is None:
+            return
+        try:
+            if self.durable_seq < self.seq:
+                self._wakeup.set()
+                await asyncio.wait_for(self.sync(), timeout)
+        except (asyncio.TimeoutError, EventLogWriteError) as e:
+            logger.error("关闭时仍有 %s 条事件日志未写入: %s", self.seq - self.durable_seq, str(e) or "等待超时")
+        finally:
+            # 写入失败或超时也要停止写入任务、释放线程并关闭分段
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._writer = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "directory": str(self.directory),
+            "seq": self.seq,
+            "durable_seq": self.durable_seq,
+            "buffered": len(self._buffer),
+            "appended": self.appended,
+            "batches": self.batches,
+            "bytes_written": self.bytes_written,
+            "write_errors": self.write_errors,
+            "replayed": self.replayed,
+            "commit_latency_ms": self.commit_latency.get_stats(),
+        }
+
+
+# 全局接入消息日志实例
+event_log = EventLog()
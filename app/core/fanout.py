@@ -0,0 +1,315 @@
+"""
+多进程 WebSocket 分发
+主进程（primary）负责接收数据与维护状态，并通过本地 Unix Socket 发布已编码的消息；
+多个工作进程（worker）各自持有一部分观众连接，在本进程内完成分发。
+
+运行方式:
+    python -m app.core.fanout --workers 4 --port 8000 --worker-port 8001
+
+主进程监听 --port（数据接收 API 与管理接口），工作进程共同监听 --worker-port（SO_REUSEPORT，
+由内核在工作进程间分配观众连接）。反向代理将 /ws 转发到 --worker-port，其余路径转发到 --port。
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.websocket import connection_manager, PreparedMessage
+from app.core.data_manager import data_manager, StateMessage
+from app.core.json_codec import dumps, loads
+from app.core.log import get_logger
+
+logger = get_logger("fanout")
+
+
+# 进程角色：standalone（默认，单进程）/ primary / worker
+ROLE_STANDALONE = "standalone"
+ROLE_PRIMARY = "primary"
+ROLE_WORKER = "worker"
+
+fanout_role = os.environ.get("CC_LIVE_ROLE", ROLE_STANDALONE).strip().lower()
+fanout_socket_path = os.environ.get("CC_LIVE_FANOUT_SOCKET", "/tmp/cc_live_fanout.sock")
+
+# 帧格式：4 字节大端长度 + JSON 负载
+_HEADER = struct.Struct(">I")
+_BROADCAST_PREFIX = b'{"kind":"broadcast","message":'
+# 工作进程自行维护连接数，不同步主进程的 connectionStatus 分段
+_LOCAL_SECTIONS = ("connectionStatus",)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _HEADER.pack(len(payload)) + payload
+
+
+def _state_payload(state: StateMessage, *, reset: bool) -> bytes:
+    """由状态消息已编码的分段片段拼接同步负载，不重新序列化；附带各分段在主进程中的版本与消息流 ID（用于快照 ETag）"""
+    names = [name for name in state.sections if name not in _LOCAL_SECTIONS]
+    sections = ",".join(f'"{name}":{state.fragments[name]}' for name in names)
+    removed = [name for name in (state.removed or []) if name not in _LOCAL_SECTIONS]
+    return (
+        f'{{"kind":"state","reset":{"true" if reset else "false"},'
+        f'"sections":{{{sections}}},"removed":{dumps(removed)},'
+        f'"versions":{dumps(data_manager.get_section_versions(names + removed))},'
+        f'"stream_id":{dumps(connection_manager.stream_id)}}}'
+    ).encode("utf-8")
+
+
+class FanoutPublisher:
+    """
+    主进程侧：向所有已连接的工作进程发布消息
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        # 单个工作进程积压超过该字节数时断开，由其重连后重新同步
+        self.max_buffer = int(os.environ.get("CC_LIVE_FANOUT_MAX_BUFFER", str(8 * 1024 * 1024)))
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    async def start(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._server = await asyncio.start_unix_server(self._on_subscriber, path=self.path)
+        logger.info("分发发布端已启动: %s", self.path)
+
+    async def stop(self):
+        for writer in list(self.subscribers):
+            writer.close()
+        self.subscribers.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def has_subscribers(self) -> bool:
+        return bool(self.subscribers)
+
+    async def _on_subscriber(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # 新工作进程先收到一份完整状态
+        writer.write(_frame(_state_payload(data_manager.get_snapshot(), reset=True)))
+        self.subscribers.add(writer)
+        logger.info("工作进程已连接，当前工作进程数: %s", len(self.subscribers))
+        try:
+            # 工作进程不发送数据，读到 EOF 即表示断开
+            await reader.read()
+        except Exception:
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+            logger.info("工作进程已断开，当前工作进程数: %s", len(self.subscribers))
+
+    def _publish_frame(self, frame: bytes):
+        self.published += 1
+        for writer in list(self.subscribers):
+            transport = writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > self.max_buffer:
+                self.subscribers.discard(writer)
+                self.dropped_subscribers += 1
+                writer.close()
+                continue
+            writer.write(frame)
+
+    def publish(self, prepared: PreparedMessage):
+        """发布一条普通广播消息（直接复用已编码的 JSON 文本）"""
+        if self.subscribers:
+            self._publish_frame(_frame(_BROADCAST_PREFIX + prepared.text().encode("utf-8") + b"}"))
+
+    def publish_state(self, state: StateMessage):
+        """发布一次状态增量"""
+        if self.subscribers:
+            self._publish_frame(_frame(_state_payload(state, reset=False)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "role": ROLE_PRIMARY,
+            "socket": self.path,
+            "workers": len(self.subscribers),
+            "published": self.published,
+            "dropped_workers": self.dropped_subscribers,
+        }
+
+
+class FanoutSubscriber:
+    """
+    工作进程侧：从主进程接收消息并在本进程内分发给观众连接
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.received = 0
+        self.reconnects = 0
+
+    async def start(self):
+        # 工作进程的状态完全来自主进程
+        data_manager.enable_remote_state()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError, OSError):
+                await asyncio.sleep(1)
+                continue
+            self.connected = True
+            logger.info("已连接到主进程: %s", self.path)
+            try:
+                while True:
+                    header = await reader.readexactly(_HEADER.size)
+                    payload = await reader.readexactly(_HEADER.unpack(header)[0])
+                    self.received += 1
+                    await self._dispatch(payload)
+            except asyncio.CancelledError:
+                writer.close()
+                raise
+            except Exception as e:
+                logger.warning("与主进程的连接中断: %s", e)
+            finally:
+                self.connected = False
+            writer.close()
+            self.reconnects += 1
+            await asyncio.sleep(1)
+
+    async def _dispatch(self, payload: bytes):
+        if payload.startswith(_BROADCAST_PREFIX):
+            # 复用主进程的编码结果，只解码一次用于频道路由和其他格式
+            text = payload[len(_BROADCAST_PREFIX):-1].decode("utf-8")
+            await connection_manager.broadcast(PreparedMessage(loads(text), text))
+            return
+        envelope = loads(payload)
+        if envelope.get("kind") == "state":
+            data_manager.apply_remote_state(
+                envelope.get("sections", {}),
+                envelope.get("removed", []),
+                reset=bool(envelope.get("reset")),
+                versions=envelope.get("versions"),
+                stream_id=envelope.get("stream_id"),
+            )
+            if connection_manager.get_connection_count() > 0:
+                await data_manager.broadcast_state()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "role": ROLE_WORKER,
+            "socket": self.path,
+            "connected": self.connected,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+fanout_publisher: Optional[FanoutPublisher] = None
+fanout_subscriber: Optional[FanoutSubscriber] = None
+
+
+async def start_fanout():
+    """按进程角色启动分发（在应用启动时调用）"""
+    global fanout_publisher, fanout_subscriber
+    if fanout_role == ROLE_PRIMARY:
+        fanout_publisher = FanoutPublisher(fanout_socket_path)
+        await fanout_publisher.start()
+        connection_manager.fanout = fanout_publisher
+        # 主进程即使没有本地观众也需要持续向工作进程同步状态
+        await data_manager.start_broadcast_scheduler()
+    elif fanout_role == ROLE_WORKER:
+        fanout_subscriber = FanoutSubscriber(fanout_socket_path)
+        await fanout_subscriber.start()
+
+
+async def stop_fanout():
+    """停止分发（在应用关闭时调用）"""
+    if fanout_publisher is not None:
+        connection_manager.fanout = None
+        await fanout_publisher.stop()
+    if fanout_subscriber is not None:
+        await fanout_subscriber.stop()
+
+
+def get_fanout_stats() -> Dict[str, Any]:
+    if fanout_publisher is not None:
+        return fanout_publisher.get_stats()
+    if fanout_subscriber is not None:
+        return fanout_subscriber.get_stats()
+    return {"role": fanout_role}
+
+
+def _serve(host: str, port: int, reuse_port: bool):
+    """在当前进程中运行应用（由集群启动器以子进程方式调用）"""
+    import uvicorn
+    config = uvicorn.Config("main:app", host=host, port=port)
+    server = uvicorn.Server(config)
+    if not reuse_port:
+        server.run()
+        return
+    # 多个工作进程共享同一端口，由内核分配新连接
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    server.run(sockets=[sock])
+
+
+def run_cluster(workers: int, host: str, port: int, worker_port: int):
+    """启动一个主进程和若干工作进程，任一进程退出时结束全部进程"""
+    procs: List[subprocess.Popen] = []
+
+    def spawn(role: str, serve_port: int, reuse_port: bool) -> subprocess.Popen:
+        env = dict(os.environ, CC_LIVE_ROLE=role, CC_LIVE_FANOUT_SOCKET=fanout_socket_path)
+        args = [sys.executable, "-m", "app.core.fanout", "--serve", "--host", host, "--port", str(serve_port)]
+        if reuse_port:
+            args.append("--reuse-port")
+        return subprocess.Popen(args, env=env)
+
+    procs.append(spawn(ROLE_PRIMARY, port, False))
+    for _ in range(workers):
+        procs.append(spawn(ROLE_WORKER, worker_port, True))
+    print(f"已启动主进程（端口 {port}）和 {workers} 个工作进程（端口 {worker_port}）")
+    try:
+        while all(p.poll() is None for p in procs):
+            try:
+                procs[0].wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CC Live 多进程 WebSocket 分发")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="工作进程数")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000, help="主进程端口（数据接收 API）")
+    parser.add_argument("--worker-port", type=int, default=8001, help="工作进程共享端口（/ws）")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--reuse-port", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        _serve(args.host, args.port, args.reuse_port)
+    else:
+        run_cluster(args.workers, args.host, args.port, args.worker_port)
@@ -1,56 +1,220 @@
 """
 游戏配置加载模块
-加载tournament_config.yml中的游戏规则和积分配置
+加载tournament_config.yml中的游戏规则和积分配置，
+并在加载时编译为带索引的只读快照（CompiledConfig），热路径上的查询均为 O(1)
 """
 
 import yaml
-from typing import Dict, Any, List
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple, Type
 from pathlib import Path
 
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.log import get_logger
+
+logger = get_logger("config")
+
+
+class _FrozenModel(BaseModel):
+    # 编译后的配置只读；未在模型中声明的配置项原样保留
+    model_config = ConfigDict(frozen=True, extra="allow")
+
+
+class TeamInfo(_FrozenModel):
+    id: str
+    name: str = ""
+    color: Optional[str] = None
+    players: Tuple[str, ...] = ()  # 预先登记的队员（可选），游戏开始时载入分数引擎
+
+
+class BingoRules(_FrozenModel):
+    team_placement: Dict[int, int] = Field(default_factory=dict)  # 队伍获取物品排名积分
+    team_placement_default: int = 5                                # 排名超出表格时的积分
+    player_bonus: int = 20                                         # 获取物品的玩家额外积分
+
+    def placement_score(self, rank: int) -> int:
+        return self.team_placement.get(rank, self.team_placement_default)
+
+
+class EscaperRules(_FrozenModel):
+    survival_bonus: int = 20
+    time_bonus: int = 2
+    time_interval: int = 10
+
+
+class ChaserRules(_FrozenModel):
+    complete_elimination: int = 30
+    chaser_bonus: int = 42
+    time_decay: int = 7
+    kill_bonus: int = 6
+
+
+class ParkourChaseRules(_FrozenModel):
+    escaper: EscaperRules = EscaperRules()
+    chaser: ChaserRules = ChaserRules()
+    max_chaser_times: int = 4
+
+
+class BattleBoxRules(_FrozenModel):
+    kill: int = 15
+    win: int = 40
+    draw: int = 15
+
+
+class TntrunRules(_FrozenModel):
+    survival: int = 4
+    placement_bonus: Dict[int, int] = Field(default_factory=dict)
+
+
+class SkywarsRules(_FrozenModel):
+    survival: int = 10
+    team_elimination: int = 2
+    kill: int = 40
+    last_standing: int = 50
+
+
+class HotCodRules(_FrozenModel):
+    survival: int = 15
+    first_holder_bonus: int = 10
+    placement_bonus: Dict[int, int] = Field(default_factory=dict)
+
+
+class CheckpointRules(_FrozenModel):
+    two_star: int = 2
+    three_star: Tuple[int, ...] = (5, 10, 10, 15, 20)
+    four_star: Tuple[int, ...] = (10, 15, 20, 25, 30)
+    five_star: Tuple[int, ...] = (15, 20, 25, 30, 50)
+
+
+class RunawayWarriorRules(_FrozenModel):
+    checkpoints: CheckpointRules = CheckpointRules()
+    completion_multiplier: Dict[str, float] = Field(default_factory=dict)
+
+
+class DodgingBoltRules(_FrozenModel):
+    elimination: int = 50
+    round_win: int = 100
+
+
+# 各游戏的积分规则模型；配置中缺失的项使用模型中的默认值
+GAME_RULE_MODELS: Dict[str, Type[_FrozenModel]] = {
+    "bingo": BingoRules,
+    "parkour_chase": ParkourChaseRules,
+    "battle_box": BattleBoxRules,
+    "tntrun": TntrunRules,
+    "skywars": SkywarsRules,
+    "hot_cod": HotCodRules,
+    "runaway_warrior": RunawayWarriorRules,
+    "dodging_bolt": DodgingBoltRules,
+}
+
+
+class CompiledConfig:
+    """
+    由配置文件编译出的只读快照：队伍按 ID/名称索引、颜色表、已补全默认值的各游戏规则、轮次倍数表
+    配置格式错误时抛出异常（pydantic.ValidationError / ValueError）
+    """
+
+    def __init__(self, raw: Optional[Dict[str, Any]] = None):
+        raw = raw or {}
+        if not isinstance(raw, dict):
+            raise ValueError("配置文件顶层必须是映射")
+        self.raw: Mapping[str, Any] = MappingProxyType(raw)
+
+        self.teams: Tuple[TeamInfo, ...] = tuple(TeamInfo.model_validate(t) for t in raw.get('teams') or [])
+        self.teams_by_id: Mapping[str, TeamInfo] = MappingProxyType({t.id: t for t in self.teams})
+        self.teams_by_name: Mapping[str, TeamInfo] = MappingProxyType({t.name: t for t in self.teams if t.name})
+        self.team_colors: Mapping[str, Optional[str]] = MappingProxyType({t.id: t.color for t in self.teams})
+
+        self.games: Tuple[Dict[str, Any], ...] = tuple(raw.get('games') or [])
+        self.games_by_id: Mapping[str, Dict[str, Any]] = MappingProxyType({g.get('id'): g for g in self.games})
+
+        scoring = raw.get('scoring') or {}
+        self.rules: Mapping[str, _FrozenModel] = MappingProxyType({
+            game_id: model.model_validate(scoring.get(game_id) or {})
+            for game_id, model in GAME_RULE_MODELS.items()
+        })
+        self.event_types: Mapping[str, List[Dict[str, Any]]] = MappingProxyType(dict(raw.get('event_types') or {}))
+        self.round_multipliers: Mapping[int, float] = MappingProxyType({
+            int(round_num): float(multiplier) for round_num, multiplier in (raw.get('round_multipliers') or {}).items()
+        })
+
+    def resolve_team(self, key: Optional[str]) -> Optional[TeamInfo]:
+        """按队伍 ID 查找，找不到时按队伍名称（中文队名）查找"""
+        if not key:
+            return None
+        return self.teams_by_id.get(key) or self.teams_by_name.get(key)
+
 
 class GameConfig:
     def __init__(self, config_path: str = "tournament_config.yml"):
         self.config_path = Path(config_path)
         self.config: Dict[str, Any] = {}
+        self.compiled = CompiledConfig()
+        # 每次成功加载后递增；热更新时随 config_changed 消息下发
+        self.version = 0
+        self.loaded_at: Optional[str] = None
+        self.last_error: Optional[str] = None
         self.load_config()
-    
+
+    def parse(self) -> Tuple[Dict[str, Any], CompiledConfig]:
+        """
+        读取并编译配置文件，不修改当前配置（可在线程池中执行）
+        文件不存在、YAML 语法错误或规则不合法时抛出异常
+        """
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+        return config, CompiledConfig(config)
+
+    def apply(self, config: Dict[str, Any], compiled: CompiledConfig):
+        """替换为新编译的配置；读取方每次都从 self.compiled 取快照，替换即时生效"""
+        self.config = config
+        self.compiled = compiled
+        self.version += 1
+        self.loaded_at = datetime.now().isoformat()
+        self.last_error = None
+
     def load_config(self):
         """加载配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.config = yaml.safe_load(f)
+            config, compiled = self.parse()
         except Exception as e:
-            print(f"加载配置文件失败: {e}")
-            self.config = {}
-    
+            logger.error("加载配置文件失败: %s", e)
+            self.apply({}, CompiledConfig())
+            self.last_error = str(e)
+            return
+        self.apply(config, compiled)
+
     def get_teams(self) -> List[Dict[str, str]]:
         """获取队伍配置"""
         return self.config.get('teams', [])
-    
+
     def get_games(self) -> List[Dict[str, Any]]:
         """获取游戏配置"""
         return self.config.get('games', [])
-    
+
     def get_scoring_rules(self, game_id: str) -> Dict[str, Any]:
-        """获取特定游戏的积分规则"""
+        """获取特定游戏的积分规则（配置文件中的原始数据）"""
         return self.config.get('scoring', {}).get(game_id, {})
-    
+
+    def get_rules(self, game_id: str) -> Optional[_FrozenModel]:
+        """获取特定游戏已补全默认值的积分规则"""
+        return self.compiled.rules.get(game_id)
+
     def get_event_types(self, game_id: str) -> List[Dict[str, Any]]:
         """获取特定游戏的事件类型"""
-        return self.config.get('event_types', {}).get(game_id, [])
-    
+        return self.compiled.event_types.get(game_id, [])
+
     def get_round_multiplier(self, round_num: int) -> float:
         """获取轮次积分倍数"""
-        return self.config.get('round_multipliers', {}).get(round_num, 1.0)
-    
+        return self.compiled.round_multipliers.get(round_num, 1.0)
+
     def get_game_info(self, game_id: str) -> Dict[str, Any]:
         """获取游戏详细信息"""
-        games = self.get_games()
-        for game in games:
-            if game.get('id') == game_id:
-                return game
-        return {}
+        return self.compiled.games_by_id.get(game_id, {})
 
 
 # 全局配置实例
-game_config = GameConfig()
\ No newline at end of file
+game_config = GameConfig()
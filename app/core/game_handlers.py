@@ -0,0 +1,476 @@
+"""
+各游戏的积分处理器
+每个游戏对应一个 GameHandler 子类，用 @register_game 登记到 GAME_HANDLERS。
+分数引擎在游戏开始时创建处理器，由配置快照编译出积分规则与事件分派表（事件名 -> 处理方法），
+处理事件时只做一次字典查找；配置热更新后在下一条事件前重新编译，游戏内状态保留。
+
+分派表按配置文件 event_types 中该游戏声明的事件生成：每项的 handler 字段指定处理方法名（on_ 开头），
+未指定时按处理器类的 events 查找默认方法；没有对应处理方法的事件不参与积分预测并记录警告。
+配置中没有该游戏的 event_types 时使用处理器类的 events。
+
+新增游戏时在任意启动时导入的模块中定义处理器即可，无需修改分数引擎：
+
+    @register_game
+    class MyGameHandler(GameHandler):
+        game_id = "my_game"
+        rules_model = MyGameRules          # 可选，scoring.my_game 按此模型补全默认值
+        events = {"Kill": "on_kill"}
+
+        def on_kill(self, player, team, lore):
+            self.add_score(team, player, self.rules.kill)
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.core.game_config import CompiledConfig
+from app.core.log import get_logger
+
+if TYPE_CHECKING:
+    from app.core.score_engine import ScorePredictionEngine
+
+logger = get_logger("ingest")
+
+# 游戏ID -> 处理器类
+GAME_HANDLERS: Dict[str, Type["GameHandler"]] = {}
+
+
+def register_game(handler_cls: Type["GameHandler"]) -> Type["GameHandler"]:
+    """登记游戏处理器（类装饰器），同一游戏ID后登记的处理器覆盖之前的"""
+    if not handler_cls.game_id:
+        raise ValueError(f"{handler_cls.__name__} 未设置 game_id")
+    GAME_HANDLERS[handler_cls.game_id] = handler_cls
+    return handler_cls
+
+
+class GameHandler:
+    """
+    游戏积分处理器基类
+
+    子类设置:
+        game_id       游戏ID（与配置文件中的 games[].id 一致）
+        rules_model   积分规则模型（可选）；game_config 中已有该游戏的规则时直接使用编译好的规则
+        events        事件名 -> 默认处理方法名（配置 event_types 未指定 handler 时使用），处理方法签名为 (player, team, lore)
+    """
+
+    game_id: str = ""
+    rules_model: Optional[Type[BaseModel]] = None
+    events: Dict[str, str] = {}
+
+    def __init__(self, engine: "ScorePredictionEngine"):
+        self.engine = engine
+        self.rules: Any = None
+        self.config_version: Optional[int] = None
+        self.dispatch: Dict[str, Callable[[Optional[str], Optional[str], str], None]] = {}
+        self.declared_events: Tuple[str, ...] = ()
+        self.state: Dict[str, Any] = {}
+        self.reset()
+
+    def reset(self):
+        """重置游戏内状态（子类覆盖）"""
+        self.state = {}
+
+    def compile(self, config: CompiledConfig, version: Optional[int] = None):
+        """由配置快照编译积分规则与事件分派表"""
+        rules = config.rules.get(self.game_id)
+        if rules is None and self.rules_model is not None:
+            rules = self.rules_model.model_validate((config.raw.get('scoring') or {}).get(self.game_id) or {})
+        self.rules = rules
+        self.compile_rules(rules)
+
+        declared = [item for item in config.event_types.get(self.game_id, []) if isinstance(item, dict) and item.get('event')]
+        self.declared_events = tuple(item['event'] for item in declared)
+        if not declared:
+            logger.warning("配置中没有游戏 %s 的 event_types，使用处理器默认的事件分派", self.game_id)
+            declared = [{'event': event} for event in self.events]
+
+        dispatch: Dict[str, Callable[[Optional[str], Optional[str], str], None]] = {}
+        unhandled = []
+        for item in declared:
+            event = item['event']
+            # 只允许 on_ 开头的处理方法，配置不能指向 reset 等内部方法
+            method_name = item.get('handler') or self.events.get(event)
+            method = getattr(self, method_name, None) if isinstance(method_name, str) and method_name.startswith('on_') else None
+            if callable(method):
+                dispatch[event] = method
+            else:
+                unhandled.append(event)
+        self.dispatch = dispatch
+        if unhandled:
+            logger.warning("游戏 %s 的事件没有对应的处理方法，不参与积分预测: %s", self.game_id, ", ".join(unhandled))
+        self.config_version = version
+
+    def compile_rules(self, rules: Any):
+        """由积分规则预先计算查表数据（子类按需覆盖）"""
+
+    def declare_teams(self, teams: List[str]):
+        """调用方指定本场参赛的队伍（设置回合时传入 teams，子类按需覆盖）"""
+
+    def handle(self, event_data: Dict[str, Any]):
+        handler = self.dispatch.get(event_data.get('event'))
+        if handler is not None:
+            handler(event_data.get('player'), event_data.get('team'), event_data.get('lore', ''))
+
+    # 供子类使用的引擎状态
+    @property
+    def team_players(self) -> Dict[str, Dict[str, None]]:
+        return self.engine.team_players
+
+    @property
+    def player_team(self) -> Dict[str, str]:
+        return self.engine.player_team
+
+    def add_score(self, team: str, player: str, delta: int):
+        self.engine._add_score(team, player, delta)
+
+
+@register_game
+class BingoHandler(GameHandler):
+    """宾果时速"""
+
+    game_id = "bingo"
+    events = {"Item_Found": "on_item_found"}
+
+    def reset(self):
+        self.state = {
+            'item_teams': {}  # 物品 -> 按获取顺序排列的队伍
+        }
+
+    def on_item_found(self, player, team, lore):
+        # 记录队伍获取物品的顺序
+        item_teams = self.state['item_teams'].setdefault(lore, [])
+        if team in item_teams:
+            return
+        item_teams.append(team)
+
+        # 给队伍所有玩家加排名积分，找到物品的玩家额外加分
+        team_score = self.rules.placement_score(len(item_teams))
+        for team_player in self.team_players[team]:
+            self.add_score(team, team_player, team_score)
+        self.add_score(team, player, self.rules.player_bonus)
+
+
+@register_game
+class ParkourChaseHandler(GameHandler):
+    """跑酷追击"""
+
+    game_id = "parkour_chase"
+    events = {
+        "Chaser_Selected": "on_chaser_selected",
+        "Round_Start": "on_round_start",
+        "Player_Tagged": "on_player_tagged",
+        "Round_Over": "on_round_over",
+    }
+
+    def reset(self):
+        self.state = {
+            'chaser_counts': defaultdict(int),  # 追击者次数统计
+            'round_start_time': None,
+            'current_chasers': set(),
+            'eliminated_players': set()
+        }
+
+    def on_chaser_selected(self, player, team, lore):
+        self.state['current_chasers'].add(player)
+        self.state['chaser_counts'][player] += 1
+
+    def on_round_start(self, player, team, lore):
+        self.state['round_start_time'] = datetime.now()
+        self.state['eliminated_players'] = set()
+
+    def on_player_tagged(self, player, team, lore):
+        # lore 为被标记的玩家，追击者获得击杀积分
+        self.state['eliminated_players'].add(lore)
+        self.add_score(team, player, self.rules.chaser.kill_bonus)
+
+    def on_round_over(self, player, team, lore):
+        chasers = self.state['current_chasers']
+        eliminated = self.state['eliminated_players']
+        if self.state['round_start_time']:
+            # 给存活的逃生者存活奖励和时间奖励
+            duration = (datetime.now() - self.state['round_start_time']).total_seconds()
+            escaper = self.rules.escaper
+            bonus = escaper.survival_bonus + escaper.time_bonus * int(duration // escaper.time_interval)
+            for team_id, players in self.team_players.items():
+                for p in players:
+                    if p not in eliminated and p not in chasers:
+                        self.add_score(team_id, p, bonus)
+
+            # 追击者抓住所有逃生者
+            if len(eliminated) >= len(self.player_team) - len(chasers):
+                for chaser in chasers:
+                    chaser_team = self.player_team.get(chaser)
+                    if chaser_team:
+                        self.add_score(chaser_team, chaser, self.rules.chaser.complete_elimination)
+
+        # 重置回合状态
+        self.state['current_chasers'] = set()
+
+
+@register_game
+class BattleBoxHandler(GameHandler):
+    """斗战方框"""
+
+    game_id = "battle_box"
+    events = {
+        "Kill": "on_kill",
+        "Wool_Win": "on_wool_win",
+    }
+
+    def on_kill(self, player, team, lore):
+        self.add_score(team, player, self.rules.kill)
+
+    def on_wool_win(self, player, team, lore):
+        # 给获胜队伍所有玩家加分
+        for team_player in self.team_players[team]:
+            self.add_score(team, team_player, self.rules.win)
+
+
+@register_game
+class TntrunHandler(GameHandler):
+    """TNT飞跃"""
+
+    game_id = "tntrun"
+    events = {
+        "Round_Start": "on_round_start",
+        "Player_Fall": "on_player_fall",
+        "Round_Over": "on_round_over",
+    }
+
+    def reset(self):
+        self.state = {
+            'elimination_order': [],  # 淘汰顺序
+            'eliminated': set(),  # 已淘汰玩家（用于 O(1) 判断）
+            'players_in_round': set()
+        }
+
+    def on_round_start(self, player, team, lore):
+        self.state['elimination_order'] = []
+        self.state['eliminated'] = set()
+        self.state['players_in_round'] = set(self.player_team)
+
+    def on_player_fall(self, player, team, lore):
+        eliminated = self.state['eliminated']
+        if player in eliminated:
+            return
+        self.state['elimination_order'].append(player)
+        eliminated.add(player)
+
+        # 每有一名玩家坠落，仍存活的玩家得分
+        for team_id, players in self.team_players.items():
+            for p in players:
+                if p not in eliminated:
+                    self.add_score(team_id, p, self.rules.survival)
+
+    def on_round_over(self, player, team, lore):
+        # 最后存活的前三名玩家获得排名奖励
+        eliminated = self.state['eliminated']
+        survived_players = [
+            (p, team_id) for team_id, players in self.team_players.items() for p in players if p not in eliminated
+        ]
+        for i, (p, team_id) in enumerate(survived_players[:3]):
+            self.add_score(team_id, p, self.rules.placement_bonus.get(i + 1, 0))
+
+
+@register_game
+class SkywarsHandler(GameHandler):
+    """空岛乱斗"""
+
+    game_id = "skywars"
+    events = {
+        "Kill": "on_kill",
+        "Fall": "on_fall",
+        "Round_Over": "on_round_over",
+    }
+
+    def reset(self):
+        self.state = {
+            'eliminated_players': set(),
+            'team_elimination_count': defaultdict(int)
+        }
+
+    def _reward_survivors(self, score: int):
+        eliminated = self.state['eliminated_players']
+        for team_id, players in self.team_players.items():
+            for p in players:
+                if p not in eliminated:
+                    self.add_score(team_id, p, score)
+
+    def on_kill(self, player, team, lore):
+        # lore 为被击杀的玩家
+        self.add_score(team, player, self.rules.kill)
+        self.state['eliminated_players'].add(lore)
+
+    def on_fall(self, player, team, lore):
+        self.state['eliminated_players'].add(player)
+        self._reward_survivors(self.rules.survival)
+
+    def on_round_over(self, player, team, lore):
+        self._reward_survivors(self.rules.last_standing)
+
+
+@register_game
+class HotCodHandler(GameHandler):
+    """烫手鳕鱼"""
+
+    game_id = "hot_cod"
+    events = {
+        "Cod_Passed": "on_cod_passed",
+        "Death": "on_death",
+    }
+
+    def reset(self):
+        self.state = {
+            'arena_players': defaultdict(set),  # 每个场地的玩家
+            'elimination_order': defaultdict(list),  # 每个场地的淘汰顺序
+            'first_holders': set()  # 第一位持有者
+        }
+
+    def on_cod_passed(self, player, team, lore):
+        # 记录第一位持有者
+        if not self.state['first_holders']:
+            self.state['first_holders'].add(player)
+            self.add_score(team, player, self.rules.first_holder_bonus)
+
+    def on_death(self, player, team, lore):
+        # 事件中没有场地信息，暂按单一场地处理
+        arena_id = 1
+        self.state['elimination_order'][arena_id].append(player)
+
+        # 给同场地其他玩家存活积分
+        for team_id, players in self.team_players.items():
+            for p in players:
+                if p != player:
+                    self.add_score(team_id, p, self.rules.survival)
+
+
+@register_game
+class RunawayWarriorHandler(GameHandler):
+    """跑路战士"""
+
+    game_id = "runaway_warrior"
+    events = {
+        "Checkpoint": "on_checkpoint",
+        "Player_Finish": "on_player_finish",
+    }
+
+    def reset(self):
+        self.state = {
+            'checkpoint_progress': defaultdict(list),  # 玩家检查点进度
+            'star_counts': defaultdict(lambda: defaultdict(int)),  # 玩家通过的各星级检查点数
+            'completion_routes': {}  # 完成路线类型
+        }
+
+    def compile_rules(self, rules):
+        # 主线检查点按星级查表：(星级标记, 第 n 次通过该星级时的积分)，按顺序匹配检查点ID
+        checkpoints = rules.checkpoints
+        self.star_tables = (
+            ('2star', (checkpoints.two_star,)),
+            ('3star', checkpoints.three_star),
+            ('4star', checkpoints.four_star),
+            ('5star', checkpoints.five_star),
+        )
+
+    def on_checkpoint(self, player, team, lore):
+        self.state['checkpoint_progress'][player].append(lore)
+        counts = self.state['star_counts'][player]
+        for star, _ in self.star_tables:
+            if star in lore:
+                counts[star] += 1
+        if not lore.startswith('main'):
+            return
+
+        # 主线检查点按星级计分（第 n 次通过同一星级取表中第 n 项，超出时取最后一项）
+        score = 0
+        for star, scores in self.star_tables:
+            if star in lore:
+                score = scores[min(counts[star] - 1, len(scores) - 1)]
+                break
+        self.add_score(team, player, score)
+
+    def on_player_finish(self, player, team, lore):
+        # lore 为路线类型（simple/normal/hard），完成路线的积分在最终结算时计算
+        self.state['completion_routes'][player] = lore
+
+
+@register_game
+class DodgingBoltHandler(GameHandler):
+    """
+    躲避箭（最终对决）
+    事件只带被淘汰的玩家、不带射手，淘汰积分记给对方：对手队伍中仍在场上的玩家各得 elimination；
+    赢得一轮时获胜队伍的玩家获得回合胜利积分
+
+    对手只在参加对决的队伍中确定：设置回合时传入的 teams，以及本场事件中出现过的队伍。
+    对方队伍尚未出现时，淘汰先记为待结算，对方队伍第一次出现时补记
+    """
+
+    game_id = "dodging_bolt"
+    events = {
+        "Player_Eliminated": "on_player_eliminated",
+        "Round_Win": "on_round_win",
+        "Tournament_End": "on_tournament_end",
+    }
+
+    def reset(self):
+        self.state = {
+            'teams': {},  # 参加对决的队伍（按出现顺序）
+            'pending_eliminations': [],  # 对方队伍尚未确定时的淘汰：(被淘汰玩家的队伍, 当时已淘汰的玩家)
+            'eliminated_players': set(),  # 本轮已淘汰的玩家
+            'elimination_causes': {},  # 玩家 -> 淘汰方式（shot/fall）
+            'round_wins': defaultdict(int),  # 队伍赢得的轮数
+            'champion': None
+        }
+
+    def declare_teams(self, teams):
+        for team_id in teams:
+            self._join(team_id)
+
+    def _credit_elimination(self, team_id: str, eliminated):
+        for p in self.team_players.get(team_id, ()):
+            if p not in eliminated:
+                self.add_score(team_id, p, self.rules.elimination)
+
+    def _join(self, team_id: Optional[str]):
+        """登记参赛队伍；新队伍补记此前无法确定对手的淘汰"""
+        if not team_id or team_id in self.state['teams']:
+            return
+        self.state['teams'][team_id] = None
+        pending = []
+        for eliminated_team, eliminated in self.state['pending_eliminations']:
+            if eliminated_team == team_id:
+                pending.append((eliminated_team, eliminated))
+            else:
+                self._credit_elimination(team_id, eliminated)
+        self.state['pending_eliminations'] = pending
+
+    def on_player_eliminated(self, player, team, lore):
+        if not player or player in self.state['eliminated_players']:
+            return
+        self._join(team)
+        self.state['eliminated_players'].add(player)
+        self.state['elimination_causes'][player] = lore
+
+        eliminated = frozenset(self.state['eliminated_players'])
+        opponents = [team_id for team_id in self.state['teams'] if team_id != team]
+        if not opponents:
+            self.state['pending_eliminations'].append((team, eliminated))
+        for team_id in opponents:
+            self._credit_elimination(team_id, eliminated)
+
+    def on_round_win(self, player, team, lore):
+        # lore 为获胜队伍
+        winner = lore or team
+        if winner:
+            self._join(winner)
+            self.state['round_wins'][winner] += 1
+            for team_player in self.team_players.get(winner, ()):
+                self.add_score(winner, team_player, self.rules.round_win)
+        # 新的一轮开始，所有玩家回到场上
+        self.state['eliminated_players'] = set()
+
+    def on_tournament_end(self, player, team, lore):
+        # lore 为冠军队伍，只记录结果，不计入积分预测
+        self.state['champion'] = lore or team
@@ -0,0 +1,166 @@
+"""
+异步事件接入队列
+INGEST_MODE=queue 时，游戏事件校验后放入有界队列并立即返回 202 与分配的序号，
+由单个消费任务严格按到达顺序执行（分数引擎、数据管理器、广播），插件的 HTTP 请求不再等待广播完成
+
+环境变量:
+    INGEST_MODE         sync（默认，在请求内同步处理）或 queue
+    INGEST_QUEUE_SIZE   队列容量（默认 10000），队列已满时接口返回 503
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.log import get_logger
+
+logger = get_logger("ingest")
+
+
+class LatencyTracker:
+    """保留最近若干个耗时样本，用于统计分位数"""
+
+    def __init__(self, size: int = 1024):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        self.samples.append(ms)
+        self.count += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {"count": self.count}
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+        return {
+            "count": self.count,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": round(self.max_ms, 3),
+        }
+
+
+class IngestQueueFull(Exception):
+    """接入队列已满"""
+
+
+class IngestQueue:
+    def __init__(self):
+        self.mode = os.environ.get("INGEST_MODE", "sync").strip().lower()
+        self.enabled = self.mode == "queue"
+        self.maxsize = max(1, int(os.environ.get("INGEST_QUEUE_SIZE", "10000")))
+        # 队列与消费任务在首次提交时于事件循环内创建
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        # 最近分配的序号与最近处理完成的序号
+        self.seq = 0
+        self.applied_seq = 0
+        # 统计
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        # 入队到处理完成的耗时；接收到广播发出的耗时（由 GameEventBatcher 记录）
+        self.queue_latency = LatencyTracker()
+        self.broadcast_latency = LatencyTracker()
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_consumer(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+
+    def _put(self, handler: Callable[..., Awaitable[Any]], args: tuple, future: Optional[asyncio.Future]) -> int:
+        self._ensure_consumer()
+        if self._queue.full():
+            self.rejected += 1
+            raise IngestQueueFull(f"事件处理队列已满（{self.maxsize}）")
+        self.seq += 1
+        self._queue.put_nowait((self.seq, time.monotonic(), handler, args, future))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return self.seq
+
+    def submit(self, handler: Callable[..., Awaitable[Any]], *args) -> int:
+        """
+        加入队列后立即返回（不等待处理）
+
+        参数:
+            handler: 处理函数（协程函数），由消费任务以 handler(*args) 调用
+        返回:
+            int: 分配的序号，序号顺序即处理顺序
+        异常:
+            IngestQueueFull: 队列已满
+        """
+        return self._put(handler, args, None)
+
+    async def call(self, handler: Callable[..., Awaitable[Any]], *args) -> Any:
+        """加入队列并等待处理完成，返回 handler 的结果（与队列中的其他事件保持先后顺序）"""
+        future = asyncio.get_running_loop().create_future()
+        self._put(handler, args, future)
+        return await future
+
+    async def _consume(self):
+        while True:
+            seq, enqueued_at, handler, args, future = await self._queue.get()
+            try:
+                result = await handler(*args)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("处理队列中的事件 #%s 失败: %s", seq, e)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                self.processed += 1
+                self.applied_seq = seq
+                self.queue_latency.record(time.monotonic() - enqueued_at)
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 5.0):
+        """处理完队列中剩余的事件（最多等待 timeout 秒）后停止消费任务"""
+        if self._consumer is None:
+            return
+        if self._queue is not None and not self._consumer.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("关闭时仍有 %s 个事件未处理", self.depth())
+        self._consumer.cancel()
+        self._consumer = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "seq": self.seq,
+            "applied_seq": self.applied_seq,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_latency_ms": self.queue_latency.get_stats(),
+            "ingest_to_broadcast_ms": self.broadcast_latency.get_stats(),
+        }
+
+
+# 全局事件接入队列实例
+ingest_queue = IngestQueue()
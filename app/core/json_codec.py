@@ -0,0 +1,88 @@
+"""
+JSON 编码层
+广播消息、状态分段与 API 响应统一经由此处编码：安装了 orjson 时使用 orjson，否则回退到标准库 json。
+Pydantic 模型可直接传入，由模型自身的序列化器输出 JSON，不经过中间 dict。
+
+环境变量:
+    JSON_BACKEND    auto（默认，优先 orjson）/ orjson / stdlib
+"""
+
+import datetime
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+from app.core.log import get_logger
+
+logger = get_logger("app")
+
+_requested = os.environ.get("JSON_BACKEND", "auto").strip().lower()
+if _requested == "orjson" and orjson is None:
+    logger.warning("未安装 orjson，JSON 编码回退为标准库")
+json_backend = "orjson" if orjson is not None and _requested in ("auto", "orjson") else "stdlib"
+
+# orjson 3.9+ 支持嵌入已编码的 JSON 片段，嵌套的 Pydantic 模型可直接输出而不转成 dict
+_HAS_FRAGMENT = orjson is not None and hasattr(orjson, "Fragment")
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def to_builtin(obj: Any) -> Any:
+    """把 JSON 不直接支持的对象转为基础类型（也用作 msgpack/cbor 编码的 default）；其他类型与 json.dumps 一样抛出 TypeError"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson_default(obj: Any) -> Any:
+    if _HAS_FRAGMENT and isinstance(obj, BaseModel):
+        return orjson.Fragment(obj.__pydantic_serializer__.to_json(obj))
+    return to_builtin(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """编码为 UTF-8 JSON 字节串（紧凑格式，不转义非 ASCII 字符）"""
+    if isinstance(obj, BaseModel):
+        return obj.__pydantic_serializer__.to_json(obj)
+    if json_backend == "orjson":
+        try:
+            return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # 超出 64 位的整数等 orjson 不支持的值交给标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=to_builtin).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """编码为 JSON 文本"""
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """解码 JSON 文本或字节串"""
+    if json_backend == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    使用统一编码层输出的 JSON 响应
+
+    作为 default_response_class 时，FastAPI 仍会先对路由返回值执行 jsonable_encoder，这里只替换最后的编码步骤；
+    需要完全跳过 jsonable_encoder 的路由应直接返回 FastJSONResponse 实例
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
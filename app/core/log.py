@@ -0,0 +1,197 @@
+"""
+日志系统
+所有日志记录先放入内存队列，由后台线程负责格式化与输出，热路径上只有一次入队操作。
+按类别（logger 名称 cc_live.<类别>）支持独立的级别、采样率与速率限制。
+
+环境变量:
+    LOG_LEVEL        全局级别（默认 INFO）
+    LOG_LEVELS       按类别覆盖级别，如 "broadcast=DEBUG,ingest=WARNING"
+    LOG_SAMPLE       按类别采样率（0-1），如 "broadcast=0.01"
+    LOG_RATE_LIMIT   按类别每秒最多输出的条数，如 "ingest=50"
+    LOG_FORMAT       text（默认）或 json
+    LOG_QUEUE_SIZE   日志队列容量（默认 10000），队列满时丢弃新记录
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+ROOT_LOGGER = "cc_live"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_DeferredQueueHandler"] = None
+_lock = threading.Lock()
+
+
+def _parse_mapping(raw: Optional[str]) -> Dict[str, str]:
+    """解析形如 "a=1,b=2" 的按类别配置"""
+    result: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            result[name.strip()] = value.strip()
+    return result
+
+
+def _category(record: logging.LogRecord) -> str:
+    name = record.name
+    return name[len(ROOT_LOGGER) + 1:] if name.startswith(ROOT_LOGGER + ".") else name
+
+
+class CategoryFilter(logging.Filter):
+    """
+    按类别采样与限速；WARNING 及以上级别的记录总是保留
+    """
+
+    def __init__(self, sample: Dict[str, float], rate_limit: Dict[str, float]):
+        super().__init__()
+        self.sample = sample
+        self.rate_limit = rate_limit
+        # 令牌桶：类别 -> [剩余令牌, 上次补充时间]
+        self._buckets: Dict[str, list] = {}
+        self.sampled_out: Dict[str, int] = {}
+        self.rate_limited: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = _category(record)
+        rate = self.sample.get(category)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out[category] = self.sampled_out.get(category, 0) + 1
+            return False
+        limit = self.rate_limit.get(category)
+        if limit is not None:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(category, [limit, now])
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                self.rate_limited[category] = self.rate_limited.get(category, 0) + 1
+                return False
+            bucket[0] -= 1
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    入队时不格式化消息（标准 QueueHandler 会在调用线程中格式化），由后台线程完成；
+    队列已满时丢弃记录而不是阻塞或报错
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 异常信息需要在原线程中展开
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON，extra 中的字段一并输出"""
+
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "category": _category(record),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """
+    初始化日志系统并启动后台输出线程（重复调用无副作用）
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+        for category, level in _parse_mapping(os.environ.get("LOG_LEVELS")).items():
+            logging.getLogger(f"{ROOT_LOGGER}.{category}").setLevel(level.upper())
+
+        sample: Dict[str, float] = {}
+        for category, value in _parse_mapping(os.environ.get("LOG_SAMPLE")).items():
+            try:
+                sample[category] = min(1.0, max(0.0, float(value)))
+            except ValueError:
+                pass
+        rate_limit: Dict[str, float] = {}
+        for category, value in _parse_mapping(os.environ.get("LOG_RATE_LIMIT")).items():
+            try:
+                rate_limit[category] = max(0.0, float(value))
+            except ValueError:
+                pass
+
+        output = logging.StreamHandler(sys.stdout)
+        if os.environ.get("LOG_FORMAT", "text").lower() == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+        _handler = _DeferredQueueHandler(queue.Queue(maxsize=max(1, int(os.environ.get("LOG_QUEUE_SIZE", "10000")))))
+        _handler.addFilter(CategoryFilter(sample, rate_limit))
+        root.addHandler(_handler)
+
+        _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台线程，输出队列中剩余的记录"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(category: str) -> logging.Logger:
+    """获取某个类别的 logger（cc_live.<category>）"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def get_log_stats() -> Dict[str, Any]:
+    """日志系统统计：队列积压、因队列已满丢弃、被采样或限速过滤的记录数"""
+    if _handler is None:
+        return {"enabled": False}
+    stats: Dict[str, Any] = {
+        "enabled": _listener is not None,
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+    }
+    for f in _handler.filters:
+        if isinstance(f, CategoryFilter):
+            stats["sampled_out"] = dict(f.sampled_out)
+            stats["rate_limited"] = dict(f.rate_limited)
+    return stats
@@ -0,0 +1,149 @@
+"""
+定时广播调度器
+按固定节拍执行广播（补偿每次执行耗时，不随执行时间漂移），节拍随游戏状态调整，
+并在事件循环延迟或发送队列积压升高时自动降频
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.websocket import connection_manager
+from app.core.log import get_logger
+
+logger = get_logger("scheduler")
+
+
+# 各游戏状态下的默认广播间隔（秒）；default 用于未知状态，idle 用于尚未收到任何状态时
+DEFAULT_TICK_INTERVALS: Dict[str, float] = {
+    "gaming": 1.0,
+    "voting": 0.5,
+    "halfing": 3.0,
+    "setting": 3.0,
+    "idle": 5.0,
+    "default": 1.0,
+}
+
+
+def parse_tick_intervals(raw: Optional[str]) -> Dict[str, float]:
+    """
+    解析形如 "gaming=1,voting=0.5,halfing=3" 的间隔配置，未配置的状态使用默认值
+    """
+    intervals = dict(DEFAULT_TICK_INTERVALS)
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            intervals[name.strip().lower()] = max(0.05, float(value))
+        except ValueError:
+            logger.warning("忽略无效的广播间隔配置: %s", item)
+    return intervals
+
+
+class TickScheduler:
+    def __init__(self):
+        self.intervals = parse_tick_intervals(os.environ.get("BROADCAST_TICK_INTERVALS"))
+        # 事件循环延迟（毫秒）或发送队列占用率超过阈值时降频
+        self.lag_threshold_ms = float(os.environ.get("BROADCAST_LAG_THRESHOLD_MS", "100"))
+        self.queue_threshold = float(os.environ.get("BROADCAST_QUEUE_THRESHOLD", "0.5"))
+        self.max_backoff = max(1.0, float(os.environ.get("BROADCAST_MAX_BACKOFF", "8")))
+        self.backoff = 1.0
+        self.status: Optional[str] = None
+        self.interval = self.intervals["idle"]
+        self._wake: Optional[asyncio.Event] = None
+        # 统计
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def interval_for(self, status: Optional[str]) -> float:
+        """给定游戏状态对应的基础广播间隔"""
+        if not status:
+            return self.intervals["idle"]
+        return self.intervals.get(status.lower(), self.intervals["default"])
+
+    def wake(self):
+        """立即执行下一次节拍（例如游戏状态切换时）"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def _adjust_backoff(self):
+        """根据事件循环延迟和发送队列积压调整降频倍数：超过阈值时翻倍，恢复后逐步减半"""
+        queue_load = connection_manager.max_queue_depth() / connection_manager.queue_size
+        if self.lag_ms > self.lag_threshold_ms or queue_load > self.queue_threshold:
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+        elif self.backoff > 1.0:
+            self.backoff = max(1.0, self.backoff / 2)
+
+    async def run(self, tick: Callable[[], Awaitable[Any]], status_provider: Callable[[], Optional[str]]):
+        """
+        按节拍循环执行 tick，直到任务被取消
+
+        参数:
+            tick: 每个节拍执行的协程函数
+            status_provider: 返回当前游戏状态（决定基础间隔）
+        """
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        deadline = loop.time()
+        while True:
+            started = time.perf_counter()
+            try:
+                await tick()
+            except Exception as e:
+                logger.warning("广播循环出错: %s", e)
+            elapsed = time.perf_counter() - started
+            self.ticks += 1
+            self.last_tick_ms = elapsed * 1000
+            self.max_tick_ms = max(self.max_tick_ms, self.last_tick_ms)
+
+            self.status = status_provider()
+            self._adjust_backoff()
+            self.interval = self.interval_for(self.status) * self.backoff
+            if elapsed > self.interval:
+                self.overruns += 1
+
+            # 以上一次的计划时间为基准推进，执行耗时不会累积成漂移；落后整拍时跳过而不是连发补齐
+            deadline += self.interval
+            now = loop.time()
+            if now > deadline:
+                missed = int((now - deadline) // self.interval) + 1
+                self.skipped_ticks += missed
+                deadline += missed * self.interval
+
+            woken = False
+            try:
+                await asyncio.wait_for(self._wake.wait(), deadline - loop.time())
+                woken = True
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            now = loop.time()
+            if woken:
+                deadline = now
+            else:
+                # 实际唤醒时间与计划时间的差即事件循环延迟（指数平滑）
+                lag = max(0.0, now - deadline) * 1000
+                self.lag_ms = self.lag_ms * 0.5 + lag * 0.5
+                self.max_lag_ms = max(self.max_lag_ms, lag)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "interval": round(self.interval, 3),
+            "backoff": self.backoff,
+            "intervals": self.intervals,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "last_tick_ms": round(self.last_tick_ms, 3),
+            "max_tick_ms": round(self.max_tick_ms, 3),
+            "loop_lag_ms": round(self.lag_ms, 3),
+            "max_loop_lag_ms": round(self.max_lag_ms, 3),
+        }
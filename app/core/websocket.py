@@ -3,12 +3,276 @@ WebSocket连接管理器
 管理客户端连接和消息广播
 """
 
-import json
+import os
+import time
+import uuid
+import zlib
 import asyncio
-from typing import Dict, List, Set
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set, Union
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
 
+from app.core.json_codec import dumps, to_builtin
+from app.core.log import get_logger
+
+logger = get_logger("websocket")
+# 每次广播的日志单独归类，便于采样或限速
+broadcast_logger = get_logger("broadcast")
+
+# 可选的二进制编码（未安装时客户端回退为 JSON）
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+try:
+    import cbor2
+except Exception:
+    cbor2 = None
+
+
+# 线路编码格式：名称 -> 编码函数（返回 bytes 的格式以二进制帧发送）
+WIRE_ENCODERS: Dict[str, Callable[[dict], bytes]] = {}
+if msgpack is not None:
+    WIRE_ENCODERS["msgpack"] = lambda message: msgpack.packb(message, use_bin_type=True, default=to_builtin)
+if cbor2 is not None:
+    WIRE_ENCODERS["cbor"] = lambda message: cbor2.dumps(message, default=lambda encoder, value: encoder.encode(to_builtin(value)))
+WIRE_FORMATS = ("json",) + tuple(WIRE_ENCODERS.keys())
+
+
+class FrameCompressor:
+    """
+    广播帧共享压缩
+    每条消息只压缩一次（zlib/deflate），压缩结果由所有开启压缩的客户端共享
+    """
+
+    def __init__(self):
+        # 小于阈值（字节）的消息不压缩
+        self.threshold = max(0, int(os.environ.get("WS_COMPRESS_THRESHOLD", "1024")))
+        # 压缩级别 1-9，越高压缩率越好、CPU 开销越大
+        self.level = min(9, max(1, int(os.environ.get("WS_COMPRESS_LEVEL", "6"))))
+        self.frames = 0
+        self.skipped = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def compress(self, raw: bytes) -> Optional[bytes]:
+        """压缩一帧数据；低于阈值时返回 None"""
+        if len(raw) < self.threshold:
+            self.skipped += 1
+            return None
+        started = time.process_time()
+        compressed = zlib.compress(raw, self.level)
+        self.cpu_seconds += time.process_time() - started
+        self.frames += 1
+        self.raw_bytes += len(raw)
+        self.compressed_bytes += len(compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "level": self.level,
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": self.compressed_bytes,
+            "ratio": round(self.compressed_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+            "cpu_ms_total": round(self.cpu_seconds * 1000, 2),
+            "cpu_ms_per_frame": round(self.cpu_seconds * 1000 / self.frames, 4) if self.frames else None,
+        }
+
+
+frame_compressor = FrameCompressor()
+
+
+def negotiate_format(requested: Optional[str]) -> str:
+    """根据客户端请求的格式选择可用的线路编码，不支持时回退为 JSON"""
+    fmt = (requested or "json").strip().lower()
+    if fmt in WIRE_FORMATS:
+        return fmt
+    if fmt != "json":
+        logger.warning("不支持的消息格式: %s，回退为 json", fmt)
+    return "json"
+
+
+# 可订阅的频道
+ALL_CHANNELS = frozenset({"scores", "events", "bingo", "vote", "runaway", "status"})
+
+# 消息类型 -> 所属频道；未列出的类型（连接、心跳等）对所有客户端发送
+MESSAGE_CHANNELS: Dict[str, frozenset] = {
+    "game_event": frozenset({"events", "scores"}),
+    "game_events": frozenset({"events", "scores"}),
+    "game_score_update": frozenset({"scores"}),
+    "game_round_change": frozenset({"scores", "status"}),
+    "global_score_update": frozenset({"scores"}),
+    "global_event": frozenset({"status"}),
+    "vote_event": frozenset({"vote"}),
+    "tournament_reset": frozenset({"status", "scores"}),
+}
+
+
+def parse_channels(raw: Union[str, List[str], None]) -> frozenset:
+    """
+    解析客户端提交的频道列表（逗号分隔字符串或数组），忽略未知频道
+
+    返回:
+        frozenset: 订阅的频道集合；为空或为 all 时订阅全部频道
+    """
+    if raw is None:
+        return ALL_CHANNELS
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    channels = {str(c).strip().lower() for c in raw if str(c).strip()}
+    if not channels or "all" in channels:
+        return ALL_CHANNELS
+    return frozenset(channels & ALL_CHANNELS)
+
+
+class PreparedMessage:
+    """
+    预编码消息
+    同一条消息只编码一次，可在多次发送、多个连接之间复用编码结果
+    """
+
+    __slots__ = ("message", "_text", "_encoded", "channels")
+
+    # 多进程分发时是否原样发布给工作进程（状态消息另行按分段同步）
+    replicated = True
+
+    def __init__(self, message: dict, text: Optional[str] = None, channels: Optional[frozenset] = None):
+        self.message = message
+        self._text = text
+        # 编码缓存：格式（或 格式+deflate）-> 编码结果
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+        # 所属频道；None 表示发送给所有客户端
+        self.channels = channels if channels is not None else MESSAGE_CHANNELS.get(message.get("type"))
+
+    @property
+    def type(self) -> str:
+        return self.message.get("type", "unknown")
+
+    def stamp(self, seq: int):
+        """为广播消息加上序号（序号位于消息首个字段，已编码的文本直接拼接）"""
+        self.message["seq"] = seq
+        if self._text is not None:
+            self._text = f'{{"seq":{seq},' + self._text[1:]
+        self._encoded.clear()
+
+    def for_channels(self, subscribed: frozenset) -> Optional["PreparedMessage"]:
+        """
+        返回针对某个订阅集合的消息版本
+
+        返回:
+            Optional[PreparedMessage]: 订阅方不关心该消息时返回 None
+        """
+        if self.channels is None or self.channels & subscribed:
+            return self
+        return None
+
+    def text(self) -> str:
+        """返回 JSON 文本（首次调用时编码并缓存）"""
+        if self._text is None:
+            self._text = dumps(self.message)
+        return self._text
+
+    def encode(self, fmt: str = "json") -> Union[str, bytes]:
+        """按线路格式返回编码结果，每种格式只编码一次"""
+        if fmt == "json":
+            return self.text()
+        encoded = self._encoded.get(fmt)
+        if encoded is None:
+            encoded = self._encoded[fmt] = WIRE_ENCODERS[fmt](self.message)
+        return encoded
+
+    def frame(self, fmt: str = "json", compress: bool = False) -> Union[str, bytes]:
+        """
+        返回实际发送的帧内容；开启压缩且超过阈值时返回共享的 zlib 压缩结果
+
+        返回:
+            Union[str, bytes]: str 以文本帧发送，bytes 以二进制帧发送
+        """
+        encoded = self.encode(fmt)
+        if not compress:
+            return encoded
+        key = fmt + "+deflate"
+        framed = self._encoded.get(key)
+        if framed is None:
+            raw = encoded.encode("utf-8") if isinstance(encoded, str) else encoded
+            framed = self._encoded[key] = frame_compressor.compress(raw) or encoded
+        return framed
+
+
+def prepare_message(message: Union[dict, PreparedMessage]) -> PreparedMessage:
+    """将普通 dict 包装为预编码消息，已是预编码消息的直接返回"""
+    if isinstance(message, PreparedMessage):
+        return message
+    return PreparedMessage(message)
+
+
+# 发送队列溢出策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"          # 丢弃最早的排队消息
+OVERFLOW_LATEST_SNAPSHOT = "latest_snapshot"  # 清空队列，只保留一份最新完整快照
+OVERFLOW_DISCONNECT = "disconnect"            # 直接断开慢速客户端
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_LATEST_SNAPSHOT, OVERFLOW_DISCONNECT)
+
+# 队列中的占位项：写任务发送时再取最新的完整快照
+_RESYNC = object()
+
+
+class ClientSendQueue:
+    """
+    单个客户端的有界发送队列
+    由该连接专属的写任务消费，广播方只负责入队，不等待发送完成
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items: deque = deque()
+        self._ready = asyncio.Event()
+        # 滞后统计
+        self.sent = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.max_depth = 0
+        self.last_send_ms = 0.0
+        self.max_send_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def is_full(self) -> bool:
+        return len(self.items) >= self.maxsize
+
+    def put(self, item):
+        self.items.append(item)
+        if len(self.items) > self.max_depth:
+            self.max_depth = len(self.items)
+        self._ready.set()
+
+    def clear(self) -> int:
+        count = len(self.items)
+        self.items.clear()
+        return count
+
+    async def get(self):
+        while not self.items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self.items.popleft()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self.items),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+            "last_send_ms": round(self.last_send_ms, 2),
+            "max_send_ms": round(self.max_send_ms, 2),
+        }
+
 
 class ConnectionManager:
     def __init__(self):
@@ -16,8 +280,44 @@ class ConnectionManager:
         self.active_connections: Set[WebSocket] = set()
         # 存储连接的客户端信息
         self.client_info: Dict[WebSocket, dict] = {}
+        # 每个连接的发送队列与写任务
+        self.send_queues: Dict[WebSocket, ClientSendQueue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        # 发送队列容量与溢出策略，可通过环境变量调整
+        self.queue_size = max(1, int(os.environ.get("WS_SEND_QUEUE_SIZE", "64")))
+        policy = os.environ.get("WS_OVERFLOW_POLICY", OVERFLOW_LATEST_SNAPSHOT)
+        if policy not in OVERFLOW_POLICIES:
+            logger.warning("未知的发送队列溢出策略: %s，使用 %s", policy, OVERFLOW_LATEST_SNAPSHOT)
+            policy = OVERFLOW_LATEST_SNAPSHOT
+        self.overflow_policy = policy
+        # 完整快照提供方（由数据管理器注册），用于 latest_snapshot 策略
+        self.snapshot_provider: Optional[Callable[[], Union[dict, PreparedMessage]]] = None
+        # 因发送过慢被断开的连接数
+        self.evicted_count = 0
+        # 多进程分发的发布端（仅主进程设置）
+        self.fanout = None
+        # 广播序号与最近消息的环形缓冲区，用于断线重连后补发
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.replay_buffer: deque = deque(maxlen=max(1, int(os.environ.get("WS_REPLAY_BUFFER", "1000"))))
+        self.resumed_count = 0
+        self.resume_misses = 0
+        # 每个连接订阅的频道
+        self.subscriptions: Dict[WebSocket, frozenset] = {}
+        # 每个连接协商的线路格式
+        self.formats: Dict[WebSocket, str] = {}
+        # 开启共享压缩帧的连接
+        self.compressed: Set[WebSocket] = set()
+        # 心跳：服务端定期向静默的连接发送 ping，超过空闲超时仍无任何入站消息则断开
+        self.ping_interval = max(0.0, float(os.environ.get("WS_PING_INTERVAL", "20")))
+        self.idle_timeout = max(self.ping_interval, float(os.environ.get("WS_IDLE_TIMEOUT", "60")))
+        # 每个连接最近一次收到入站消息的时间（time.monotonic）
+        self.last_seen: Dict[WebSocket, float] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.pings_sent = 0
+        self.reaped_count = 0
     
-    async def connect(self, websocket: WebSocket, client_id: str = None):
+    async def connect(self, websocket: WebSocket, client_id: str = None, channels: Optional[frozenset] = None):
         """接受新的WebSocket连接"""
         await websocket.accept()
         self.active_connections.add(websocket)
@@ -28,7 +328,20 @@ class ConnectionManager:
             # 可选：观赛ID（由客户端提交后填充）
             "viewer_id": None,
         }
-        print(f"客户端连接: {self.client_info[websocket]['client_id']}, 当前连接数: {len(self.active_connections)}")
+        self.set_subscription(websocket, channels if channels is not None else ALL_CHANNELS)
+        # 客户端通过 ?format= 选择编码格式（json/msgpack/cbor）
+        self.formats[websocket] = negotiate_format(websocket.query_params.get("format"))
+        self.client_info[websocket]["format"] = self.formats[websocket]
+        # 客户端通过 ?compress=deflate 开启共享压缩帧
+        if (websocket.query_params.get("compress") or "").lower() in ("deflate", "zlib", "1", "true"):
+            self.compressed.add(websocket)
+        self.client_info[websocket]["compress"] = websocket in self.compressed
+        self.send_queues[websocket] = ClientSendQueue(self.queue_size)
+        self._writers[websocket] = asyncio.create_task(self._writer_loop(websocket))
+        self.last_seen[websocket] = time.monotonic()
+        if self.ping_interval > 0 and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info("客户端连接: %s, 当前连接数: %s", self.client_info[websocket]['client_id'], len(self.active_connections))
     
     def disconnect(self, websocket: WebSocket):
         """断开WebSocket连接"""
@@ -37,48 +350,240 @@ class ConnectionManager:
             self.active_connections.remove(websocket)
             if websocket in self.client_info:
                 del self.client_info[websocket]
-            print(f"客户端断开: {client_id}, 当前连接数: {len(self.active_connections)}")
+            self.send_queues.pop(websocket, None)
+            self.subscriptions.pop(websocket, None)
+            self.formats.pop(websocket, None)
+            self.compressed.discard(websocket)
+            self.last_seen.pop(websocket, None)
+            writer = self._writers.pop(websocket, None)
+            if writer is not None and writer is not asyncio.current_task():
+                writer.cancel()
+            logger.info("客户端断开: %s, 当前连接数: %s", client_id, len(self.active_connections))
     
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """发送消息给特定客户端"""
+    def touch(self, websocket: WebSocket, ping: bool = False):
+        """记录收到了该连接的入站消息；ping 为 True 时同时更新 last_ping"""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+            if ping:
+                self.client_info[websocket]["last_ping"] = datetime.now().isoformat()
+
+    async def _heartbeat_loop(self):
+        """定期向静默的连接发送 ping，并断开超过空闲超时的连接；没有连接时退出"""
         try:
-            await websocket.send_text(json.dumps(message, ensure_ascii=False))
-        except Exception as e:
-            print(f"发送个人消息失败: {e}")
-            self.disconnect(websocket)
+            while self.active_connections:
+                await asyncio.sleep(self.ping_interval)
+                now = time.monotonic()
+                ping = prepare_message({"type": "ping", "timestamp": datetime.now().isoformat()})
+                for websocket, seen in list(self.last_seen.items()):
+                    idle = now - seen
+                    if idle >= self.idle_timeout:
+                        self._reap(websocket, idle)
+                    elif idle >= self.ping_interval:
+                        self._enqueue(websocket, ping)
+                        self.pings_sent += 1
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._heartbeat_task is asyncio.current_task():
+                self._heartbeat_task = None
+
+    def _reap(self, websocket: WebSocket, idle: float):
+        """断开长时间没有任何入站消息的连接（通常是半开的死连接）"""
+        client_id = self.client_info.get(websocket, {}).get("client_id", "unknown")
+        logger.warning("客户端空闲超时，断开连接: %s (空闲 %.0f 秒)", client_id, idle)
+        self.reaped_count += 1
+        self.disconnect(websocket)
+        # 半开连接上的关闭握手可能一直挂起，限时等待
+        asyncio.create_task(self._close_quietly(websocket, 1001, "空闲超时", timeout=5))
+
+    def set_subscription(self, websocket: WebSocket, channels: frozenset):
+        """设置连接订阅的频道"""
+        self.subscriptions[websocket] = channels
+        if websocket in self.client_info:
+            self.client_info[websocket]["channels"] = sorted(channels)
     
-    async def broadcast(self, message: dict):
+    async def send_personal_message(self, message: Union[dict, PreparedMessage], websocket: WebSocket):
+        """发送消息给特定客户端（进入该客户端的发送队列，保证与广播消息的顺序一致）"""
+        variant = prepare_message(message).for_channels(self.subscriptions.get(websocket, ALL_CHANNELS))
+        if variant is not None:
+            self._enqueue(websocket, variant)
+    
+    async def broadcast(self, message: Union[dict, PreparedMessage]):
         """广播消息给所有连接的客户端"""
+        prepared = prepare_message(message)
+        if self.fanout is not None and prepared.replicated:
+            self.fanout.publish(prepared)
+        self.seq += 1
+        prepared.stamp(self.seq)
+        self.replay_buffer.append((self.seq, prepared))
         if not self.active_connections:
-            print("没有活跃连接，跳过广播")
+            broadcast_logger.debug("没有活跃连接，跳过广播")
             return
         
-        message_str = json.dumps(message, ensure_ascii=False)
-        print(f"广播消息给 {len(self.active_connections)} 个客户端: {message.get('type', 'unknown')}")
-        
-        # 使用副本避免在循环中修改集合
-        connections_copy = self.active_connections.copy()
+        broadcast_logger.debug("广播消息给 %s 个客户端: %s", len(self.active_connections), prepared.type)
         
-        # 并发发送消息给所有客户端
-        tasks = []
-        for connection in connections_copy:
-            tasks.append(self._send_safe(connection, message_str))
-        
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        # 按订阅集合分组：每组只裁剪、编码一次，组内所有连接共享同一份结果
+        variants: Dict[frozenset, Optional[PreparedMessage]] = {}
+        # 只入队，不等待发送完成：广播耗时与最慢的客户端无关
+        for connection in list(self.active_connections):
+            subscribed = self.subscriptions.get(connection, ALL_CHANNELS)
+            if subscribed not in variants:
+                variants[subscribed] = prepared.for_channels(subscribed)
+            variant = variants[subscribed]
+            if variant is not None:
+                self._enqueue(connection, variant)
+    
+    def can_resume(self, last_seq: Optional[int], stream_id: Optional[str]) -> bool:
+        """
+        判断断线重连的客户端能否从 last_seq 之后续传
+
+        返回:
+            bool: 错过的消息仍在环形缓冲区内时为 True；否则（缺口过大或来自其他服务进程）应发送完整快照
+        """
+        if last_seq is None:
+            return False
+        oldest = self.replay_buffer[0][0] if self.replay_buffer else self.seq + 1
+        if stream_id != self.stream_id or last_seq > self.seq or last_seq < oldest - 1:
+            self.resume_misses += 1
+            return False
+        return True
+
+    def replay(self, websocket: WebSocket, last_seq: int):
+        """按顺序补发 last_seq 之后的广播消息（按该连接的订阅裁剪）"""
+        subscribed = self.subscriptions.get(websocket, ALL_CHANNELS)
+        for seq, prepared in self.replay_buffer:
+            if seq <= last_seq:
+                continue
+            variant = prepared.for_channels(subscribed)
+            if variant is not None:
+                self._enqueue(websocket, variant)
+        self.resumed_count += 1
+    
+    def _enqueue(self, websocket: WebSocket, item):
+        """将消息放入客户端发送队列，队列已满时按溢出策略处理"""
+        queue = self.send_queues.get(websocket)
+        if queue is None:
+            return
+        if queue.is_full():
+            queue.overflows += 1
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                self._evict(websocket, queue)
+                return
+            if self.overflow_policy == OVERFLOW_LATEST_SNAPSHOT and self.snapshot_provider is not None:
+                # 丢弃所有积压，改为发送一份最新快照；之后的消息继续正常排队
+                queue.dropped += queue.clear() + 1
+                queue.put(_RESYNC)
+                return
+            while queue.is_full():
+                queue.items.popleft()
+                queue.dropped += 1
+        queue.put(item)
+    
+    def _evict(self, websocket: WebSocket, queue: ClientSendQueue):
+        """断开积压过多的慢速客户端"""
+        client_id = self.client_info.get(websocket, {}).get("client_id", "unknown")
+        logger.warning("客户端发送队列溢出，断开连接: %s (积压 %s 条)", client_id, len(queue))
+        self.evicted_count += 1
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket, 1013, "发送队列溢出"))
+    
+    async def _close_quietly(self, websocket: WebSocket, code: int, reason: str, timeout: Optional[float] = None):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), timeout)
+        except Exception:
+            pass
     
-    async def _send_safe(self, websocket: WebSocket, message: str):
-        """安全发送消息，处理连接异常"""
+    async def _writer_loop(self, websocket: WebSocket):
+        """连接专属写任务：依次发送队列中的消息"""
+        queue = self.send_queues.get(websocket)
+        if queue is None:
+            return
+        fmt = self.formats.get(websocket, "json")
+        compress = websocket in self.compressed
         try:
-            await websocket.send_text(message)
+            while True:
+                item = await queue.get()
+                if item is _RESYNC:
+                    item = prepare_message(self.snapshot_provider()).for_channels(
+                        self.subscriptions.get(websocket, ALL_CHANNELS))
+                started = time.perf_counter()
+                frame = item.frame(fmt, compress)
+                if isinstance(frame, bytes):
+                    await websocket.send_bytes(frame)
+                else:
+                    await websocket.send_text(frame)
+                queue.last_send_ms = (time.perf_counter() - started) * 1000
+                if queue.last_send_ms > queue.max_send_ms:
+                    queue.max_send_ms = queue.last_send_ms
+                queue.sent += 1
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            print(f"发送消息失败，移除连接: {e}")
+            logger.warning("发送消息失败，移除连接: %s", e)
             self.disconnect(websocket)
     
     def get_connection_count(self) -> int:
         """获取当前连接数"""
         return len(self.active_connections)
     
+    def has_audience(self) -> bool:
+        """是否有需要接收广播的对象（本地连接或多进程分发的工作进程）"""
+        return bool(self.active_connections) or (self.fanout is not None and self.fanout.has_subscribers())
+    
+    def get_replay_stats(self) -> dict:
+        """续传缓冲区状态"""
+        return {
+            "stream_id": self.stream_id,
+            "seq": self.seq,
+            "buffered": len(self.replay_buffer),
+            "capacity": self.replay_buffer.maxlen,
+            "oldest_seq": self.replay_buffer[0][0] if self.replay_buffer else None,
+            "resumed": self.resumed_count,
+            "resume_misses": self.resume_misses,
+        }
+    
+    def get_heartbeat_stats(self) -> dict:
+        """
+        按最近入站消息时间统计连接活跃度:
+        live 在一个心跳间隔内有消息；idle 已发送 ping 等待回应；stale 已超过空闲超时，将在下次检查时断开
+        """
+        now = time.monotonic()
+        live = idle = stale = 0
+        for seen in self.last_seen.values():
+            age = now - seen
+            if age >= self.idle_timeout:
+                stale += 1
+            elif self.ping_interval > 0 and age >= self.ping_interval:
+                idle += 1
+            else:
+                live += 1
+        return {
+            "ping_interval": self.ping_interval,
+            "idle_timeout": self.idle_timeout,
+            "live": live,
+            "idle": idle,
+            "stale": stale,
+            "pings_sent": self.pings_sent,
+            "reaped": self.reaped_count,
+        }
+    
+    def max_queue_depth(self) -> int:
+        """所有连接中最深的发送队列长度"""
+        return max((len(q) for q in self.send_queues.values()), default=0)
+    
+    def get_queue_stats(self) -> dict:
+        """汇总所有连接的发送队列状态"""
+        depths = [len(q) for q in self.send_queues.values()]
+        return {
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "total_queued": sum(depths),
+            "max_queue_depth": max(depths) if depths else 0,
+            "lagging_clients": sum(1 for d in depths if d > 1),
+            "dropped": sum(q.dropped for q in self.send_queues.values()),
+            "evicted": self.evicted_count,
+        }
+    
     def get_client_list(self) -> List[dict]:
         """获取所有客户端信息"""
         return [
@@ -86,12 +591,18 @@ class ConnectionManager:
                 "client_id": info["client_id"],
                 "connected_at": info["connected_at"],
                 "last_ping": info["last_ping"],
+                "idle_seconds": round(time.monotonic() - self.last_seen[ws], 1) if ws in self.last_seen else None,
                 # 将 viewer_id 暴露给统计接口
-                "viewer_id": info.get("viewer_id")
+                "viewer_id": info.get("viewer_id"),
+                "channels": info.get("channels"),
+                "format": info.get("format", "json"),
+                "compress": info.get("compress", False),
+                # 发送队列滞后统计
+                **(self.send_queues[ws].stats() if ws in self.send_queues else {})
             }
-            for info in self.client_info.values()
+            for ws, info in self.client_info.items()
         ]
 
 
 # 全局连接管理器实例
-connection_manager = ConnectionManager()
\ No newline at end of file
+connection_manager = ConnectionManager()
@@ -16,6 +16,8 @@ class GameEvent(BaseModel):
     team: str = Field(..., description="玩家所在的队伍ID")
     event: str = Field(..., description="事件类型")
     lore: str = Field(..., description="事件的附加信息或元数据")
+    event_id: Optional[str] = Field(None, description="事件唯一ID（可选），插件重试时携带相同ID即可避免重复计分")
+    sent_at: Optional[int] = Field(None, description="插件产生事件时的时间戳毫秒（可选），重试时保持不变；按内容哈希去重时计入内容")
 
 
 class ScoreUpdate(BaseModel):
@@ -48,6 +50,15 @@ class TeamScore(BaseModel):
     color: Optional[str] = Field(None, description="队伍颜色（十六进制）")
 
 
+class TeamRoster(BaseModel):
+    """
+    队伍名单数据模型
+    用于/api/roster端点，预先登记各队伍的玩家
+    """
+    team: str = Field(..., description="队伍ID（也可以是中文队名）")
+    players: List[str] = Field(..., description="队伍中所有玩家的ID")
+
+
 class GameInfo(BaseModel):
     """
     游戏信息数据模型
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+WebSocket 分发压测工具
+在当前进程内启动应用，建立大量模拟 /ws 客户端，按设定速率推送游戏事件，
+统计分发延迟分位数、每连接内存、每次广播的 CPU 开销以及丢消息/慢速客户端，结果以 JSON 输出便于不同版本对比。
+
+用法:
+    python bench_fanout.py --clients 2000 --rate 20 --duration 10
+    python bench_fanout.py --clients 500 --transport tcp --format msgpack --compress
+    python bench_fanout.py --clients 1000 --slow-fraction 0.05 --slow-delay-ms 200 --output result.json
+
+两种客户端传输方式:
+    asgi（默认）：客户端直接以 ASGI 消息与应用交互，不经过网络，测得的是应用本身的分发开销
+    tcp：在进程内启动 uvicorn，客户端通过真实的 WebSocket 连接接入（客户端开销也计入本进程 CPU）
+
+服务端参数（发送队列、溢出策略、事件合并窗口、压缩阈值等）沿用 README 中的环境变量。
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+# 压测时默认只输出警告日志，避免刷屏影响结果
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+from main import app
+from app.core.websocket import connection_manager
+from app.core.game_config import game_config
+from app.core.event_batcher import game_event_batcher
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+try:
+    import cbor2
+except Exception:
+    cbor2 = None
+
+
+BENCH_GAME = "battle_box"
+LORE_PREFIX = "bench-"
+PONG = json.dumps({"type": "pong"})
+
+
+def log(message: str):
+    """进度信息输出到 stderr，stdout 只保留 JSON 结果"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def rss_bytes() -> int:
+    """当前进程常驻内存（字节）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        # 非 Linux 平台退回到峰值常驻内存
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p99": None, "p999": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "p999": pick(0.999),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def decode_frame(payload: Any, fmt: str) -> Optional[dict]:
+    """按客户端协商的格式解码一帧（含共享压缩帧）"""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    if payload[:1] == b"\x78":
+        payload = zlib.decompress(payload)
+        if fmt == "json":
+            return json.loads(payload)
+    if fmt == "msgpack" and msgpack is not None:
+        return msgpack.unpackb(payload, raw=False)
+    if fmt == "cbor" and cbor2 is not None:
+        return cbor2.loads(payload)
+    return json.loads(payload)
+
+
+class BenchClient:
+    """单个模拟客户端：记录收到每一帧的时间与内容"""
+
+    def __init__(self, index: int, slow_delay: float):
+        self.index = index
+        self.slow_delay = slow_delay
+        # (接收时间, 原始帧)；ASGI 方式下同一条广播的帧对象由所有客户端共享，不额外占用内存
+        self.frames: List[tuple] = []
+        self.connected = asyncio.Event()
+        self.closed = False
+        self.close_code: Optional[int] = None
+
+    def record(self, payload: Any) -> bool:
+        """记录一帧，返回是否为服务端心跳（需要回复 pong）"""
+        self.frames.append((time.perf_counter(), payload))
+        if not self.connected.is_set():
+            self.connected.set()
+        if isinstance(payload, str):
+            return payload.startswith('{"type":"ping"')
+        return False
+
+
+class AsgiClient(BenchClient):
+    """通过 ASGI 消息直接与应用交互的客户端"""
+
+    def __init__(self, index: int, slow_delay: float, query: str):
+        super().__init__(index, slow_delay)
+        self.query = query
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.inbox.put_nowait({"type": "websocket.connect"})
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "http_version": "1.1",
+            "path": "/ws",
+            "raw_path": b"/ws",
+            "root_path": "",
+            "query_string": self.query.encode(),
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 10000 + self.index),
+            "server": ("bench", 80),
+            "subprotocols": [],
+            "state": {},
+        }
+        self.task = asyncio.create_task(app(scope, self.inbox.get, self.send))
+
+    async def send(self, message: dict):
+        kind = message["type"]
+        if kind == "websocket.send":
+            payload = message.get("text")
+            if payload is None:
+                payload = message.get("bytes")
+            if self.record(payload):
+                self.inbox.put_nowait({"type": "websocket.receive", "text": PONG})
+            if self.slow_delay:
+                await asyncio.sleep(self.slow_delay)
+        elif kind == "websocket.close":
+            self.closed = True
+            self.close_code = message.get("code")
+            self.connected.set()
+
+    async def stop(self):
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.task, timeout=5)
+            except Exception:
+                self.task.cancel()
+
+
+class TcpClient(BenchClient):
+    """通过真实 WebSocket 连接接入的客户端"""
+
+    def __init__(self, index: int, slow_delay: float, url: str):
+        super().__init__(index, slow_delay)
+        self.url = url
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        import websockets
+        try:
+            async with websockets.connect(self.url, max_size=None, compression=None, ping_interval=None) as ws:
+                async for payload in ws:
+                    if self.record(payload):
+                        await ws.send(PONG)
+                    if self.slow_delay:
+                        await asyncio.sleep(self.slow_delay)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.close_code = getattr(getattr(e, "rcvd", None), "code", None)
+        finally:
+            self.closed = True
+            self.connected.set()
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+
+async def start_tcp_server(host: str):
+    """在当前事件循环中启动 uvicorn（随机端口），返回 (server, 任务, 端口)"""
+    import uvicorn
+    config = uvicorn.Config(app, host=host, port=0, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, port
+
+
+def raise_fd_limit(needed: int):
+    """TCP 方式下每个客户端需要两个文件描述符，尽量提高软限制"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(hard, max(soft, needed))
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+
+async def drive_ingest(http: httpx.AsyncClient, rate: float, duration: float, sent_at: Dict[str, float]):
+    """按固定速率推送游戏事件，返回 (推送耗时列表, 失败数)"""
+    teams = [t["id"] for t in game_config.get_teams()] or ["RED"]
+    post_ms: List[float] = []
+    errors = 0
+    pending = set()
+
+    async def post(index: int):
+        nonlocal errors
+        team = random.choice(teams)
+        lore = f"{LORE_PREFIX}{index}"
+        body = {"player": f"bench_{team}_{index % 4}", "team": team, "event": "Kill", "lore": lore}
+        started = time.perf_counter()
+        sent_at[lore] = started
+        try:
+            response = await http.post(f"/api/{BENCH_GAME}/event", json=body)
+            if response.status_code != 200:
+                errors += 1
+        except Exception:
+            errors += 1
+        post_ms.append((time.perf_counter() - started) * 1000)
+
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    index = 0
+    while True:
+        due = started + index * interval
+        if due - started >= duration:
+            break
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(post(index))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        index += 1
+    if pending:
+        await asyncio.gather(*pending)
+    return post_ms, errors
+
+
+def analyse_clients(clients: List[BenchClient], fmt: str, shared_frames: bool, sent_at: Dict[str, float],
+                    ingest_started: float, slow_ms: float):
+    """把每个客户端收到的帧与推送时间对应起来，统计延迟与丢失"""
+    decoded: Dict[Any, Optional[dict]] = {}
+    latencies: List[float] = []
+    missing_clients = 0
+    slow_clients = 0
+    resyncs = 0
+    expected = len(sent_at)
+    for client in clients:
+        seen = set()
+        client_latencies: List[float] = []
+        for received_at, payload in client.frames:
+            # ASGI 方式下帧对象共享，按对象去重解码；TCP 方式下按内容去重
+            key = id(payload) if shared_frames else payload
+            if key not in decoded:
+                try:
+                    decoded[key] = decode_frame(payload, fmt)
+                except Exception:
+                    decoded[key] = None
+            message = decoded[key]
+            if not message:
+                continue
+            kind = message.get("type")
+            if kind == "game_event":
+                events = [message.get("data") or {}]
+            elif kind == "game_events":
+                events = message.get("events") or []
+            else:
+                if kind == "full_data_update" and received_at > ingest_started:
+                    resyncs += 1
+                continue
+            for event in events:
+                lore = event.get("lore")
+                if lore in sent_at and lore not in seen:
+                    seen.add(lore)
+                    client_latencies.append((received_at - sent_at[lore]) * 1000)
+        latencies.extend(client_latencies)
+        if len(seen) < expected:
+            missing_clients += 1
+        if client_latencies and percentiles(client_latencies)["p99"] > slow_ms:
+            slow_clients += 1
+    return latencies, missing_clients, slow_clients, resyncs
+
+
+async def run(args) -> Dict[str, Any]:
+    query = "client_id=bench_{index}"
+    if args.format != "json":
+        query += f"&format={args.format}"
+    if args.compress:
+        query += "&compress=deflate"
+
+    server = server_task = None
+    if args.transport == "tcp":
+        raise_fd_limit(args.clients * 2 + 256)
+        server, server_task, port = await start_tcp_server(args.host)
+        base_url = f"http://{args.host}:{port}"
+        ws_url = f"ws://{args.host}:{port}/ws?"
+        http = httpx.AsyncClient(base_url=base_url, timeout=30)
+    else:
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    slow_count = int(args.clients * args.slow_fraction)
+    gc.collect()
+    rss_before = rss_bytes()
+    connect_started = time.perf_counter()
+    clients: List[BenchClient] = []
+    for index in range(args.clients):
+        slow_delay = args.slow_delay_ms / 1000 if index < slow_count else 0.0
+        if args.transport == "tcp":
+            client = TcpClient(index, slow_delay, ws_url + query.format(index=index))
+        else:
+            client = AsgiClient(index, slow_delay, query.format(index=index))
+        client.start()
+        clients.append(client)
+        if index % 200 == 199:
+            await asyncio.sleep(0)
+    await asyncio.wait_for(asyncio.gather(*(c.connected.wait() for c in clients)), timeout=args.connect_timeout)
+    connect_seconds = time.perf_counter() - connect_started
+    # 等待初始快照发送完毕后再测内存
+    await asyncio.sleep(args.settle)
+    gc.collect()
+    rss_after = rss_bytes()
+    connected = connection_manager.get_connection_count()
+    log(f"已建立 {connected}/{args.clients} 个连接，用时 {connect_seconds:.2f} 秒")
+
+    seq_before = connection_manager.seq
+    sent_before = sum(q.sent for q in connection_manager.send_queues.values())
+    sent_at: Dict[str, float] = {}
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    post_ms, errors = await drive_ingest(http, args.rate, args.duration, sent_at)
+    await game_event_batcher.flush()
+    # 等待发送队列排空（或超时）
+    drain_deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < drain_deadline and any(len(q) for q in connection_manager.send_queues.values()):
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(args.settle)
+    cpu_used = time.process_time() - cpu_before
+    wall_used = time.perf_counter() - wall_before
+    broadcasts = connection_manager.seq - seq_before
+    frames_sent = sum(q.sent for q in connection_manager.send_queues.values()) - sent_before
+    queue_stats = connection_manager.get_queue_stats()
+    heartbeat_stats = connection_manager.get_heartbeat_stats()
+    log(f"已推送 {len(sent_at)} 个事件，广播 {broadcasts} 次，正在统计结果")
+
+    for client in clients:
+        await client.stop()
+    await http.aclose()
+    if server is not None:
+        server.should_exit = True
+        await server_task
+
+    latencies, missing_clients, slow_clients, resyncs = analyse_clients(
+        clients, args.format, args.transport == "asgi", sent_at, wall_before, args.slow_ms)
+    expected_deliveries = len(sent_at) * len(clients)
+
+    return {
+        "config": {
+            "transport": args.transport,
+            "clients": args.clients,
+            "rate": args.rate,
+            "duration": args.duration,
+            "format": args.format,
+            "compress": args.compress,
+            "slow_clients": slow_count,
+            "slow_delay_ms": args.slow_delay_ms,
+            "send_queue_size": connection_manager.queue_size,
+            "overflow_policy": connection_manager.overflow_policy,
+            "event_batch_ms": game_event_batcher.window_ms,
+            "python": sys.version.split()[0],
+        },
+        "connect": {
+            "connected": connected,
+            "seconds": round(connect_seconds, 3),
+            "rss_before_mb": round(rss_before / 1048576, 2),
+            "rss_after_mb": round(rss_after / 1048576, 2),
+            "memory_per_connection_kb": round((rss_after - rss_before) / 1024 / max(1, connected), 2),
+        },
+        "ingest": {
+            "events_sent": len(sent_at),
+            "errors": errors,
+            "achieved_rate": round(len(sent_at) / wall_used, 2) if wall_used else None,
+            "post_latency_ms": percentiles(post_ms),
+        },
+        "fanout": {
+            "broadcasts": broadcasts,
+            "frames_sent": frames_sent,
+            "expected_deliveries": expected_deliveries,
+            "deliveries": len(latencies),
+            "delivery_ratio": round(len(latencies) / expected_deliveries, 4) if expected_deliveries else None,
+            "latency_ms": percentiles(latencies),
+        },
+        "cpu": {
+            "process_cpu_s": round(cpu_used, 3),
+            "wall_s": round(wall_used, 3),
+            "utilization": round(cpu_used / wall_used, 3) if wall_used else None,
+            "cpu_ms_per_broadcast": round(cpu_used * 1000 / broadcasts, 3) if broadcasts else None,
+            "cpu_us_per_frame": round(cpu_used * 1e6 / frames_sent, 3) if frames_sent else None,
+        },
+        "clients": {
+            "missing_events": missing_clients,
+            "slow": slow_clients,
+            "slow_threshold_ms": args.slow_ms,
+            "resync_snapshots": resyncs,
+            "closed_by_server": sum(1 for c in clients if c.closed and c.close_code not in (None, 1000)),
+        },
+        "server": {
+            "send_queues": queue_stats,
+            "heartbeat": heartbeat_stats,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CC Live WebSocket 分发压测")
+    parser.add_argument("--clients", type=int, default=1000, help="模拟客户端数")
+    parser.add_argument("--rate", type=float, default=20, help="每秒推送的游戏事件数")
+    parser.add_argument("--duration", type=float, default=10, help="推送持续时间（秒）")
+    parser.add_argument("--transport", choices=("asgi", "tcp"), default="asgi", help="客户端接入方式")
+    parser.add_argument("--host", default="127.0.0.1", help="tcp 方式下的监听地址")
+    parser.add_argument("--format", choices=("json", "msgpack", "cbor"), default="json", help="客户端协商的消息编码")
+    parser.add_argument("--compress", action="store_true", help="客户端开启共享压缩帧")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="慢速客户端比例（0-1）")
+    parser.add_argument("--slow-delay-ms", type=float, default=100, help="慢速客户端每收一帧的处理耗时（毫秒）")
+    parser.add_argument("--slow-ms", type=float, default=500, help="p99 延迟超过该值的客户端计为慢速客户端")
+    parser.add_argument("--connect-timeout", type=float, default=60, help="等待全部连接建立的超时（秒）")
+    parser.add_argument("--drain-timeout", type=float, default=10, help="推送结束后等待发送队列排空的超时（秒）")
+    parser.add_argument("--settle", type=float, default=0.5, help="各阶段之间的等待时间（秒）")
+    parser.add_argument("--output", help="结果 JSON 写入的文件（默认输出到 stdout）")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        log(f"结果已写入 {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
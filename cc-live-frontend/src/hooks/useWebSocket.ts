@@ -23,6 +23,11 @@ export function useWebSocket() {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const pingIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  // 已应用的服务端状态版本（用于校验增量更新是否连续）
+  const stateVersionRef = useRef<number | null>(null);
+  // 最近收到的广播序号与服务端消息流 ID（断线重连时用于续传）
+  const lastSeqRef = useRef<number | null>(null);
+  const streamIdRef = useRef<string | null>(null);
   const [reconnectAttempts, setReconnectAttempts] = useState(0);
   const maxReconnectAttempts = 5;
   const [wsError, setWsError] = useState<string | null>(null);
@@ -43,7 +48,13 @@ export function useWebSocket() {
 
     try {
       const clientId = `viewer_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
-      wsRef.current = new WebSocket(`${effectiveUrl}?client_id=${clientId}`);
+      const resumeQuery = (lastSeqRef.current !== null && streamIdRef.current)
+        ? `&last_seq=${lastSeqRef.current}&stream=${encodeURIComponent(streamIdRef.current)}`
+        : '';
+      wsRef.current = new WebSocket(`${effectiveUrl}?client_id=${clientId}${resumeQuery}`);
+      if (!resumeQuery) {
+        stateVersionRef.current = null;
+      }
 
       wsRef.current.onopen = () => {
         console.log('WebSocket connected');
@@ -88,6 +99,10 @@ export function useWebSocket() {
       wsRef.current.onmessage = (event) => {
         try {
           const message: WSMessage = JSON.parse(event.data);
+          const seq = (message as { seq?: number }).seq;
+          if (typeof seq === 'number') {
+            lastSeqRef.current = seq;
+          }
           
           switch (message.type) {
             case 'viewer_id_ack':
@@ -110,6 +125,13 @@ export function useWebSocket() {
               } catch {}
               break;
             case 'connection':
+              // 续传失败时服务端随后会发送完整快照，这里从新的消息流重新计数
+              if (message.stream_id) {
+                streamIdRef.current = message.stream_id;
+              }
+              if (!message.resumed) {
+                lastSeqRef.current = typeof message.seq === 'number' ? message.seq : null;
+              }
               setData(prev => ({
                 ...prev,
                 connectionStatus: {
@@ -120,8 +142,11 @@ export function useWebSocket() {
               break;
 
             case 'full_data_update':
-              // 处理完整数据更新（新的定时广播机制）
+              // 处理完整数据更新（连接建立或重新同步时下发）
               // 注意：服务端的广播不包含 viewer_id。为避免覆盖，合并而非整树替换。
+              if (typeof message.version === 'number') {
+                stateVersionRef.current = message.version;
+              }
               if (message.data) {
                 setData(prev => {
                   const incoming = message.data;
@@ -161,6 +186,45 @@ export function useWebSocket() {
               }
               break;
 
+            case 'delta_update': {
+              // 增量更新：只携带变化的分段；版本不连续时请求完整快照
+              const currentVersion = stateVersionRef.current;
+              if (currentVersion === null || message.base_version > currentVersion) {
+                if (wsRef.current?.readyState === WebSocket.OPEN) {
+                  wsRef.current.send(JSON.stringify({ type: 'resync' }));
+                }
+                break;
+              }
+              // 已包含在当前状态中的旧增量（如快照之后才到达的重放消息）直接忽略，版本不回退
+              if (message.version <= currentVersion) {
+                break;
+              }
+              stateVersionRef.current = message.version;
+              const changes = message.data || {};
+              try {
+                if (changes.itemImages) {
+                  (window as unknown as { __itemImages?: Record<string, string | null> }).__itemImages = changes.itemImages;
+                }
+              } catch {}
+              setData(prev => {
+                const next = { ...prev, ...changes } as typeof prev;
+                for (const key of message.removed || []) {
+                  (next as unknown as Record<string, unknown>)[key] = null;
+                }
+                if (changes.connectionStatus) {
+                  next.connectionStatus = {
+                    ...prev.connectionStatus,
+                    ...changes.connectionStatus,
+                    viewer_id: prev.connectionStatus.viewer_id ?? changes.connectionStatus.viewer_id,
+                    connected: prev.connectionStatus.connected || changes.connectionStatus.connected,
+                    last_ping: changes.connectionStatus.last_ping || prev.connectionStatus.last_ping,
+                  };
+                }
+                return next;
+              });
+              break;
+            }
+
             case 'status_response':
               setData(prev => ({
                 ...prev,
@@ -197,6 +261,18 @@ export function useWebSocket() {
               } catch {}
               break;
 
+            case 'game_events':
+              // 短时间内连续到达的多条事件被合并为一条消息，只携带最终的分数预测
+              setData(prev => ({
+                ...prev,
+                currentGameScore: message.score_prediction,
+                recentEvents: [
+                  ...[...(message.events || [])].reverse(),
+                  ...prev.recentEvents
+                ].slice(0, 10)
+              }));
+              break;
+
             case 'game_score_update':
               setData(prev => ({
                 ...prev,
@@ -238,6 +314,20 @@ export function useWebSocket() {
               }));
               break;
 
+            case 'ping':
+              // 服务端心跳，回应 pong 以免被判定为空闲连接
+              if (wsRef.current?.readyState === WebSocket.OPEN) {
+                wsRef.current.send(JSON.stringify({ type: 'pong' }));
+              }
+              break;
+
+            case 'config_changed':
+              // 服务端配置（队伍颜色、积分规则等）已热更新，重新获取一份完整数据
+              if (wsRef.current?.readyState === WebSocket.OPEN) {
+                wsRef.current.send(JSON.stringify({ type: 'resync' }));
+              }
+              break;
+
             default:
               console.log('Unknown message type:', message);
           }
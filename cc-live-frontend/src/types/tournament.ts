@@ -75,17 +75,21 @@ export interface GameStatus {
 
 // WebSocket message types
 export type WSMessage = 
-  | { type: 'connection'; status: string; message: string; client_id: string; timestamp: string }
-  | { type: 'full_data_update'; data: TournamentData; timestamp: string } // 新增：完整数据更新
+  | { type: 'connection'; status: string; message: string; client_id: string; stream_id?: string; seq?: number; resumed?: boolean; timestamp: string }
+  | { type: 'full_data_update'; version?: number; data: TournamentData; timestamp: string } // 新增：完整数据更新
+  | { type: 'delta_update'; version: number; base_version: number; data: Partial<TournamentData>; removed: string[]; timestamp: string } // 增量数据更新
   | { type: 'pong'; timestamp: string }
+  | { type: 'ping'; timestamp: string }
   | { type: 'status_response'; connection_count: number; client_info: Record<string, unknown> }
   | { type: 'game_event'; game_id: string; data: GameEvent; score_prediction: ScorePrediction; timestamp: string }
+  | { type: 'game_events'; game_id: string; events: GameEvent[]; score_prediction: ScorePrediction; timestamp: string } // 合并广播的多条事件
   | { type: 'game_score_update'; game_id: string; data: { total_updates: number; scores: GameScore[] }; timestamp: string }
   | { type: 'game_round_change'; game_id: string; round: number; timestamp: string }
   | { type: 'global_score_update'; data: { total_teams: number; team_scores: TeamScore[] }; timestamp: string }
   | { type: 'global_event'; data: GameStatus; timestamp: string }
   | { type: 'vote_event'; data: VoteData; timestamp: string }
-  | { type: 'viewer_id_ack'; viewer_id: string; timestamp: string };
+  | { type: 'viewer_id_ack'; viewer_id: string; timestamp: string }
+  | { type: 'config_changed'; version: number; changed: string[]; reason: string; teams: { id: string; name: string; color?: string | null }[]; timestamp: string } // 锦标赛配置热更新
 
 // Bingo游戏相关类型定义
 export interface BingoTask {
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+事件日志运维工具
+查看、校验与截断接入消息日志（EVENT_LOG_DIR 下的分段文件）。修改日志前请先停止服务。
+
+用法:
+    python event_log_tool.py list
+    python event_log_tool.py show --from-seq 1200 --type event --limit 50
+    python event_log_tool.py truncate --after 1500       # 删除序号大于 1500 的记录（回滚到某一时刻）
+    python event_log_tool.py drop --before 1000          # 删除记录序号都小于 1000 的整个分段（清理旧日志）
+
+--dir 默认取环境变量 EVENT_LOG_DIR。
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.core.event_log import list_segments, scan_segment, truncate_after, drop_before
+
+
+def describe_segment(first_seq: int, path: Path) -> Dict[str, Any]:
+    records = 0
+    invalid = 0
+    last_seq = None
+    first_ts = last_ts = None
+    types: Dict[str, int] = {}
+    for _, record in scan_segment(path):
+        if record is None:
+            invalid += 1
+            continue
+        records += 1
+        last_seq = record["seq"]
+        first_ts = first_ts or record.get("ts")
+        last_ts = record.get("ts")
+        types[record.get("type")] = types.get(record.get("type"), 0) + 1
+    return {
+        "segment": path.name,
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "records": records,
+        "invalid": invalid,
+        "bytes": path.stat().st_size,
+        "first_ts": first_ts,
+        "last_ts": last_ts,
+        "types": types,
+    }
+
+
+def cmd_list(directory: Path, args) -> int:
+    segments = [describe_segment(first_seq, path) for first_seq, path in list_segments(directory)]
+    if args.json:
+        print(json.dumps(segments, ensure_ascii=False, indent=2))
+        return 0
+    if not segments:
+        print(f"{directory} 中没有事件日志分段")
+        return 0
+    print(f"{'分段':<24}{'序号范围':<26}{'记录':>8}{'损坏':>6}{'字节':>12}  时间范围")
+    for s in segments:
+        seq_range = f"{s['first_seq']}-{s['last_seq'] if s['last_seq'] is not None else '(空)'}"
+        print(f"{s['segment']:<24}{seq_range:<26}{s['records']:>8}{s['invalid']:>6}{s['bytes']:>12}"
+              f"  {s['first_ts'] or '-'} ~ {s['last_ts'] or '-'}")
+    total = sum(s["records"] for s in segments)
+    invalid = sum(s["invalid"] for s in segments)
+    print(f"共 {len(segments)} 个分段，{total} 条记录" + (f"，{invalid} 行无法解析" if invalid else ""))
+    return 1 if invalid else 0
+
+
+def cmd_show(directory: Path, args) -> int:
+    shown = 0
+    for first_seq, path in list_segments(directory):
+        for offset, record in scan_segment(path):
+            if record is None:
+                print(f"# {path.name} 偏移 {offset} 处的记录无法解析", file=sys.stderr)
+                continue
+            seq = record["seq"]
+            if seq < args.from_seq or (args.to_seq is not None and seq > args.to_seq):
+                continue
+            if args.type and record.get("type") != args.type:
+                continue
+            if args.game and record.get("game_id") != args.game:
+                continue
+            print(json.dumps(record, ensure_ascii=False))
+            shown += 1
+            if args.limit and shown >= args.limit:
+                return 0
+    return 0
+
+
+def _confirm(message: str, assume_yes: bool) -> bool:
+    if assume_yes:
+        return True
+    answer = input(f"{message}，确认请输入 yes: ")
+    return answer.strip().lower() == "yes"
+
+
+def cmd_truncate(directory: Path, args) -> int:
+    if not _confirm(f"将删除 {directory} 中序号大于 {args.after} 的所有记录", args.yes):
+        print("已取消")
+        return 1
+    result = truncate_after(directory, args.after)
+    if result["truncated"]:
+        print(f"已截断 {result['truncated']['segment']}（保留 {result['truncated']['bytes']} 字节）")
+    for name in result["removed_segments"]:
+        print(f"已删除 {name}")
+    if not result["truncated"] and not result["removed_segments"]:
+        print("没有需要删除的记录")
+    return 0
+
+
+def cmd_drop(directory: Path, args) -> int:
+    if not _confirm(f"将删除 {directory} 中记录序号都小于 {args.before} 的分段", args.yes):
+        print("已取消")
+        return 1
+    removed: List[str] = drop_before(directory, args.before)
+    for name in removed:
+        print(f"已删除 {name}")
+    if not removed:
+        print("没有可以整段删除的分段")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CC Live 事件日志运维工具")
+    parser.add_argument("--dir", default=os.environ.get("EVENT_LOG_DIR", ""), help="日志目录（默认 EVENT_LOG_DIR）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_list = sub.add_parser("list", help="列出分段及其序号范围、记录数与损坏行")
+    p_list.add_argument("--json", action="store_true", help="以 JSON 输出")
+
+    p_show = sub.add_parser("show", help="按条件输出记录（每行一条 JSON）")
+    p_show.add_argument("--from-seq", type=int, default=1, help="起始序号")
+    p_show.add_argument("--to-seq", type=int, default=None, help="结束序号（含）")
+    p_show.add_argument("--type", default=None, help="只输出该类型的消息（event、score、vote ...）")
+    p_show.add_argument("--game", default=None, help="只输出该游戏的消息")
+    p_show.add_argument("--limit", type=int, default=0, help="最多输出条数（0 表示不限）")
+
+    p_truncate = sub.add_parser("truncate", help="删除序号大于指定值的所有记录")
+    p_truncate.add_argument("--after", type=int, required=True, help="保留的最大序号")
+    p_truncate.add_argument("--yes", action="store_true", help="不再确认")
+
+    p_drop = sub.add_parser("drop", help="删除记录序号都小于指定值的整个分段")
+    p_drop.add_argument("--before", type=int, required=True, help="需要保留的最小序号")
+    p_drop.add_argument("--yes", action="store_true", help="不再确认")
+
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("未指定日志目录（--dir 或 EVENT_LOG_DIR）")
+    directory = Path(args.dir)
+    if not directory.is_dir():
+        parser.error(f"日志目录不存在: {directory}")
+
+    commands = {"list": cmd_list, "show": cmd_show, "truncate": cmd_truncate, "drop": cmd_drop}
+    sys.exit(commands[args.command](directory, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,14 @@ CC Live 游戏API主应用程序
 """
 
 from app.core.config import create_app
-from app.api import global_routes, game_routes, websocket_routes
+from app.api import global_routes, game_routes, websocket_routes, snapshot_routes, ingest_routes
+from app.api.game_routes import NDJSON_MEDIA_TYPES
 from app.core.data_manager import data_manager
+from app.core.fanout import fanout_role, start_fanout, stop_fanout, ROLE_WORKER
+from app.core.ingest_queue import ingest_queue
+from app.core.event_log import event_log
+from app.core.config_reloader import start_config_watch, stop_config_watch
+from app.core.log import setup_logging, shutdown_logging, get_logger
 import asyncio
 from starlette.requests import Request
 from starlette.responses import JSONResponse
@@ -19,20 +25,47 @@ try:
 except Exception:
     pass
 
+# 启动后台日志线程（日志级别、采样等配置可来自 .env）
+setup_logging()
+logger = get_logger("app")
+
 # 创建应用实例
 app = create_app()
 
-# 注册路由
+# 注册路由（多进程分发的工作进程只负责观众连接，不接收数据）
 app.include_router(websocket_routes.router, tags=["WebSocket"])
-app.include_router(global_routes.router, tags=["全局事件"])
-app.include_router(game_routes.router, tags=["游戏事件"])
+app.include_router(snapshot_routes.router, tags=["状态快照"])
+if fanout_role != ROLE_WORKER:
+    app.include_router(global_routes.router, tags=["全局事件"])
+    app.include_router(game_routes.router, tags=["游戏事件"])
+    app.include_router(ingest_routes.router, tags=["游戏服务器接入"])
 
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化"""
-    print("CC Live 游戏API服务启动中...")
-    print("数据管理器已初始化，支持定时广播机制")
+    logger.info("CC Live 游戏API服务启动中...")
+    logger.info("数据管理器已初始化，支持定时广播机制")
+    await start_fanout()
+    # 工作进程不处理接入数据，配置变更由主进程广播
+    if fanout_role != ROLE_WORKER:
+        # 回放事件日志重建状态后再开始记录新的接入消息
+        event_log.open()
+        if event_log.replay_on_start:
+            await ingest_routes.replay_event_log()
+        event_log.start()
+        start_config_watch()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时的清理"""
+    await stop_config_watch()
+    # 先处理完接入队列中剩余的事件，再停止分发
+    await ingest_queue.stop()
+    await event_log.stop()
+    await stop_fanout()
+    shutdown_logging()
 
 
 # ========== 调试：捕获请求体并在 405 时输出 ==========
@@ -44,21 +77,26 @@ async def _set_body(request: Request, body: bytes) -> None:
 
 @app.middleware("http")
 async def capture_request_body(request: Request, call_next):
-    try:
-        body = await request.body()
-        # 重新注入 body，避免下游读取不到
-        await _set_body(request, body)
-        request.state._raw_body = body
-    except Exception:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        # NDJSON 请求体由接口边接收边处理，这里不做缓冲
         request.state._raw_body = b""
+    else:
+        try:
+            body = await request.body()
+            # 重新注入 body，避免下游读取不到
+            await _set_body(request, body)
+            request.state._raw_body = body
+        except Exception:
+            request.state._raw_body = b""
     response = await call_next(request)
     # 如果是 405，打印一份调试信息
     if getattr(response, "status_code", None) in (400, 401, 403, 404, 405, 415, 422):
         try:
             snippet = (request.state._raw_body or b"")[:2048]
-            print(f"[{response.status_code}][DEBUG] method=", request.method, "path=", str(request.url))
-            print(f"[{response.status_code}][DEBUG] headers=", {k.lower(): v for k, v in request.headers.items() if k.lower() in ("content-type", "content-length", "authorization")})
-            print(f"[{response.status_code}][DEBUG] body=", snippet.decode(errors="ignore"))
+            logger.warning("[%s][DEBUG] method= %s path= %s", response.status_code, request.method, str(request.url))
+            logger.warning("[%s][DEBUG] headers= %s", response.status_code, {k.lower(): v for k, v in request.headers.items() if k.lower() in ("content-type", "content-length", "authorization")})
+            logger.warning("[%s][DEBUG] body= %s", response.status_code, snippet.decode(errors="ignore"))
         except Exception:
             pass
     return response
@@ -0,0 +1,164 @@
+"""
+游戏事件去重测试：事件ID与内容哈希的去重键、时间窗口与容量、接口上的重复回执与失败后允许重试
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from app.api import game_routes
+from app.core import dedupe as dedupe_module
+from app.core.dedupe import DedupeIndex
+from app.core.ingest_queue import ingest_queue
+from app.models.models import GameEvent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(dedupe_module.time, "monotonic", fake.monotonic)
+    return fake
+
+
+def _index(monkeypatch, mode="id", **env) -> DedupeIndex:
+    monkeypatch.setenv("INGEST_DEDUPE", mode)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return DedupeIndex()
+
+
+def _event(**fields) -> GameEvent:
+    return GameEvent(**{"player": "r1", "team": "RED", "event": "Kill", "lore": "b1", **fields})
+
+
+def test_id_mode_only_dedupes_events_with_id(monkeypatch, clock):
+    index = _index(monkeypatch, "id")
+    assert index.key_for("battle_box", _event()) is None
+    key = index.key_for("battle_box", _event(event_id="e1"))
+    assert key == index.key_for("battle_box", _event(event_id="e1", lore="other"))
+    assert key != index.key_for("skywars", _event(event_id="e1"))
+
+    assert index.lookup(key) is None
+    index.add(key, 7)
+    assert index.lookup(key)[1] == 7
+
+
+def test_off_mode_never_dedupes(monkeypatch):
+    index = _index(monkeypatch, "off")
+    assert index.key_for("battle_box", _event(event_id="e1")) is None
+
+
+def test_id_window_and_capacity(monkeypatch, clock):
+    index = _index(monkeypatch, "id", INGEST_DEDUPE_WINDOW="10", INGEST_DEDUPE_SIZE="2")
+    keys = [index.key_for("battle_box", _event(event_id=f"e{i}")) for i in range(3)]
+    for key in keys:
+        index.add(key)
+    # 超过容量时最早的条目被淘汰
+    assert index.lookup(keys[0]) is None
+    assert index.lookup(keys[2]) is not None
+    clock.now += 11
+    assert index.lookup(keys[2]) is None
+    assert index.get_stats()["entries"] == 0
+
+
+def test_hash_mode_uses_short_window_without_sent_at(monkeypatch, clock):
+    index = _index(monkeypatch, "hash", INGEST_DEDUPE_WINDOW="300", INGEST_DEDUPE_HASH_WINDOW="5")
+    key = index.key_for("battle_box", _event())
+    index.add(key)
+    # 重试超时内的相同内容视为重试
+    clock.now += 3
+    assert index.lookup(index.key_for("battle_box", _event())) is not None
+    # 之后内容相同的事件是真实的重复（如下一回合再次击杀同一玩家），不再丢弃
+    clock.now += 3
+    assert index.lookup(index.key_for("battle_box", _event())) is None
+
+
+def test_hash_mode_with_sent_at_tells_repeats_from_retries(monkeypatch, clock):
+    index = _index(monkeypatch, "hash", INGEST_DEDUPE_WINDOW="300", INGEST_DEDUPE_HASH_WINDOW="5")
+    index.add(index.key_for("battle_box", _event(sent_at=1000)))
+    clock.now += 60
+    assert index.lookup(index.key_for("battle_box", _event(sent_at=1000))) is not None
+    assert index.lookup(index.key_for("battle_box", _event(sent_at=2000))) is None
+
+
+def test_short_entries_expire_behind_long_ones(monkeypatch, clock):
+    index = _index(monkeypatch, "hash", INGEST_DEDUPE_WINDOW="300", INGEST_DEDUPE_HASH_WINDOW="5")
+    long_key = index.key_for("battle_box", _event(event_id="e1"))
+    short_key = index.key_for("battle_box", _event())
+    index.add(long_key)
+    index.add(short_key)
+    clock.now += 10
+    assert index.lookup(short_key) is None
+    assert index.lookup(long_key) is not None
+
+
+def test_discard_allows_retry(monkeypatch, clock):
+    index = _index(monkeypatch, "id")
+    key = index.key_for("battle_box", _event(event_id="e1"))
+    index.add(key)
+    index.discard(key)
+    assert index.lookup(key) is None
+
+
+@pytest.fixture
+def api_dedupe(monkeypatch):
+    monkeypatch.setenv("INGEST_DEDUPE", "id")
+    index = DedupeIndex()
+    monkeypatch.setattr(game_routes, "event_dedupe", index)
+    return index
+
+
+def _post_events(*events):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = []
+            for event in events:
+                responses.append(await client.post("/api/battle_box/event", json=event))
+                # 队列模式下等待后台处理完成
+                while ingest_queue.depth():
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.01)
+            return responses
+    return asyncio.run(run())
+
+
+def test_duplicate_event_is_acknowledged_without_scoring(api_dedupe):
+    event = {"player": "r1", "team": "RED", "event": "Kill", "lore": "b1", "event_id": "kill-1"}
+    first, second = _post_events(event, event)
+    assert first.status_code == 200 and not first.json().get("duplicate")
+    assert second.status_code == 200 and second.json()["duplicate"] is True
+    engine = game_routes.score_engine
+    assert engine.predicted_scores["RED"]["r1"] == engine.handler.rules.kill
+
+
+def test_failed_queued_event_can_be_retried(api_dedupe, monkeypatch):
+    monkeypatch.setattr(ingest_queue, "enabled", True)
+    monkeypatch.setattr(ingest_queue, "_queue", None)
+    monkeypatch.setattr(ingest_queue, "_consumer", None)
+    original = game_routes.score_engine.process_event
+    calls = []
+
+    def flaky_process_event(event_data):
+        calls.append(event_data)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return original(event_data)
+
+    monkeypatch.setattr(game_routes.score_engine, "process_event", flaky_process_event)
+    event = {"player": "r1", "team": "RED", "event": "Kill", "lore": "b1", "event_id": "kill-2"}
+    failed, retried, duplicate = _post_events(event, event, event)
+    assert failed.status_code == 202
+    assert retried.status_code == 202 and not retried.json().get("duplicate")
+    assert duplicate.json()["duplicate"] is True
+    assert len(calls) == 2
@@ -0,0 +1,176 @@
+"""
+事件日志崩溃恢复测试：分段轮转、损坏行与未写完的末尾、回放，以及 event_log_tool.py 的截断与清理
+"""
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.api import ingest_routes
+from app.core import event_log as event_log_module
+from app.core.event_log import EventLog, list_segments, scan_segment
+from app.core.score_engine import score_engine
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("EVENT_LOG_DIR", str(tmp_path))
+    monkeypatch.setenv("EVENT_LOG_FLUSH_MS", "0")
+    # 约 200 字节一个分段，几条记录就会轮转
+    monkeypatch.setenv("EVENT_LOG_SEGMENT_MB", str(200 / (1024 * 1024)))
+    return tmp_path
+
+
+def _write(count: int, start: int = 0) -> EventLog:
+    """打开日志并逐批写入 count 条投票记录（每条单独落盘，便于产生多个分段）"""
+    async def run():
+        log = EventLog()
+        log.open()
+        log.start()
+        for i in range(start, start + count):
+            log.append("vote", {"votes": [], "time": i})
+            await log.sync()
+        await log.stop()
+        return log
+    return asyncio.run(run())
+
+
+def _seqs(log: EventLog, from_seq: int = 1):
+    return [record["seq"] for record in log.records(from_seq)]
+
+
+def _reopen() -> EventLog:
+    log = EventLog()
+    log.open()
+    return log
+
+
+def test_segments_rotate_and_records_replay_in_order(log_dir):
+    log = _write(12)
+    assert log.seq == 12 and log.durable_seq == 12
+    segments = list_segments(log_dir)
+    assert len(segments) > 1
+    # 每个分段以其首条记录的序号命名
+    for first_seq, path in segments:
+        assert next(scan_segment(path))[1]["seq"] == first_seq
+
+    reopened = _reopen()
+    assert reopened.seq == 12
+    assert _seqs(reopened) == list(range(1, 13))
+    assert _seqs(reopened, from_seq=7) == list(range(7, 13))
+
+
+def test_open_skips_corrupt_line_and_trims_only_unterminated_tail(log_dir):
+    _write(12)
+    first_seq, last = list_segments(log_dir)[-1]
+    lines = last.read_bytes().splitlines(keepends=True)
+    assert len(lines) >= 2
+    # 损坏最后一个分段中的第一条记录，并追加崩溃时写了一半的记录
+    corrupted = b"{not json\n" + b"".join(lines[1:]) + b'{"seq": 13, "ts": "x", "ty'
+    last.write_bytes(corrupted)
+
+    log = _reopen()
+    # 损坏行之后的记录保留，序号从最后一条完整记录继续
+    assert log.seq == 12
+    assert last.read_bytes() == b"{not json\n" + b"".join(lines[1:])
+    assert _seqs(log) == [seq for seq in range(1, 13) if seq != first_seq]
+
+    # 继续追加时序号连续，之前的记录不受影响
+    log = _write(2, start=100)
+    assert _seqs(log)[-3:] == [12, 13, 14]
+
+
+def test_failed_write_is_retried_and_never_acknowledged(log_dir, monkeypatch):
+    monkeypatch.setattr(event_log_module, "WRITE_RETRY_DELAY", 0.01)
+    real_fsync = event_log_module.os.fsync
+    failures = [OSError("disk full")]
+
+    def flaky_fsync(fd):
+        if failures:
+            raise failures.pop()
+        real_fsync(fd)
+
+    async def run():
+        log = EventLog()
+        log.open()
+        log.start()
+        log.append("vote", {"votes": [], "time": 1})
+        await log.sync()
+        monkeypatch.setattr(event_log_module.os, "fsync", flaky_fsync)
+        log.append("vote", {"votes": [], "time": 2})
+        with pytest.raises(event_log_module.EventLogWriteError):
+            await log.sync()
+        assert log.durable_seq == 1
+        # 记录留在缓冲中，稍后重写成功
+        await log.sync()
+        assert log.durable_seq == 2
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+    assert log.write_errors == 1
+    assert _seqs(_reopen()) == [1, 2]
+
+
+def test_replay_rebuilds_game_state(log_dir):
+    async def run():
+        log = EventLog()
+        log.open()
+        log.start()
+        log.append("set_round", {"round": 1}, "battle_box")
+        for victim in ("b1", "b2"):
+            log.append("event", {"player": "r1", "team": "RED", "event": "Kill", "lore": victim}, "battle_box")
+        log.append("not_a_type", {})
+        await log.sync()
+        await log.stop()
+
+        replay_log = EventLog()
+        replay_log.open()
+        original = ingest_routes.event_log
+        ingest_routes.event_log = replay_log
+        try:
+            return await ingest_routes.replay_event_log()
+        finally:
+            ingest_routes.event_log = original
+
+    assert asyncio.run(run()) == 3
+    assert score_engine.current_game_id == "battle_box"
+    rules = score_engine.handler.rules
+    assert score_engine.predicted_scores["RED"]["r1"] == 2 * rules.kill
+
+
+def _tool(directory: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(ROOT / "event_log_tool.py"), "--dir", str(directory), *args],
+        cwd=ROOT, capture_output=True, text=True, check=False,
+    )
+
+
+def test_tool_truncate_and_drop(log_dir):
+    _write(12)
+    segments = list_segments(log_dir)
+    assert len(segments) >= 3
+
+    result = _tool(log_dir, "truncate", "--after", "8", "--yes")
+    assert result.returncode == 0, result.stderr
+    log = _reopen()
+    assert log.seq == 8
+    assert _seqs(log) == list(range(1, 9))
+    assert all(first_seq <= 8 for first_seq, _ in list_segments(log_dir))
+
+    # 只删除记录全部小于 5 的分段，5 所在的分段保留
+    result = _tool(log_dir, "drop", "--before", "5", "--yes")
+    assert result.returncode == 0, result.stderr
+    remaining = _seqs(_reopen())
+    assert remaining[0] <= 5 and remaining[-1] == 8
+    assert remaining == list(range(remaining[0], 9))
+    assert list_segments(log_dir)[0][0] == remaining[0]
+
+    listing = _tool(log_dir, "list")
+    assert listing.returncode == 0
+    assert f"{len(remaining)} 条记录" in listing.stdout
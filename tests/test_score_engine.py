@@ -0,0 +1,103 @@
+"""
+分数预测引擎测试：增量维护的分数榜与每次从头排序的结果一致，未变化的条目与结果被复用
+"""
+
+import random
+
+import pytest
+
+from app.core.score_engine import ScorePredictionEngine
+
+
+def _reference_rankings(engine: ScorePredictionEngine):
+    """从头计算的分数榜：按总分降序，总分相同时按队伍出现顺序"""
+    totals = [
+        (team_id, sum(engine.predicted_scores.get(team_id, {}).values()))
+        for team_id in engine.team_players
+    ]
+    ordered = sorted(totals, key=lambda item: -item[1])
+    return [
+        {
+            'team_id': team_id,
+            'total_score': total,
+            'players': dict(engine.predicted_scores.get(team_id, {})),
+            'rank': rank,
+        }
+        for rank, (team_id, total) in enumerate(ordered, 1)
+    ]
+
+
+def _event(event, player="", team="", lore=""):
+    return {'event': event, 'player': player, 'team': team, 'lore': lore}
+
+
+@pytest.fixture
+def engine():
+    engine = ScorePredictionEngine()
+    engine.set_rosters({})
+    return engine
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_standings_match_full_sort(engine, seed):
+    rng = random.Random(seed)
+    teams = ["RED", "BLUE", "GREEN", "PURPLE_EXTRA"]
+    players = {team: [f"{team.lower()}{i}" for i in range(3)] for team in teams}
+    engine.set_current_game("battle_box")
+    for _ in range(200):
+        team = rng.choice(teams)
+        player = rng.choice(players[team])
+        if rng.random() < 0.85:
+            event = _event("Kill", player, team, rng.choice(players[rng.choice(teams)]))
+        else:
+            event = _event("Wool_Win", player, team)
+        result = engine.process_event(event)
+        assert result['team_rankings'] == _reference_rankings(engine)
+        assert result['total_events_processed'] == len(engine.event_history)
+
+
+def test_standings_survive_game_switch_and_elimination_games(engine):
+    engine.set_current_game("battle_box")
+    engine.process_event(_event("Kill", "r1", "RED", "b1"))
+    engine.set_current_game("tntrun")
+    assert all(entry['total_score'] == 0 for entry in engine.get_current_standings()['team_rankings'])
+    for player, team in (("r1", "RED"), ("r2", "RED"), ("b1", "BLUE"), ("b2", "BLUE")):
+        engine.add_player_to_team(player, team)
+    engine.process_event(_event("Round_Start"))
+    for player, team in (("b2", "BLUE"), ("r1", "RED"), ("b1", "BLUE")):
+        result = engine.process_event(_event("Player_Fall", player, team))
+        assert result['team_rankings'] == _reference_rankings(engine)
+    result = engine.process_event(_event("Round_Over"))
+    assert result['team_rankings'] == _reference_rankings(engine)
+    assert result['team_rankings'][0]['team_id'] == "RED"
+
+
+def test_unchanged_entries_and_results_are_reused(engine):
+    engine.set_current_game("battle_box")
+    engine.process_event(_event("Kill", "r1", "RED", "b1"))
+    engine.process_event(_event("Kill", "b1", "BLUE", "r1"))
+    before = {entry['team_id']: entry for entry in engine.get_current_standings()['team_rankings']}
+
+    # 没有新事件时返回同一个结果对象
+    assert engine.get_current_standings() is engine.get_current_standings()
+
+    # BLUE 加分后名次不变的队伍沿用原来的条目
+    result = engine.process_event(_event("Kill", "b1", "BLUE", "r2"))
+    after = {entry['team_id']: entry for entry in result['team_rankings']}
+    assert after['BLUE'] is not before['BLUE']
+    unchanged = [team for team in after if team not in ("RED", "BLUE") and after[team]['rank'] == before[team]['rank']]
+    assert unchanged
+    for team in unchanged:
+        assert after[team] is before[team]
+    assert result['team_rankings'] == _reference_rankings(engine)
+
+
+def test_ties_keep_first_appearance_order(engine):
+    engine.set_current_game("battle_box")
+    order = list(engine.team_players)
+    engine.process_event(_event("Kill", "x1", order[-1], "y"))
+    engine.process_event(_event("Kill", "y1", order[0], "x"))
+    rankings = engine.get_current_standings()['team_rankings']
+    # 总分相同的两支队伍按出现顺序排列
+    assert [entry['team_id'] for entry in rankings[:2]] == [order[0], order[-1]]
+    assert rankings == _reference_rankings(engine)